@@ -1,11 +1,23 @@
 # -*- coding: utf-8 -*-
+import io
+import json
+import threading
 import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
-from typing import Callable, Dict, List, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple
 
 import requests
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columnar encodings of `/cameras` and `/identifications`, see `VisionaiAPI._get_dataframe`
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
 
 class VisionaiAPI:
     def __init__(
@@ -15,6 +27,7 @@ class VisionaiAPI:
         base_url: str | None = None,
         token: str | None = None,
         token_callback: Callable[[str, datetime], None] = lambda *_: None,
+        response_cache_size: int = 128,
     ) -> None:
         if token is None and (username is None or password is None):
             raise ValueError("Must be set refresh token or username with password")
@@ -26,6 +39,10 @@ class VisionaiAPI:
         self._token = token
         self._token_callback = token_callback
         self._headers, self._token, self._expires_at = self._get_headers()
+        # Bodies of the last GET responses by URL with their ETag, to revalidate them
+        self._response_cache_size = response_cache_size
+        self._responses: OrderedDict[str, Tuple[str, bytes]] = OrderedDict()
+        self._responses_lock = threading.Lock()
 
     def _get_headers(self) -> Tuple[Dict[str, str], str | None, datetime]:
         if self._password is None:
@@ -64,14 +81,42 @@ class VisionaiAPI:
     def expires_at(self):
         return self._expires_at
 
+    def _get_cached_response(self, url: str) -> Tuple[str, bytes] | None:
+        with self._responses_lock:
+            cached = self._responses.get(url)
+            if cached is not None:
+                self._responses.move_to_end(url)
+            return cached
+
+    def _cache_response(self, url: str, etag: str, content: bytes) -> None:
+        with self._responses_lock:
+            self._responses[url] = (etag, content)
+            self._responses.move_to_end(url)
+            while len(self._responses) > self._response_cache_size:
+                self._responses.popitem(last=False)
+
     def _get(self, path: str, timeout: int = 120) -> Dict:
+        """
+        Gets a path of the API. Responses with an `ETag` are kept locally and revalidated with
+        `If-None-Match`, so an unchanged resource is not downloaded again.
+        """
         self._refresh_token_if_needed()
+        url = f"{self._base_url}{path}"
+        headers = self._headers
+        cached = self._get_cached_response(url)
+        if cached is not None:
+            headers = {**headers, "If-None-Match": cached[0]}
+
         try:
-            response = requests.get(
-                f"{self._base_url}{path}", headers=self._headers, timeout=timeout
-            )
+            response = requests.get(url, headers=headers, timeout=timeout)
+
+            if response.status_code == 304 and cached is not None:
+                return json.loads(cached[1])
 
             response.raise_for_status()
+            etag = response.headers.get("ETag")
+            if etag is not None and self._response_cache_size > 0:
+                self._cache_response(url, etag, response.content)
             return response.json()
         except requests.exceptions.ReadTimeout as _:  # noqa
             return {"items": []}
@@ -91,7 +136,11 @@ class VisionaiAPI:
         response = requests.delete(f"{self._base_url}{path}", headers=self._headers, json=json_data)
         return response
 
-    def _get_all_pages(self, path, page_size=100, timeout=120):
+    def _get_all_pages(self, path, page_size=100, timeout=120, use_cursor=False):
+        if use_cursor and isinstance(path, str):
+            print(f"Getting all pages for {path} with cursor pagination")
+            return list(self._iter_cursor_pages(path, page_size=page_size, timeout=timeout))
+
         # Function to get a single page
         def get_page(page, total_pages):
             # time each execution
@@ -134,6 +183,139 @@ class VisionaiAPI:
         print("Getting all pages done!!!")
         return data
 
+    def _iter_cursor_pages(self, path: str, page_size: int = 100, timeout: int = 120):
+        """
+        Iterates over the items of a paginated endpoint using cursor pagination, one page at a
+        time. Unlike `_get_all_pages`, every page costs the same regardless of how deep it is
+        and the total of items is never counted.
+
+        Args:
+            path (str): The path of the endpoint.
+            page_size (int, optional): The number of items per page. Defaults to 100.
+            timeout (int, optional): The timeout of each request. Defaults to 120.
+
+        Yields:
+            Dict: The items of the endpoint.
+        """
+        separator = "&" if "?" in path else "?"
+        cursor = ""
+        while cursor is not None:
+            response = self._get(
+                path=f"{path}{separator}size={page_size}&cursor={cursor}", timeout=timeout
+            )
+            yield from response.get("items", [])
+            cursor = response.get("next_cursor")
+
+    def _get_dataframe(
+        self, path: str, params: Dict | None = None, page_size: int = 3000, timeout: int = 120
+    ) -> "pd.DataFrame":
+        """
+        Gets every page of an endpoint with a columnar encoding, like `/cameras` and
+        `/identifications`, and loads them into a single data frame with one row per
+        identification. Arrow is requested when `pyarrow` is installed, msgpack otherwise.
+
+        Args:
+            path (str): The path of the endpoint.
+            params (Dict, optional): The query parameters. Defaults to None.
+            page_size (int, optional): The number of items per page. Defaults to 3000.
+            timeout (int, optional): The timeout of each request. Defaults to 120.
+
+        Returns:
+            pd.DataFrame: The rows of every page.
+        """
+        import pandas as pd
+
+        try:
+            import pyarrow  # noqa: F401
+
+            accept = f"{ARROW_MEDIA_TYPE}, {MSGPACK_MEDIA_TYPE};q=0.9"
+        except ImportError:
+            accept = MSGPACK_MEDIA_TYPE
+
+        frames = []
+        cursor = ""
+        while cursor is not None:
+            self._refresh_token_if_needed()
+            response = requests.get(
+                f"{self._base_url}{path}",
+                headers={**self._headers, "Accept": accept},
+                params={**(params or {}), "size": page_size, "cursor": cursor},
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            frames.append(self._read_dataframe(response))
+            cursor = response.headers.get("X-Next-Cursor")
+
+        return pd.concat(frames, ignore_index=True)
+
+    def _read_dataframe(self, response: requests.Response) -> "pd.DataFrame":
+        import pandas as pd
+
+        media_type = response.headers.get("Content-Type", "").split(";")[0]
+        if media_type == ARROW_MEDIA_TYPE:
+            import pyarrow as pa
+
+            return pa.ipc.open_stream(response.content).read_pandas()
+        if media_type == PARQUET_MEDIA_TYPE:
+            return pd.read_parquet(io.BytesIO(response.content))
+        if media_type == MSGPACK_MEDIA_TYPE:
+            import msgpack
+
+            dataframe = pd.DataFrame(msgpack.unpackb(response.content, timestamp=3))
+            for column in ("timestamp", "snapshot_timestamp"):
+                dataframe[column] = pd.to_datetime(dataframe[column], utc=True)
+            return dataframe
+
+        raise ValueError(f"Unsupported columnar response of type {media_type!r}")
+
+    def get_cameras_dataframe(
+        self, minute_interval: int = 30, page_size: int = 3000, timeout: int = 120
+    ) -> "pd.DataFrame":
+        """
+        Gets the cameras with their latest identifications as a data frame, one row per
+        identification, already flattened like `explode_df(cameras, "identifications")`.
+        Cameras without identifications in the interval have a single row with the
+        identification columns empty.
+
+        Args:
+            minute_interval (int, optional): Only identifications in the last minutes are
+                returned. Defaults to 30.
+            page_size (int, optional): The number of cameras per page. Defaults to 3000.
+            timeout (int, optional): The timeout of each request. Defaults to 120.
+
+        Returns:
+            pd.DataFrame: The cameras and identifications.
+        """
+        return self._get_dataframe(
+            "/cameras",
+            params={"minute_interval": minute_interval},
+            page_size=page_size,
+            timeout=timeout,
+        )
+
+    def get_identifications_dataframe(
+        self, minute_interval: int = 30, page_size: int = 3000, timeout: int = 120
+    ) -> "pd.DataFrame":
+        """
+        Gets the identifications of the last minutes as a data frame, one row per
+        identification with its snapshot and camera id.
+
+        Args:
+            minute_interval (int, optional): Only identifications of snapshots in the last
+                minutes are returned. Defaults to 30.
+            page_size (int, optional): The number of identifications per page. Defaults to 3000.
+            timeout (int, optional): The timeout of each request. Defaults to 120.
+
+        Returns:
+            pd.DataFrame: The identifications.
+        """
+        return self._get_dataframe(
+            "/identifications",
+            params={"minute_interval": minute_interval},
+            page_size=page_size,
+            timeout=timeout,
+        )
+
     def _calculate_total_pages(self, response, page_size):
         return round(response["total"] / page_size) + 1
 
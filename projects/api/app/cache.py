@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import hashlib
+import inspect
+import math
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+from uuid import uuid4
+
+from app import config
+from app.metrics import CACHE_REQUESTS, COALESCED_CALLS
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.decorator import cache
+from loguru import logger
+
+CAMERAS_NAMESPACE = "cameras"
+PROMPTS_NAMESPACE = "prompts"
+PROMPTS_EXPIRE = 60 * 60
+# Outlives every `counted_cache` result, so a generation isn't dropped while they may be rewritten
+NAMESPACE_GENERATION_EXPIRE = 60 * 60 * 24
+
+R = TypeVar("R")
+
+
+class CacheStats:
+    """
+    Hit and miss counters of a cache, kept per process and exported as Prometheus metrics.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def hit(self) -> None:
+        self.hits += 1
+        CACHE_REQUESTS.labels(self.name, "hit").inc()
+
+    def miss(self) -> None:
+        self.misses += 1
+        CACHE_REQUESTS.labels(self.name, "miss").inc()
+
+
+CACHE_STATS: dict[str, CacheStats] = {}
+
+
+def get_cache_stats(name: str) -> CacheStats:
+    """
+    Gets the counters of a cache, creating them on first use.
+
+    Args:
+        name (str): The cache name.
+
+    Returns:
+        CacheStats: The cache counters.
+    """
+    if name not in CACHE_STATS:
+        CACHE_STATS[name] = CacheStats(name)
+    return CACHE_STATS[name]
+
+
+def single_flight(
+    key_builder: Callable[..., Hashable] | None = None
+) -> Callable[[Callable[..., Awaitable[R]]], Callable[..., Awaitable[R]]]:
+    """
+    Coalesces the concurrent calls of a coroutine function with the same arguments: the first one
+    runs it and the others await its result. Stacked on top of `cache` or `counted_cache`, an
+    expired entry is computed once per process instead of once per waiting request.
+
+    Args:
+        key_builder (Callable[..., Hashable] | None, optional): Builds the key of a call from its
+            arguments. Defaults to the arguments themselves, which must then be hashable.
+    """
+
+    def decorator(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaitable[R]]:
+        calls: dict[Hashable, asyncio.Task[R]] = {}
+
+        def forget(key: Hashable, task: asyncio.Task[R]) -> None:
+            if calls.get(key) is task:
+                del calls[key]
+
+        @wraps(func)
+        async def inner(*args: Any, **kwargs: Any) -> R:
+            if key_builder is not None:
+                key = key_builder(*args, **kwargs)
+            else:
+                key = (args, tuple(sorted(kwargs.items())))
+
+            task = calls.get(key)
+            if task is None:
+                task = asyncio.create_task(func(*args, **kwargs))
+                calls[key] = task
+                task.add_done_callback(lambda task: forget(key, task))
+            else:
+                COALESCED_CALLS.labels(func.__qualname__).inc()
+            # Shielded, so a cancelled caller doesn't cancel the call the others are waiting for
+            return await asyncio.shield(task)
+
+        return inner
+
+    return decorator
+
+
+# Set when a function decorated by `counted_cache` runs, that is, on a cache miss
+_cache_missed: ContextVar[bool] = ContextVar("cache_missed", default=False)
+
+
+def counted_cache(
+    name: str, expire: int | None = None, namespace: str = "", stale: int = 0
+) -> Callable[[Callable[..., Awaitable[R]]], Callable[..., Awaitable[R]]]:
+    """
+    Caches a function like `fastapi_cache.decorator.cache`, counting its hits and misses in
+    `get_cache_stats(name)`. The cache keys are the same.
+
+    With `stale`, results are kept `stale` seconds after they expire and are still returned in
+    that time, while a single background call per key computes the new result
+    (stale-while-revalidate). Invalidated entries are dropped as usual, see `clear_namespace`,
+    and the revalidations running meanwhile don't write their result back.
+
+    Args:
+        name (str): The cache name in the stats.
+        expire (int | None, optional): Seconds until a result expires. Defaults to the
+            `FastAPICache` one.
+        namespace (str, optional): The namespace of the cache keys. Defaults to "".
+        stale (int, optional): Seconds a result may be returned after it expires. Requires
+            `expire`. Defaults to 0.
+    """
+    if stale > 0 and expire is None:
+        raise ValueError("stale requires expire")
+    if stale > 0 and expire + stale > NAMESPACE_GENERATION_EXPIRE:
+        raise ValueError("expire + stale must not exceed NAMESPACE_GENERATION_EXPIRE")
+
+    def decorator(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaitable[R]]:
+        stats = get_cache_stats(name)
+        revalidations: dict[str, asyncio.Task[None]] = {}
+
+        @cache(expire=expire + stale if stale > 0 else expire, namespace=namespace)
+        @wraps(func)
+        async def load(*args: Any, **kwargs: Any) -> R:
+            _cache_missed.set(True)
+            return await func(*args, **kwargs)
+
+        async def revalidate(key: str, args: tuple, kwargs: dict) -> None:
+            backend = FastAPICache.get_backend()
+            try:
+                generation = await get_namespace_generation(namespace)
+                result = await func(*args, **kwargs)
+                # Invalidated while computing, the result may predate the write
+                if await get_namespace_generation(namespace) != generation:
+                    return
+                await backend.set(key, FastAPICache.get_coder().encode(result), expire + stale)
+                # Invalidated between the check and the write, which the clear may have missed
+                if await get_namespace_generation(namespace) != generation:
+                    # The in-memory backend raises if the clear already dropped it
+                    with suppress(KeyError):
+                        await backend.clear(key=key)
+            except Exception as exc:
+                logger.warning(f"Failed to revalidate the {name} cache: {exc!r}")
+            finally:
+                del revalidations[key]
+
+        async def get_cached(args: tuple, kwargs: dict) -> tuple[bool, Any]:
+            key = FastAPICache.get_key_builder()(
+                load, namespace, request=None, response=None, args=args, kwargs=kwargs
+            )
+            if inspect.isawaitable(key):
+                key = await key
+            ttl, cached = await FastAPICache.get_backend().get_with_ttl(key)
+            if cached is None:
+                return False, None
+            if ttl <= stale and key not in revalidations:
+                revalidations[key] = asyncio.create_task(revalidate(key, args, kwargs))
+            return True, FastAPICache.get_coder().decode(cached)
+
+        @wraps(func)
+        async def inner(*args: Any, **kwargs: Any) -> R:
+            if stale > 0 and FastAPICache.get_enable():
+                found, result = await get_cached(args, kwargs)
+                if found:
+                    stats.hit()
+                    return result
+
+            token = _cache_missed.set(False)
+            try:
+                result = await load(*args, **kwargs)
+                if _cache_missed.get():
+                    stats.miss()
+                else:
+                    stats.hit()
+                return result
+            finally:
+                _cache_missed.reset(token)
+
+        return inner
+
+    return decorator
+
+
+class LRUCache:
+    """
+    Bounded in-process mapping that evicts the least recently used entries. Entries may have an
+    expiration timestamp, after which they are dropped on read. Hits and misses are counted in
+    `get_cache_stats(name)`.
+    """
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.stats = get_cache_stats(name)
+        self._data: OrderedDict[Hashable, tuple[Any, float | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is not None and (entry[1] is None or entry[1] > time.time()):
+            self._data.move_to_end(key)
+            self.stats.hit()
+            return entry[0]
+
+        if entry is not None:
+            del self._data[key]
+        self.stats.miss()
+        return None
+
+    def set(self, key: Hashable, value: Any, expires_at: float | None = None) -> None:
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+def get_cache_backend() -> Backend:
+    """
+    Gets the cache backend configured for the API.
+
+    Uses Redis when `CACHE_REDIS_URL` is set, so that every worker and replica shares the same
+    cached results and invalidations. Falls back to a per-process in-memory backend otherwise.
+
+    Returns:
+        Backend: The cache backend.
+    """
+    if config.CACHE_REDIS_URL:
+        from fastapi_cache.backends.redis import RedisBackend
+        from redis import asyncio as aioredis
+
+        logger.info("Using Redis cache backend")
+        return RedisBackend(aioredis.from_url(config.CACHE_REDIS_URL))
+
+    logger.info("Using in-memory cache backend")
+    return InMemoryBackend()
+
+
+def init_cache(backend: Backend | None = None) -> None:
+    """
+    Initializes `FastAPICache` with the given backend or the configured one.
+
+    Args:
+        backend (Backend, optional): The backend to use. Defaults to `get_cache_backend()`.
+    """
+    FastAPICache.init(backend or get_cache_backend(), prefix=config.CACHE_PREFIX)
+
+
+def _get_namespace_generation_key(namespace: str) -> str:
+    # Not prefixed by the namespace, which the in-memory backend clears by prefix
+    return f"{FastAPICache.get_prefix()}:generation:{namespace}"
+
+
+async def get_namespace_generation(namespace: str) -> str | None:
+    """
+    Gets the generation of a cache namespace, which changes every time it is cleared.
+
+    Args:
+        namespace (str): The namespace.
+
+    Returns:
+        str | None: The generation, None until the namespace is first cleared.
+    """
+    value = await FastAPICache.get_backend().get(_get_namespace_generation_key(namespace))
+    if value is None:
+        return None
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def clear_namespace(namespace: str) -> int:
+    """
+    Drops every cached result of a namespace. Its generation is changed first, so the
+    `counted_cache` revalidations running meanwhile don't write their results back.
+
+    Args:
+        namespace (str): The namespace.
+
+    Returns:
+        int: The number of dropped results.
+    """
+    await FastAPICache.get_backend().set(
+        _get_namespace_generation_key(namespace), uuid4().hex, expire=NAMESPACE_GENERATION_EXPIRE
+    )
+    return await FastAPICache.clear(namespace=namespace)
+
+
+def _get_cameras_invalidated_at_key() -> str:
+    return f"{FastAPICache.get_prefix()}:{CAMERAS_NAMESPACE}-invalidated-at"
+
+
+async def invalidate_cameras_cache() -> None:
+    """
+    Drops every cached result of `get_cameras_from_db`.
+
+    Must be called after any write that changes the cameras dashboard payload (cameras, their
+    objects or their identifications).
+    """
+    count = await clear_namespace(CAMERAS_NAMESPACE)
+    logger.debug(f"Invalidated {count} cached cameras pages")
+    # Pages cached right after the write must not be read from a lagging replica
+    expire = math.ceil(config.DATABASE_REPLICA_MAX_LAG + config.DATABASE_REPLICA_LAG_CHECK_INTERVAL)
+    await FastAPICache.get_backend().set(
+        _get_cameras_invalidated_at_key(), str(time.time()), expire=expire
+    )
+
+
+async def get_cameras_invalidated_at() -> float | None:
+    """
+    Gets when the cameras cache was last invalidated, if recently.
+
+    Returns:
+        float | None: The timestamp of the invalidation.
+    """
+    value = await FastAPICache.get_backend().get(_get_cameras_invalidated_at_key())
+    if value is None:
+        return None
+    return float(value.decode() if isinstance(value, bytes) else value)
+
+
+def _get_prompts_version_key() -> str:
+    return f"{FastAPICache.get_prefix()}:{PROMPTS_NAMESPACE}-version"
+
+
+async def get_prompts_cache_version() -> str:
+    """
+    Gets the version of the objects and prompts catalog used in the compiled prompts keys.
+
+    Returns:
+        str: The catalog version.
+    """
+    backend = FastAPICache.get_backend()
+    key = _get_prompts_version_key()
+    version = await backend.get(key)
+    if version is None:
+        version = uuid4().hex
+        await backend.set(key, version, expire=PROMPTS_EXPIRE)
+    return version.decode() if isinstance(version, bytes) else version
+
+
+async def get_prompts_cache_key(object_ids: list[str]) -> str:
+    """
+    Gets the cache key of the prompt compiled for a set of objects.
+
+    Args:
+        object_ids (list[str]): The objects ids, in any order.
+
+    Returns:
+        str: The cache key.
+    """
+    version = await get_prompts_cache_version()
+    objects_hash = hashlib.md5(",".join(sorted(object_ids)).encode()).hexdigest()  # nosec: B303
+    return f"{FastAPICache.get_prefix()}:{PROMPTS_NAMESPACE}:{version}:{objects_hash}"
+
+
+async def invalidate_prompts_cache() -> None:
+    """
+    Makes every compiled prompt stale by bumping the catalog version. Old entries are never read
+    again and expire on their own.
+
+    Must be called after any write to objects, labels or prompts.
+    """
+    await FastAPICache.get_backend().set(
+        _get_prompts_version_key(), uuid4().hex, expire=PROMPTS_EXPIRE
+    )
+    logger.debug("Invalidated compiled prompts")
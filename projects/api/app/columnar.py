@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar encodings of `GET /cameras` and `GET /identifications`, for clients that load them
+into data frames. Each identification is a flat row, so clients don't need to explode the
+nested JSON. Cameras without identifications in the interval get a single row with the
+identification columns empty.
+
+The encoding is chosen by the `Accept` header, see `get_columnar_response_class`. The page
+fields go in `X-Total`, `X-Page`, `X-Pages` and `X-Next-Cursor` headers, since the body
+only holds the rows.
+"""
+import io
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable
+from uuid import UUID
+
+import msgpack
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.utils import get_conditional_response
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Columns of an identification row and their types
+IDENTIFICATION_FIELDS = {
+    "identification_id": pa.string(),
+    "object": pa.string(),
+    "title": pa.string(),
+    "question": pa.string(),
+    "explanation": pa.string(),
+    "timestamp": pa.timestamp("us", tz="UTC"),
+    "label": pa.string(),
+    "label_text": pa.string(),
+    "label_explanation": pa.string(),
+    "snapshot_id": pa.string(),
+    "snapshot_url": pa.string(),
+    "snapshot_timestamp": pa.timestamp("us", tz="UTC"),
+}
+
+IDENTIFICATIONS_SCHEMA = pa.schema({"camera_id": pa.string(), **IDENTIFICATION_FIELDS})
+
+CAMERAS_SCHEMA = pa.schema(
+    {
+        "camera_id": pa.string(),
+        "name": pa.string(),
+        "rtsp_url": pa.string(),
+        "update_interval": pa.int32(),
+        "latitude": pa.float64(),
+        "longitude": pa.float64(),
+        "objects": pa.list_(pa.string()),
+        **IDENTIFICATION_FIELDS,
+    }
+)
+
+
+def _as_dict(item: dict | BaseModel) -> dict:
+    return item.dict() if isinstance(item, BaseModel) else item
+
+
+def _to_datetime(value: datetime | str | None) -> datetime | None:
+    """Parses the ISO timestamps of cached pages and makes naive datetimes UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _to_str(value: UUID | str | None) -> str | None:
+    return str(value) if value is not None else None
+
+
+def _append_identification(
+    columns: dict[str, list], identification: dict | BaseModel | None
+) -> None:
+    if identification is None:
+        for name in IDENTIFICATION_FIELDS:
+            columns[name].append(None)
+        return
+
+    identification = _as_dict(identification)
+    snapshot = _as_dict(identification["snapshot"])
+    columns["identification_id"].append(_to_str(identification["id"]))
+    columns["object"].append(identification["object"])
+    columns["title"].append(identification["title"])
+    columns["question"].append(identification["question"])
+    columns["explanation"].append(identification["explanation"])
+    columns["timestamp"].append(_to_datetime(identification["timestamp"]))
+    columns["label"].append(identification["label"])
+    columns["label_text"].append(identification["label_text"])
+    columns["label_explanation"].append(identification["label_explanation"])
+    columns["snapshot_id"].append(_to_str(snapshot["id"]))
+    columns["snapshot_url"].append(snapshot["image_url"])
+    columns["snapshot_timestamp"].append(_to_datetime(snapshot["timestamp"]))
+
+
+def flatten_identifications(identifications: Iterable[dict | BaseModel]) -> pa.Table:
+    """
+    Flattens identifications like `IdentificationOut` into a table of `IDENTIFICATIONS_SCHEMA`,
+    one row per identification.
+
+    Args:
+        identifications (Iterable[dict | BaseModel]): The identifications.
+
+    Returns:
+        pa.Table: The rows.
+    """
+    columns: dict[str, list] = {name: [] for name in IDENTIFICATIONS_SCHEMA.names}
+    for identification in identifications:
+        columns["camera_id"].append(_as_dict(_as_dict(identification)["snapshot"])["camera_id"])
+        _append_identification(columns, identification)
+    return pa.table(columns, schema=IDENTIFICATIONS_SCHEMA)
+
+
+def flatten_cameras(cameras: Iterable[dict | BaseModel]) -> pa.Table:
+    """
+    Flattens cameras like `CameraIdentificationOut` into a table of `CAMERAS_SCHEMA`, one row
+    per identification of each camera.
+
+    Args:
+        cameras (Iterable[dict | BaseModel]): The cameras.
+
+    Returns:
+        pa.Table: The rows.
+    """
+    columns: dict[str, list] = {name: [] for name in CAMERAS_SCHEMA.names}
+    for camera in cameras:
+        camera = _as_dict(camera)
+        for identification in camera["identifications"] or [None]:
+            columns["camera_id"].append(camera["id"])
+            columns["name"].append(camera["name"])
+            columns["rtsp_url"].append(camera["rtsp_url"])
+            columns["update_interval"].append(camera["update_interval"])
+            columns["latitude"].append(camera["latitude"])
+            columns["longitude"].append(camera["longitude"])
+            columns["objects"].append(camera["objects"])
+            _append_identification(columns, identification)
+    return pa.table(columns, schema=CAMERAS_SCHEMA)
+
+
+class ColumnarResponse(Response):
+    """
+    Renders a page whose `items` were flattened into a table by `flatten_cameras` or
+    `flatten_identifications`. The other fields of the page are sent as headers.
+    """
+
+    def __init__(self, content: dict[str, Any], **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        for field, header in (
+            ("total", "X-Total"),
+            ("page", "X-Page"),
+            ("pages", "X-Pages"),
+            ("next_cursor", "X-Next-Cursor"),
+        ):
+            if content.get(field) is not None:
+                self.headers[header] = str(content[field])
+
+
+class ArrowResponse(ColumnarResponse):
+    media_type = ARROW_MEDIA_TYPE
+
+    def render(self, content: dict[str, Any]) -> bytes:
+        table: pa.Table = content["items"]
+        sink = pa.BufferOutputStream()
+        # Buffers are compressed, since titles, questions and explanations repeat on every row
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+class ParquetResponse(ColumnarResponse):
+    media_type = PARQUET_MEDIA_TYPE
+
+    def render(self, content: dict[str, Any]) -> bytes:
+        sink = io.BytesIO()
+        pq.write_table(content["items"], sink, compression="zstd")
+        return sink.getvalue()
+
+
+class MsgpackResponse(ColumnarResponse):
+    """
+    The fallback for clients without Arrow: a map of column names to lists of values, with the
+    timestamps as msgpack timestamps.
+    """
+
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: dict[str, Any]) -> bytes:
+        return msgpack.packb(content["items"].to_pydict(), datetime=True)
+
+
+RESPONSE_CLASSES: dict[str, type[ColumnarResponse]] = {
+    ARROW_MEDIA_TYPE: ArrowResponse,
+    PARQUET_MEDIA_TYPE: ParquetResponse,
+    MSGPACK_MEDIA_TYPE: MsgpackResponse,
+}
+
+
+def get_columnar_response_class(request: Request) -> type[ColumnarResponse] | None:
+    """
+    Negotiates the columnar encoding of a response from the `Accept` header. The media types
+    are tried from the highest quality to the lowest, in the order they are listed when equal.
+    JSON wins whenever it, or a wildcard, comes first.
+
+    Args:
+        request (Request): The request.
+
+    Returns:
+        type[ColumnarResponse] | None: The response class, None for JSON.
+    """
+    accept = request.headers.get("accept")
+    if accept is None:
+        return None
+
+    ranges = []
+    for index, media_range in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, index, media_type.lower()))
+
+    for _, _, media_type in sorted(ranges):
+        if media_type in RESPONSE_CLASSES:
+            return RESPONSE_CLASSES[media_type]
+        if media_type in ("application/json", "application/*", "*/*"):
+            return None
+    return None
+
+
+def get_page_response(
+    request: Request,
+    page: dict[str, Any] | BaseModel,
+    flatten: Callable[[Iterable[dict | BaseModel]], pa.Table],
+    response_class: type[JSONResponse] = JSONResponse,
+) -> Response:
+    """
+    Renders a page in the encoding negotiated by `get_columnar_response_class`, with the
+    `ETag` of `get_conditional_response`.
+
+    Args:
+        request (Request): The request.
+        page (dict[str, Any] | BaseModel): The page.
+        flatten (Callable[[Iterable[dict | BaseModel]], pa.Table]): Flattens the items of the
+            page for the columnar encodings.
+        response_class (type[JSONResponse], optional): The class that renders the page as JSON.
+            Defaults to JSONResponse.
+
+    Returns:
+        Response: The response.
+    """
+    columnar_class = get_columnar_response_class(request)
+    if columnar_class is None:
+        response = get_conditional_response(request, page, response_class=response_class)
+    else:
+        page = dict(page) if isinstance(page, BaseModel) else {**page}
+        page["items"] = flatten(page["items"])
+        response = get_conditional_response(request, page, response_class=columnar_class)
+
+    response.headers["Vary"] = "Accept"
+    return response
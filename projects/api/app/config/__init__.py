@@ -1,10 +1,24 @@
 # -*- coding: utf-8 -*-
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from os import getenv
-from typing import List
+from pathlib import Path
+from typing import Dict, Iterator, List
 
+from cryptography.fernet import Fernet, InvalidToken
 from infisical import InfisicalClient
 from loguru import logger
 
+started_at = time.perf_counter()
+# Duration of the slow steps of the startup, logged once the API is ready
+startup_timings: Dict[str, float] = {}
+
 
 def getenv_or_action(env_name: str, *, action: str = "raise", default: str = None) -> str:
     """Get an environment variable or raise an exception.
@@ -90,25 +104,168 @@ def mask_string(string: str, *, mask: str = "*") -> str:
     return f"{first_characters}{mask * (length - number_of_characters_to_show * 2)}{last_characters}"  # noqa
 
 
-def inject_environment_variables(environment: str):
-    """Inject environment variables from Infisical."""
+@contextmanager
+def timed(step: str) -> Iterator[None]:
+    """Record the duration of a startup step in `startup_timings`.
+
+    Args:
+        step (str): The name of the step.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[step] = time.perf_counter() - start
+
+
+def log_startup_timings():
+    """Log the duration of the startup and of its slow steps."""
+    startup_timings["total"] = time.perf_counter() - started_at
+    timings = ", ".join(f"{step}: {duration:.3f}s" for step, duration in startup_timings.items())
+    logger.info(f"Startup timings: {timings}")
+
+
+def fetch_secrets(environment: str) -> Dict[str, str]:
+    """Fetch the secrets of an environment from Infisical.
+
+    Args:
+        environment (str): The environment.
+
+    Returns:
+        Dict[str, str]: The secrets by name.
+    """
     site_url = getenv_or_action("INFISICAL_ADDRESS", action="raise")
     token = getenv_or_action("INFISICAL_TOKEN", action="raise")
     infisical_client = InfisicalClient(
         token=token,
         site_url=site_url,
     )
-    secrets = infisical_client.get_all_secrets(environment=environment, attach_to_os_environ=True)
-    logger.info(f"Injecting {len(secrets)} environment variables from Infisical:")
-    for secret in secrets:
-        logger.info(f" - {secret.secret_name}: {mask_string(secret.secret_value)}")
+    secrets = infisical_client.get_all_secrets(environment=environment)
+    return {secret.secret_name: secret.secret_value for secret in secrets}
+
+
+class SecretsSnapshot:
+    """A local copy of the secrets of an environment, encrypted with Fernet.
+
+    The key is `INFISICAL_CACHE_KEY` or, by default, derived from `INFISICAL_TOKEN`, so the
+    snapshot can't be read without the credentials that fetched it and is ignored once the token
+    is rotated.
+    """
+
+    def __init__(self, path: str, environment: str):
+        self.path = Path(path)
+        self.environment = environment
+        key = getenv_or_action("INFISICAL_CACHE_KEY", action="ignore")
+        if key is None:
+            token = getenv_or_action("INFISICAL_TOKEN", action="raise")
+            key = base64.urlsafe_b64encode(hashlib.sha256(token.encode()).digest())
+        self.fernet = Fernet(key)
+
+    def read(self) -> tuple[Dict[str, str], float] | None:
+        """Read the snapshot.
+
+        Returns:
+            tuple[Dict[str, str], float] | None: The secrets and the timestamp when they were
+                fetched, or None if there is no valid snapshot of the environment.
+        """
+        try:
+            snapshot = json.loads(self.fernet.decrypt(self.path.read_bytes()))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError) as exc:
+            logger.warning(f"Ignoring the invalid secrets snapshot {self.path}: {exc!r}")
+            return None
+        if snapshot["environment"] != self.environment:
+            return None
+        return snapshot["secrets"], snapshot["fetched_at"]
+
+    def write(self, secrets: Dict[str, str]):
+        """Replace the snapshot atomically, so concurrent workers never read a partial file.
+
+        Args:
+            secrets (Dict[str, str]): The secrets by name.
+        """
+        snapshot = {"environment": self.environment, "fetched_at": time.time(), "secrets": secrets}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Created readable by the owner only
+        with tempfile.NamedTemporaryFile(dir=self.path.parent, delete=False) as file:
+            file.write(self.fernet.encrypt(json.dumps(snapshot).encode()))
+        os.replace(file.name, self.path)
+
+
+class SecretsRefresh(threading.Thread):
+    """Fetch the secrets from Infisical in a daemon thread and save them in the snapshot."""
+
+    def __init__(self, environment: str, snapshot: SecretsSnapshot | None):
+        super().__init__(name="secrets-refresh", daemon=True)
+        self.environment = environment
+        self.snapshot = snapshot
+        self.secrets: Dict[str, str] | None = None
+        self.error: Exception | None = None
+
+    def run(self):
+        try:
+            self.secrets = fetch_secrets(self.environment)
+            if self.snapshot is not None:
+                self.snapshot.write(self.secrets)
+        except Exception as exc:
+            self.error = exc
+            logger.warning(f"Failed to refresh the secrets from Infisical: {exc!r}")
+
+
+def load_secrets(environment: str) -> tuple[Dict[str, str], str]:
+    """Load the secrets of an environment, from the local snapshot when it is enabled.
+
+    With `INFISICAL_CACHE_PATH` set, a snapshot younger than `INFISICAL_CACHE_TTL` seconds is
+    used right away and refreshed in the background for the next start. An older one is only
+    used if Infisical fails or doesn't answer within `INFISICAL_TIMEOUT` seconds.
+
+    Args:
+        environment (str): The environment.
+
+    Returns:
+        tuple[Dict[str, str], str]: The secrets by name and where they were loaded from.
+    """
+    path = getenv_or_action("INFISICAL_CACHE_PATH", action="ignore")
+    if not path:
+        return fetch_secrets(environment), "Infisical"
+
+    ttl = float(getenv_or_action("INFISICAL_CACHE_TTL", action="ignore", default="3600"))
+    timeout = float(getenv_or_action("INFISICAL_TIMEOUT", action="ignore", default="5"))
+    snapshot = SecretsSnapshot(path, environment)
+    cached = snapshot.read()
+    refresh = SecretsRefresh(environment, snapshot)
+    refresh.start()
+    if cached is not None and time.time() - cached[1] < ttl:
+        return cached[0], "snapshot"
+
+    # Without a snapshot there is nothing else to start with, so wait as long as it takes
+    refresh.join(timeout if cached is not None else None)
+    if refresh.secrets is not None:
+        return refresh.secrets, "Infisical"
+    if cached is None:
+        raise refresh.error
+    logger.warning(f"Using the secrets snapshot from {time.time() - cached[1]:.0f}s ago")
+    return cached[0], "stale snapshot"
+
+
+def inject_environment_variables(environment: str):
+    """Inject environment variables from Infisical."""
+    with timed("secrets"):
+        secrets, source = load_secrets(environment)
+    os.environ.update(secrets)
+    logger.info(f"Injecting {len(secrets)} environment variables from {source}:")
+    for name, value in secrets.items():
+        logger.info(f" - {name}: {mask_string(value)}")
 
 
 environment = getenv_or_action("ENVIRONMENT", action="warn", default="dev")
 if environment not in ["dev", "staging", "prod"]:
     raise ValueError("ENVIRONMENT must be one of 'dev', 'staging' or 'prod'")
 
-inject_environment_variables(environment=environment)
+# Disabled to run the API with local settings only, as the load-testing harness does
+if getenv_or_action("INFISICAL_ENABLE", action="ignore", default="true").lower() == "true":
+    inject_environment_variables(environment=environment)
 
 if environment == "dev":
     from app.config.dev import *  # noqa: F401, F403
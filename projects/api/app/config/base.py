@@ -2,7 +2,7 @@
 import json
 from urllib.request import urlopen
 
-from . import getenv_or_action
+from . import getenv_or_action, timed
 
 # Logging
 LOG_LEVEL = getenv_or_action("LOG_LEVEL", default="INFO")
@@ -10,6 +10,35 @@ LOG_LEVEL = getenv_or_action("LOG_LEVEL", default="INFO")
 # Timezone configuration
 TIMEZONE = "America/Sao_Paulo"
 
+# Database connection pools
+DATABASE_POOL_MIN_SIZE = int(
+    getenv_or_action("DATABASE_POOL_MIN_SIZE", action="ignore", default="1")
+)
+DATABASE_POOL_MAX_SIZE = int(
+    getenv_or_action("DATABASE_POOL_MAX_SIZE", action="ignore", default="5")
+)
+
+# Read replica
+# When `DATABASE_REPLICA_HOST` is set, read-heavy routes read from the replica while its lag is
+# up to `DATABASE_REPLICA_MAX_LAG` seconds. The other settings default to the primary ones.
+DATABASE_REPLICA_HOST = getenv_or_action("DATABASE_REPLICA_HOST", action="ignore")
+DATABASE_REPLICA_PORT = getenv_or_action("DATABASE_REPLICA_PORT", action="ignore")
+DATABASE_REPLICA_USER = getenv_or_action("DATABASE_REPLICA_USER", action="ignore")
+DATABASE_REPLICA_PASSWORD = getenv_or_action("DATABASE_REPLICA_PASSWORD", action="ignore")
+DATABASE_REPLICA_NAME = getenv_or_action("DATABASE_REPLICA_NAME", action="ignore")
+DATABASE_REPLICA_POOL_MIN_SIZE = int(
+    getenv_or_action("DATABASE_REPLICA_POOL_MIN_SIZE", action="ignore", default="1")
+)
+DATABASE_REPLICA_POOL_MAX_SIZE = int(
+    getenv_or_action("DATABASE_REPLICA_POOL_MAX_SIZE", action="ignore", default="5")
+)
+DATABASE_REPLICA_MAX_LAG = float(
+    getenv_or_action("DATABASE_REPLICA_MAX_LAG", action="ignore", default="10")
+)
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(
+    getenv_or_action("DATABASE_REPLICA_LAG_CHECK_INTERVAL", action="ignore", default="5")
+)
+
 # Sentry
 SENTRY_ENABLE = False
 SENTRY_DSN = None
@@ -31,6 +60,84 @@ if GCS_BUCKET_PATH_PREFIX:
     GCS_BUCKET_PATH_PREFIX = GCS_BUCKET_PATH_PREFIX.rstrip("/")
 GCP_PUBSUB_PROJECT_ID = getenv_or_action("GCP_PUBSUB_PROJECT_ID", action="warn")
 GCP_PUBSUB_TOPIC_NAME = getenv_or_action("GCP_PUBSUB_TOPIC_NAME", action="warn")
+# Messages published within `GCP_PUBSUB_BATCH_MAX_LATENCY` seconds are sent in a single request
+GCP_PUBSUB_BATCH_MAX_MESSAGES = int(
+    getenv_or_action("GCP_PUBSUB_BATCH_MAX_MESSAGES", action="ignore", default="100")
+)
+GCP_PUBSUB_BATCH_MAX_LATENCY = float(
+    getenv_or_action("GCP_PUBSUB_BATCH_MAX_LATENCY", action="ignore", default="0.01")
+)
+# The upload URLs of the snapshots are signed by a pool of `GCS_SIGNING_WORKERS` threads, off the
+# event loop. Agents create up to `SNAPSHOTS_BULK_MAX_SIZE` snapshots in a single request.
+GCS_SIGNING_WORKERS = int(getenv_or_action("GCS_SIGNING_WORKERS", action="ignore", default="4"))
+SNAPSHOTS_BULK_MAX_SIZE = int(
+    getenv_or_action("SNAPSHOTS_BULK_MAX_SIZE", action="ignore", default="1000")
+)
+
+# Cache
+# When `CACHE_REDIS_URL` is set, cached results are shared by every worker and replica through
+# Redis. Otherwise each process keeps its own in-memory cache.
+CACHE_REDIS_URL = getenv_or_action("CACHE_REDIS_URL", action="ignore")
+CACHE_PREFIX = getenv_or_action("CACHE_PREFIX", action="ignore", default="vision-ai")
+# Maximum number of verified tokens and agents kept in memory by the auth dependencies
+AUTH_CACHE_SIZE = int(getenv_or_action("AUTH_CACHE_SIZE", action="ignore", default="1024"))
+
+# Events
+# Number of past events kept by each worker to resume streams from `Last-Event-ID`
+EVENTS_HISTORY_SIZE = int(getenv_or_action("EVENTS_HISTORY_SIZE", action="ignore", default="1000"))
+# Events waiting for a slow subscriber before its stream is closed
+EVENTS_QUEUE_SIZE = int(getenv_or_action("EVENTS_QUEUE_SIZE", action="ignore", default="100"))
+EVENTS_KEEPALIVE_INTERVAL = float(
+    getenv_or_action("EVENTS_KEEPALIVE_INTERVAL", action="ignore", default="15")
+)
+
+# Agents
+# Heartbeats are kept in memory and written to the database every few seconds
+HEARTBEAT_FLUSH_INTERVAL = float(
+    getenv_or_action("HEARTBEAT_FLUSH_INTERVAL", action="ignore", default="5")
+)
+
+# Live state
+# Opt-in, serves the cameras dashboard from memory for intervals up to `LIVE_STATE_WINDOW` minutes
+# instead of the shared cache. Only for deployments with a single API process: each process keeps
+# its own copy and only sees the writes made through the others when it reloads, every
+# `LIVE_STATE_REFRESH_INTERVAL` seconds. A failed load is retried after the same interval.
+LIVE_STATE_ENABLE = (
+    getenv_or_action("LIVE_STATE_ENABLE", action="ignore", default="false").lower() == "true"
+)
+LIVE_STATE_WINDOW = int(getenv_or_action("LIVE_STATE_WINDOW", action="ignore", default="60"))
+LIVE_STATE_REFRESH_INTERVAL = float(
+    getenv_or_action("LIVE_STATE_REFRESH_INTERVAL", action="ignore", default="60")
+)
+
+# Event loop monitor
+# Opt-in, times every callback of the event loop to find the ones that block it for longer than
+# `LOOP_MONITOR_SLOW_CALLBACK` seconds, see `GET /debug/event-loop`. The lag of the loop is
+# probed every `LOOP_MONITOR_INTERVAL` seconds.
+LOOP_MONITOR_ENABLE = (
+    getenv_or_action("LOOP_MONITOR_ENABLE", action="ignore", default="false").lower() == "true"
+)
+LOOP_MONITOR_SLOW_CALLBACK = float(
+    getenv_or_action("LOOP_MONITOR_SLOW_CALLBACK", action="ignore", default="0.05")
+)
+LOOP_MONITOR_INTERVAL = float(
+    getenv_or_action("LOOP_MONITOR_INTERVAL", action="ignore", default="0.5")
+)
+
+# Request profiler
+# Admins profile a request by sending `X-Profile: true` or `?profile=true`, see
+# `GET /debug/profiles`. At most `PROFILER_RATE_LIMIT` requests are profiled per minute by each
+# worker, sampling the stack every `PROFILER_INTERVAL` seconds, and the last
+# `PROFILER_MAX_PROFILES` profiles are kept.
+PROFILER_ENABLE = (
+    getenv_or_action("PROFILER_ENABLE", action="ignore", default="true").lower() == "true"
+)
+PROFILER_INTERVAL = float(getenv_or_action("PROFILER_INTERVAL", action="ignore", default="0.001"))
+PROFILER_RATE_LIMIT = int(getenv_or_action("PROFILER_RATE_LIMIT", action="ignore", default="10"))
+PROFILER_MAX_PROFILES = int(
+    getenv_or_action("PROFILER_MAX_PROFILES", action="ignore", default="50")
+)
 
-jwksurl = urlopen(OIDC_ISSUER_URL + "/jwks/")
-JWS = json.loads(jwksurl.read())
+with timed("jwks"):
+    jwksurl = urlopen(OIDC_ISSUER_URL + "/jwks/")
+    JWS = json.loads(jwksurl.read())
@@ -1,19 +1,196 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any
+
 from app import config
+from app.metrics import track_query
+from loguru import logger
+from tortoise import BaseDBAsyncClient, connections
+from tortoise.backends.asyncpg.client import AsyncpgDBClient, TransactionWrapper
+from tortoise.backends.base.client import TransactionContext, TransactionContextPooled
+
+REPLICA_CONNECTION = "replica"
+
+# Set by the `use_read_replica` dependency on the requests whose reads may be stale
+read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+
+
+def get_connection_config(
+    *,
+    host: str,
+    port: str,
+    user: str,
+    password: str,
+    database: str,
+    min_size: int,
+    max_size: int,
+) -> dict[str, Any]:
+    return {
+        "engine": "app.db",
+        "credentials": {
+            "host": host,
+            "port": port,
+            "user": user,
+            "password": password,
+            "database": database,
+            "minsize": min_size,
+            "maxsize": max_size,
+        },
+    }
+
+
+class QueryMetricsMixin:
+    """
+    Counts the queries run through a Tortoise client, by the ORM or as raw SQL, in the metrics of
+    the current request.
+    """
+
+    async def execute_insert(self, query: str, values: list) -> Any:
+        with track_query():
+            return await super().execute_insert(query, values)
+
+    async def execute_many(self, query: str, values: list) -> None:
+        with track_query():
+            return await super().execute_many(query, values)
+
+    async def execute_query(self, query: str, values: list | None = None) -> tuple[int, list]:
+        with track_query():
+            return await super().execute_query(query, values)
+
+    async def execute_query_dict(self, query: str, values: list | None = None) -> list[dict]:
+        with track_query():
+            return await super().execute_query_dict(query, values)
+
+    async def execute_script(self, query: str) -> None:
+        with track_query():
+            return await super().execute_script(query)
+
+
+class MeteredTransactionWrapper(QueryMetricsMixin, TransactionWrapper):
+    pass
+
+
+class MeteredAsyncpgDBClient(QueryMetricsMixin, AsyncpgDBClient):
+    def _in_transaction(self) -> TransactionContext:
+        return TransactionContextPooled(MeteredTransactionWrapper(self))
+
+
+# Tortoise loads the client of the "app.db" engine from this module
+client_class = MeteredAsyncpgDBClient
+
+
+DB_CONNECTIONS = {
+    "default": get_connection_config(
+        host=config.DATABASE_HOST,
+        port=config.DATABASE_PORT,
+        user=config.DATABASE_USER,
+        password=config.DATABASE_PASSWORD,
+        database=config.DATABASE_NAME,
+        min_size=config.DATABASE_POOL_MIN_SIZE,
+        max_size=config.DATABASE_POOL_MAX_SIZE,
+    ),
+}
+if config.DATABASE_REPLICA_HOST:
+    DB_CONNECTIONS[REPLICA_CONNECTION] = get_connection_config(
+        host=config.DATABASE_REPLICA_HOST,
+        port=config.DATABASE_REPLICA_PORT or config.DATABASE_PORT,
+        user=config.DATABASE_REPLICA_USER or config.DATABASE_USER,
+        password=config.DATABASE_REPLICA_PASSWORD or config.DATABASE_PASSWORD,
+        database=config.DATABASE_REPLICA_NAME or config.DATABASE_NAME,
+        min_size=config.DATABASE_REPLICA_POOL_MIN_SIZE,
+        max_size=config.DATABASE_REPLICA_POOL_MAX_SIZE,
+    )
+
+
+class ReadReplicaRouter:
+    """
+    Sends the ORM reads of the requests marked by `use_read_replica` to the replica. Writes and
+    every other read use the primary.
+    """
+
+    def db_for_read(self, model: type) -> str | None:
+        return REPLICA_CONNECTION if read_from_replica.get() else None
+
+    def db_for_write(self, model: type) -> str | None:
+        return None
+
+
+def get_read_connection(written_at: float | None = None) -> BaseDBAsyncClient:
+    """
+    Gets the connection for read queries, the replica when the request allows stale reads.
+
+    Args:
+        written_at (float | None, optional): Timestamp of a write the read must see. The primary
+            is used while the replica may not have it yet. Defaults to None.
+
+    Returns:
+        BaseDBAsyncClient: The connection.
+    """
+    replica_window = config.DATABASE_REPLICA_MAX_LAG + config.DATABASE_REPLICA_LAG_CHECK_INTERVAL
+    if not read_from_replica.get() or (
+        written_at is not None and time.time() - written_at < replica_window
+    ):
+        return connections.get("default")
+    return connections.get(REPLICA_CONNECTION)
+
+
+class ReplicaMonitor:
+    """
+    Replication lag of the replica, checked at most once every `interval` seconds.
+    """
+
+    query = """
+    SELECT
+      CASE
+        WHEN NOT pg_is_in_recovery()
+        OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+      END AS lag
+    """
+
+    def __init__(self, max_lag: float, interval: float) -> None:
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: float | None = None
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.lag is not None and self.lag <= self.max_lag
+
+    async def check(self) -> bool:
+        """
+        Checks whether the replica is reachable and within the lag tolerance.
+
+        Returns:
+            bool: Whether reads may go to the replica.
+        """
+        async with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.interval:
+                return self.available
+
+            try:
+                rows = await connections.get(REPLICA_CONNECTION).execute_query_dict(self.query)
+                self.lag = float(rows[0]["lag"])
+            except Exception as exc:
+                logger.warning(f"Read replica unavailable, reading from the primary: {exc}")
+                self.lag = None
+            self._checked_at = time.monotonic()
+
+            if self.lag is not None and not self.available:
+                logger.warning(f"Read replica lag is {self.lag:.1f}s, reading from the primary")
+            return self.available
+
+
+replica_monitor = ReplicaMonitor(
+    config.DATABASE_REPLICA_MAX_LAG, config.DATABASE_REPLICA_LAG_CHECK_INTERVAL
+)
 
 TORTOISE_ORM = {
-    "connections": {
-        "default": {
-            "engine": "tortoise.backends.asyncpg",
-            "credentials": {
-                "host": config.DATABASE_HOST,
-                "port": config.DATABASE_PORT,
-                "user": config.DATABASE_USER,
-                "password": config.DATABASE_PASSWORD,
-                "database": config.DATABASE_NAME,
-            },
-        }
-    },
+    "connections": DB_CONNECTIONS,
     "apps": {
         "app": {
             "models": [
@@ -23,4 +200,5 @@ TORTOISE_ORM = {
             "default_connection": "default",
         },
     },
+    "routers": ["app.db.ReadReplicaRouter"],
 }
@@ -1,13 +1,25 @@
 # -*- coding: utf-8 -*-
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 from uuid import UUID
 
+from app import config
+from app.cache import LRUCache
+from app.db import (
+    DB_CONNECTIONS,
+    REPLICA_CONNECTION,
+    read_from_replica,
+    replica_monitor,
+)
+from app.loaders import Loaders
 from app.models import Agent
 from app.oidc import get_current_user
 from app.pydantic_models import OIDCUser, User
 from app.utils import slugify
 from fastapi import Depends, HTTPException, Security, status
 
+# Agents are never deleted through the API, so their ids can be kept for the process lifetime.
+agent_ids = LRUCache("agents", maxsize=config.AUTH_CACHE_SIZE)
+
 
 async def get_user(user_info: Annotated[OIDCUser, Security(get_current_user, scopes=["profile"])]):
     if "vision-ai" not in user_info.groups:
@@ -22,15 +34,18 @@ async def get_user(user_info: Annotated[OIDCUser, Security(get_current_user, sco
     agent_id = UUID("00000000-0000-0000-0000-000000000000")
 
     if is_agent:
-        agent = await Agent.get_or_none(auth_sub=user_info.sub)
-        if agent is None:
-            agent = await Agent.create(
-                name=user_info.nickname,
-                slug=slugify(user_info.nickname),
-                auth_sub=user_info.sub,
-            )
-
-        agent_id = agent.id
+        agent_id = agent_ids.get(user_info.sub)
+        if agent_id is None:
+            agent = await Agent.get_or_none(auth_sub=user_info.sub)
+            if agent is None:
+                agent = await Agent.create(
+                    name=user_info.nickname,
+                    slug=slugify(user_info.nickname),
+                    auth_sub=user_info.sub,
+                )
+
+            agent_id = agent.id
+            agent_ids.set(user_info.sub, agent_id)
 
     return User(
         agent_id=agent_id,
@@ -79,3 +94,26 @@ async def is_human(user: Annotated[User, Depends(get_user)]) -> User:
         )
 
     return user
+
+
+async def use_read_replica(_: Annotated[User, Depends(get_user)]) -> AsyncIterator[None]:
+    """
+    Routes the reads of the request to the read replica while its lag is within
+    `DATABASE_REPLICA_MAX_LAG`. The user is resolved first, so auth always reads the primary.
+    """
+    if REPLICA_CONNECTION not in DB_CONNECTIONS or not await replica_monitor.check():
+        yield
+        return
+
+    token = read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+def get_loaders() -> Loaders:
+    """
+    Creates the relation loaders of a request, so its relations are loaded in batches and once.
+    """
+    return Loaders()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from itertools import chain
+from typing import AsyncIterator
+from uuid import uuid4
+
+from app import config
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class Event:
+    """
+    An event published to the bus. `data` is serialized once and shared by every subscriber.
+    """
+
+    id: str
+    sequence: int
+    type: str
+    object: str
+    data: str
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    """
+    The queue of events of one subscriber, optionally restricted to some objects.
+    """
+
+    def __init__(self, objects: set[str] | None, maxsize: int) -> None:
+        self.objects = objects
+        self.queue: asyncio.Queue[Event | None] = asyncio.Queue(maxsize)
+        self.backlog: list[Event] = []
+        self.reset = False
+
+    def matches(self, event: Event) -> bool:
+        return self.objects is None or event.object in self.objects
+
+    def put(self, event: Event) -> bool:
+        """
+        Queues an event without waiting. When the subscriber is too slow its pending events are
+        dropped and the stream is closed, so it can resume from its last event.
+
+        Returns:
+            bool: Whether the subscriber still receives events.
+        """
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+
+class EventBus:
+    """
+    In-process fan-out of events to streaming subscribers.
+
+    Publishing never waits for subscribers and only visits the ones interested in the object of
+    the event. The last events are kept so a subscriber that reconnects with the id of the last
+    event it received gets the ones it missed. Event ids are only valid in the worker that
+    created them, a subscriber resuming from another worker or from an expired id receives a
+    `reset` event instead.
+    """
+
+    def __init__(self, history_size: int, queue_size: int) -> None:
+        self.id = uuid4().hex[:12]
+        self.queue_size = queue_size
+        self._sequence = 0
+        self._history: deque[Event] = deque(maxlen=history_size)
+        # Subscriptions by object slug, the ones for every object are under None
+        self._subscriptions: defaultdict[str | None, set[Subscription]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(set(chain.from_iterable(self._subscriptions.values())))
+
+    def publish(self, type_: str, object_: str, data: str) -> Event:
+        """
+        Publishes an event to the subscribers of its object.
+
+        Args:
+            type_ (str): The event type.
+            object_ (str): The slug of the object of the event.
+            data (str): The JSON serialized event data.
+
+        Returns:
+            Event: The published event.
+        """
+        self._sequence += 1
+        event = Event(
+            id=f"{self.id}-{self._sequence}",
+            sequence=self._sequence,
+            type=type_,
+            object=object_,
+            data=data,
+        )
+        self._history.append(event)
+
+        subscriptions = chain(
+            tuple(self._subscriptions.get(None, ())), tuple(self._subscriptions.get(object_, ()))
+        )
+        for subscription in subscriptions:
+            if not subscription.put(event):
+                logger.warning("Closing the event stream of a slow subscriber")
+                self.unsubscribe(subscription)
+
+        return event
+
+    def subscribe(
+        self, objects: list[str] | None = None, last_event_id: str | None = None
+    ) -> Subscription:
+        """
+        Subscribes to the events of some objects.
+
+        Args:
+            objects (list[str] | None, optional): The objects slugs. Defaults to every object.
+            last_event_id (str | None, optional): The id of the last event received, to resume
+                from it. Defaults to None.
+
+        Returns:
+            Subscription: The subscription.
+        """
+        subscription = Subscription(set(objects) if objects else None, self.queue_size)
+        for key in subscription.objects or (None,):
+            self._subscriptions[key].add(subscription)
+
+        if last_event_id:
+            bus_id, _, sequence = last_event_id.rpartition("-")
+            oldest = self._history[0].sequence if len(self._history) > 0 else self._sequence + 1
+            if bus_id == self.id and sequence.isdigit() and int(sequence) >= oldest - 1:
+                subscription.backlog = [
+                    event
+                    for event in self._history
+                    if event.sequence > int(sequence) and subscription.matches(event)
+                ]
+            else:
+                subscription.reset = True
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for key in subscription.objects or (None,):
+            self._subscriptions[key].discard(subscription)
+            if len(self._subscriptions[key]) == 0:
+                del self._subscriptions[key]
+
+    async def stream(
+        self,
+        objects: list[str] | None = None,
+        last_event_id: str | None = None,
+        keepalive_interval: float = config.EVENTS_KEEPALIVE_INTERVAL,
+    ) -> AsyncIterator[str]:
+        """
+        Streams events in the Server-Sent Events format until the client disconnects.
+
+        Args:
+            objects (list[str] | None, optional): The objects slugs. Defaults to every object.
+            last_event_id (str | None, optional): The id of the last event received, to resume
+                from it. Defaults to None.
+            keepalive_interval (float, optional): Seconds without events before sending a
+                comment to keep the connection open. Defaults to `EVENTS_KEEPALIVE_INTERVAL`.
+
+        Yields:
+            str: The encoded events.
+        """
+        subscription = self.subscribe(objects=objects, last_event_id=last_event_id)
+        try:
+            if subscription.reset:
+                yield "event: reset\ndata: {}\n\n"
+            for event in subscription.backlog:
+                yield event.encode()
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event is None:
+                    break
+                yield event.encode()
+        finally:
+            self.unsubscribe(subscription)
+
+
+event_bus = EventBus(config.EVENTS_HISTORY_SIZE, config.EVENTS_QUEUE_SIZE)
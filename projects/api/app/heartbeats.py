@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from contextlib import suppress
+from datetime import datetime
+from uuid import UUID
+
+from app import config
+from app.models import Agent
+from loguru import logger
+from tortoise import timezone
+
+
+class HeartbeatBuffer:
+    """
+    Last heartbeat of each agent, kept in memory and written to `Agent.last_heartbeat` in a
+    single batched UPDATE every `interval` seconds instead of once per heartbeat.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._last_seen: dict[UUID, datetime] = {}
+        self._pending: dict[UUID, datetime] = {}
+        self._task: asyncio.Task | None = None
+
+    def record(self, agent_id: UUID, timestamp: datetime) -> None:
+        # Made aware like the values read from the database, so they can be compared
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        self._last_seen[agent_id] = timestamp
+        self._pending[agent_id] = timestamp
+
+    def last_seen(self, agent_id: UUID, default: datetime | None = None) -> datetime | None:
+        """
+        Gets the last heartbeat of an agent, which may not be flushed to the database yet.
+
+        Args:
+            agent_id (UUID): The agent id.
+            default (datetime | None, optional): The last heartbeat stored in the database.
+                Defaults to None.
+
+        Returns:
+            datetime | None: The most recent of both heartbeats.
+        """
+        timestamp = self._last_seen.get(agent_id)
+        if timestamp is None or (default is not None and default > timestamp):
+            return default
+        return timestamp
+
+    async def flush(self) -> int:
+        """
+        Writes the pending heartbeats to the database. They are kept to be written again on the
+        next flush if the update fails or is cancelled.
+
+        Returns:
+            int: The number of agents updated.
+        """
+        if len(self._pending) == 0:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        try:
+            await Agent.bulk_update(
+                [
+                    Agent(id=agent_id, last_heartbeat=timestamp)
+                    for agent_id, timestamp in pending.items()
+                ],
+                fields=["last_heartbeat"],
+            )
+        except BaseException:
+            self._pending = {**pending, **self._pending}
+            raise
+
+        return len(pending)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.error(f"Failed to flush agents heartbeats: {exc}")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            # Waited for, so a flush it was running puts its heartbeats back before the last one
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+
+heartbeats = HeartbeatBuffer(config.HEARTBEAT_FLUSH_INTERVAL)
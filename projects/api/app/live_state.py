@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, Callable
+from uuid import UUID
+
+from app import config
+from app.models import Camera, Identification, Label, Object, Snapshot
+from loguru import logger
+from tortoise import connections, timezone
+
+LATEST_IDENTIFICATIONS_QUERY = """
+SELECT DISTINCT ON (snapshot.camera_id, label.object_id)
+  snapshot.camera_id,
+  label.object_id,
+  identification."id",
+  identification."timestamp",
+  identification.label_explanation,
+  label."id" AS label_id,
+  label."value" AS label,
+  label."text" AS label_text,
+  snapshot."id" AS snapshot_id,
+  snapshot.public_url AS snapshot_url,
+  snapshot."timestamp" AS snapshot_timestamp
+FROM
+  identification
+  INNER JOIN snapshot ON snapshot."id" = identification.snapshot_id
+  INNER JOIN label ON label."id" = identification.label_id
+WHERE
+  identification."timestamp" >= $1
+  {where}
+ORDER BY
+  snapshot.camera_id,
+  label.object_id,
+  identification."timestamp" DESC,
+  identification."id" DESC
+"""
+
+
+def _to_json_datetime(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    # Naive values come from the `datetime.now()` of the routes
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.isoformat()
+
+
+class ObjectState:
+    __slots__ = ("slug", "title", "question", "explanation")
+
+    def __init__(self, slug: str, title: str | None, question: str | None, explanation: str | None):
+        self.slug = slug
+        self.title = title
+        self.question = question
+        self.explanation = explanation
+
+
+class IdentificationState:
+    """
+    The latest identification of an object by a camera, with its values already encoded to JSON.
+    """
+
+    __slots__ = (
+        "id",
+        "timestamp",
+        "json_timestamp",
+        "label_id",
+        "label",
+        "label_text",
+        "label_explanation",
+        "snapshot",
+    )
+
+    def __init__(
+        self,
+        id: UUID,
+        timestamp: datetime,
+        label_id: UUID,
+        label: str,
+        label_text: str,
+        label_explanation: str,
+        snapshot: dict[str, Any],
+    ):
+        self.id = str(id)
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        self.timestamp = timestamp
+        self.json_timestamp = timestamp.isoformat()
+        self.label_id = label_id
+        self.label = label
+        self.label_text = label_text
+        self.label_explanation = label_explanation
+        self.snapshot = snapshot
+
+
+class CameraState:
+    __slots__ = (
+        "id",
+        "name",
+        "rtsp_url",
+        "update_interval",
+        "latitude",
+        "longitude",
+        "object_ids",
+        "identifications",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str | None,
+        rtsp_url: str,
+        update_interval: int,
+        latitude: float,
+        longitude: float,
+    ):
+        self.id = id
+        self.name = name
+        self.rtsp_url = rtsp_url
+        self.update_interval = update_interval
+        self.latitude = latitude
+        self.longitude = longitude
+        self.object_ids: set[UUID] = set()
+        # Latest identification by object id, also of the objects the camera doesn't watch anymore
+        self.identifications: dict[UUID, IdentificationState] = {}
+
+    def set_identification(self, object_id: UUID, identification: IdentificationState) -> None:
+        # Ties are broken by id, like the database query
+        current = self.identifications.get(object_id)
+        if current is None or (current.timestamp, current.id) <= (
+            identification.timestamp,
+            identification.id,
+        ):
+            self.identifications[object_id] = identification
+
+
+def _snapshot_json(id: UUID, camera_id: str, url: str, timestamp: datetime | None) -> dict:
+    return {
+        "id": str(id),
+        "camera_id": camera_id,
+        "image_url": url,
+        "timestamp": _to_json_datetime(timestamp),
+    }
+
+
+class LiveState:
+    """
+    In-memory copy of the cameras dashboard: every camera with its objects and the latest
+    identification of each object in the last `window` minutes.
+
+    It is loaded from the database on first use and every `refresh_interval` seconds, and the
+    routes that change the dashboard update it right after their writes, so `GET /cameras` is
+    built from it without queries. The writes of other processes are only seen on the next
+    reload, so it is meant for single process deployments, see `LIVE_STATE_ENABLE`.
+    """
+
+    def __init__(self, window: int, refresh_interval: float) -> None:
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.loaded = False
+        # When the last load failed, the requests don't load it again before `refresh_interval`
+        self._failed_at: float | None = None
+        self._cameras: dict[str, CameraState] = {}
+        # Camera ids in the order of the dashboard pages
+        self._ids: list[str] = []
+        self._objects: dict[UUID, ObjectState] = {}
+        # Updates made while a reload runs, applied again to the reloaded state
+        self._replay: list[Callable[[], None]] | None = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _apply(self, update: Callable[[], None]) -> None:
+        if self.loaded:
+            update()
+        if self._replay is not None:
+            self._replay.append(update)
+
+    async def _fetch_identifications(
+        self, camera_id: str | None = None
+    ) -> list[tuple[str, UUID, IdentificationState]]:
+        since = timezone.make_aware(datetime.now() - timedelta(minutes=self.window))
+        values: list = [since]
+        where = ""
+        if camera_id is not None:
+            values.append(camera_id)
+            where = "AND snapshot.camera_id = $2"
+        rows = await connections.get("default").execute_query_dict(
+            LATEST_IDENTIFICATIONS_QUERY.format(where=where), values
+        )
+        return [
+            (
+                row["camera_id"],
+                row["object_id"],
+                IdentificationState(
+                    id=row["id"],
+                    timestamp=row["timestamp"],
+                    label_id=row["label_id"],
+                    label=row["label"],
+                    label_text=row["label_text"],
+                    label_explanation=row["label_explanation"],
+                    snapshot=_snapshot_json(
+                        row["snapshot_id"],
+                        row["camera_id"],
+                        row["snapshot_url"],
+                        row["snapshot_timestamp"],
+                    ),
+                ),
+            )
+            for row in rows
+        ]
+
+    async def load(self) -> None:
+        """
+        Loads the whole state from the database, replacing the current one.
+        """
+        async with self._lock:
+            self._replay = []
+            try:
+                conn = connections.get("default")
+                cameras = {
+                    camera["id"]: CameraState(**camera)
+                    for camera in await Camera.all()
+                    .using_db(conn)
+                    .values("id", "name", "rtsp_url", "update_interval", "latitude", "longitude")
+                }
+                objects = {
+                    object_["id"]: ObjectState(
+                        object_["slug"],
+                        object_["title"],
+                        object_["question"],
+                        object_["explanation"],
+                    )
+                    for object_ in await Object.all()
+                    .using_db(conn)
+                    .values("id", "slug", "title", "question", "explanation")
+                }
+                for row in await conn.execute_query_dict(
+                    "SELECT camera_id, object_id FROM camera_object"
+                ):
+                    # Cameras created after they were read are added by the replayed updates
+                    if row["camera_id"] in cameras:
+                        cameras[row["camera_id"]].object_ids.add(row["object_id"])
+                for camera_id, object_id, identification in await self._fetch_identifications():
+                    if camera_id in cameras:
+                        cameras[camera_id].set_identification(object_id, identification)
+
+                self._cameras = cameras
+                self._ids = sorted(cameras)
+                self._objects = objects
+                self.loaded = True
+                for update in self._replay:
+                    update()
+            finally:
+                self._replay = None
+        logger.debug(f"Loaded the live state of {len(self._ids)} cameras")
+
+    async def ensure_loaded(self) -> bool:
+        """
+        Loads the state if it isn't yet. Requests don't wait for a load that is already running,
+        and a failed load isn't tried again before `refresh_interval` seconds, so they fall back
+        to the database instead.
+
+        Returns:
+            bool: Whether the state can be used, False if disabled, loading or failed to load.
+        """
+        if not config.LIVE_STATE_ENABLE:
+            return False
+        if self.loaded or self._lock.locked():
+            return self.loaded
+        if (
+            self._failed_at is not None
+            and time.monotonic() - self._failed_at < self.refresh_interval
+        ):
+            return False
+
+        try:
+            await self.load()
+            self._failed_at = None
+        except Exception as exc:
+            self._failed_at = time.monotonic()
+            logger.error(f"Failed to load the live state: {exc}")
+        return self.loaded
+
+    def get_cameras(
+        self, size: int, minute_interval: int, offset: int = 0, after: str | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Gets a page of the cameras dashboard, like `get_cameras_from_db`.
+
+        Args:
+            size (int): The page size.
+            minute_interval (int): Only identifications in the last minutes are returned. Must
+                not be above the window of the state.
+            offset (int, optional): The number of cameras to skip. Defaults to 0.
+            after (str | None, optional): Only cameras after this id are returned. Defaults to
+                None.
+
+        Returns:
+            list[dict[str, Any]]: The cameras, ready to be encoded to JSON.
+        """
+        since = timezone.make_aware(datetime.now() - timedelta(minutes=minute_interval))
+        start = offset if after is None else bisect_right(self._ids, after) + offset
+        cameras = []
+        end = start + size
+        for camera_id in self._ids[start:end]:
+            camera = self._cameras[camera_id]
+            identifications = sorted(
+                (
+                    (object_id, identification)
+                    for object_id, identification in camera.identifications.items()
+                    if identification.timestamp >= since
+                ),
+                key=lambda item: (item[1].timestamp, item[1].id),
+                reverse=True,
+            )
+            identifications_out = []
+            for object_id, identification in identifications:
+                # Objects created by other processes are only known after the next reload
+                object_ = self._objects.get(object_id)
+                if object_ is None:
+                    continue
+                identifications_out.append(
+                    {
+                        "id": identification.id,
+                        "object": object_.slug,
+                        "title": object_.title,
+                        "question": object_.question,
+                        "explanation": object_.explanation,
+                        "timestamp": identification.json_timestamp,
+                        "label": identification.label,
+                        "label_text": identification.label_text,
+                        "label_explanation": identification.label_explanation,
+                        "snapshot": identification.snapshot,
+                    }
+                )
+            cameras.append(
+                {
+                    "id": camera.id,
+                    "name": camera.name,
+                    "rtsp_url": camera.rtsp_url,
+                    "update_interval": camera.update_interval,
+                    "latitude": camera.latitude,
+                    "longitude": camera.longitude,
+                    "objects": sorted(
+                        self._objects[id].slug for id in camera.object_ids if id in self._objects
+                    ),
+                    "identifications": identifications_out,
+                }
+            )
+        return cameras
+
+    def add_camera(self, camera: Camera) -> None:
+        state = CameraState(
+            id=camera.id,
+            name=camera.name,
+            rtsp_url=camera.rtsp_url,
+            update_interval=camera.update_interval,
+            latitude=camera.latitude,
+            longitude=camera.longitude,
+        )
+
+        def update() -> None:
+            if camera.id not in self._cameras:
+                insort(self._ids, camera.id)
+            self._cameras[camera.id] = state
+
+        self._apply(update)
+
+    def update_camera(self, camera_id: str, values: dict[str, Any]) -> None:
+        """
+        Updates some fields of a camera.
+        """
+
+        def update() -> None:
+            camera = self._cameras.get(camera_id)
+            if camera is not None:
+                for field, value in values.items():
+                    setattr(camera, field, value)
+
+        self._apply(update)
+
+    def remove_camera(self, camera_id: str) -> None:
+        def update() -> None:
+            if self._cameras.pop(camera_id, None) is not None:
+                self._ids.remove(camera_id)
+
+        self._apply(update)
+
+    def add_identification(
+        self, identification: Identification, label: Label, snapshot: Snapshot
+    ) -> None:
+        """
+        Records a created identification if it is the latest of its object in the camera.
+        """
+        camera_id = snapshot.camera_id
+        state = IdentificationState(
+            id=identification.id,
+            timestamp=identification.timestamp,
+            label_id=label.id,
+            label=label.value,
+            label_text=label.text,
+            label_explanation=identification.label_explanation,
+            snapshot=_snapshot_json(
+                snapshot.id, camera_id, snapshot.public_url, snapshot.timestamp
+            ),
+        )
+
+        def update() -> None:
+            camera = self._cameras.get(camera_id)
+            if camera is not None:
+                camera.set_identification(label.object_id, state)
+
+        self._apply(update)
+
+    async def reload_camera(self, camera_id: str) -> None:
+        """
+        Loads the latest identifications of a camera again, after some were deleted.
+        """
+        if not self.loaded and self._replay is None:
+            return
+        identifications = await self._fetch_identifications(camera_id)
+
+        def update() -> None:
+            camera = self._cameras.get(camera_id)
+            if camera is not None:
+                camera.identifications = {}
+                for _, object_id, identification in identifications:
+                    camera.set_identification(object_id, identification)
+
+        self._apply(update)
+
+    async def fetch_label_camera_ids(self, label_id: UUID) -> list[str]:
+        """
+        Gets the cameras with identifications of a label in the window, which must be reloaded
+        after the label is deleted with its identifications.
+        """
+        if not self.loaded and self._replay is None:
+            return []
+        since = timezone.make_aware(datetime.now() - timedelta(minutes=self.window))
+        return (
+            await Identification.filter(label_id=label_id, timestamp__gte=since)
+            .distinct()
+            .values_list("snapshot__camera_id", flat=True)
+        )
+
+    def update_label(self, label: Label) -> None:
+        """
+        Updates the value and text of a label in the identifications.
+        """
+
+        def update() -> None:
+            for camera in self._cameras.values():
+                for identification in camera.identifications.values():
+                    if identification.label_id == label.id:
+                        identification.label = label.value
+                        identification.label_text = label.text
+
+        self._apply(update)
+
+    def set_object(self, object_: Object) -> None:
+        """
+        Adds an object or updates its fields.
+        """
+        state = ObjectState(object_.slug, object_.title, object_.question, object_.explanation)
+
+        def update() -> None:
+            self._objects[object_.id] = state
+
+        self._apply(update)
+
+    def remove_object(self, object_id: UUID) -> None:
+        """
+        Removes a deleted object, with its identifications by every camera.
+        """
+
+        def update() -> None:
+            for camera in self._cameras.values():
+                camera.object_ids.discard(object_id)
+                camera.identifications.pop(object_id, None)
+            self._objects.pop(object_id, None)
+
+        self._apply(update)
+
+    def add_camera_object(self, camera_id: str, object_: Object) -> None:
+        self.set_object(object_)
+
+        def update() -> None:
+            camera = self._cameras.get(camera_id)
+            if camera is not None:
+                camera.object_ids.add(object_.id)
+
+        self._apply(update)
+
+    def remove_camera_object(self, camera_id: str, object_id: UUID) -> None:
+        def update() -> None:
+            camera = self._cameras.get(camera_id)
+            if camera is not None:
+                camera.object_ids.discard(object_id)
+
+        self._apply(update)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as exc:
+                logger.error(f"Failed to reload the live state: {exc}")
+
+    async def start(self) -> None:
+        if not config.LIVE_STATE_ENABLE or self._task is not None:
+            return
+        await self.ensure_loaded()
+        # Also started when the first load failed, so the state is loaded on the next reload
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+live_state = LiveState(config.LIVE_STATE_WINDOW, config.LIVE_STATE_REFRESH_INTERVAL)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+from uuid import UUID
+
+from app.models import Label, PromptObject
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """
+    Batches the keys loaded in the same iteration of the event loop into a single call of
+    `batch_fn`, so resolving a relation for a list of items runs one query instead of one per
+    item. Results are cached by key for the lifetime of the loader, usually one request.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[K]], Awaitable[dict[K, V]]],
+        default_factory: Callable[[], V],
+    ) -> None:
+        self.batch_fn = batch_fn
+        self.default_factory = default_factory
+        self._futures: dict[K, asyncio.Future[V]] = {}
+        self._queue: list[K] = []
+        self._task: asyncio.Task | None = None
+
+    async def load(self, key: K) -> V:
+        """
+        Loads the value of a key, batched with the other keys loaded concurrently.
+
+        Args:
+            key (K): The key.
+
+        Returns:
+            V: The value, or a new default value if `batch_fn` didn't return the key.
+        """
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                loop.call_soon(self._schedule_dispatch)
+        return await future
+
+    async def load_many(self, keys: list[K]) -> list[V]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _schedule_dispatch(self) -> None:
+        self._task = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        try:
+            values = await self.batch_fn(keys)
+        except Exception as exc:
+            for key in keys:
+                # Not cached, so the keys can be loaded again
+                self._futures.pop(key).set_exception(exc)
+            return
+
+        for key in keys:
+            value = values[key] if key in values else self.default_factory()
+            self._futures[key].set_result(value)
+
+
+async def load_object_labels(object_ids: list[UUID]) -> dict[UUID, list[Label]]:
+    """
+    Loads the labels of some objects, in their order.
+
+    Args:
+        object_ids (list[UUID]): The objects ids.
+
+    Returns:
+        dict[UUID, list[Label]]: The labels by object id.
+    """
+    labels: dict[UUID, list[Label]] = defaultdict(list)
+    for label in await Label.filter(object_id__in=object_ids).order_by("order"):
+        labels[label.object_id].append(label)
+    return labels
+
+
+async def load_prompt_object_slugs(prompt_ids: list[UUID]) -> dict[UUID, list[str]]:
+    """
+    Loads the slugs of the objects of some prompts, in their order.
+
+    Args:
+        prompt_ids (list[UUID]): The prompts ids.
+
+    Returns:
+        dict[UUID, list[str]]: The objects slugs by prompt id.
+    """
+    slugs: dict[UUID, list[str]] = defaultdict(list)
+    rows = (
+        await PromptObject.filter(prompt_id__in=prompt_ids)
+        .order_by("order")
+        .values_list("prompt_id", "object__slug")
+    )
+    for prompt_id, slug in rows:
+        slugs[prompt_id].append(slug)
+    return slugs
+
+
+class Loaders:
+    """
+    The relation loaders of a request, got through the `get_loaders` dependency.
+    """
+
+    def __init__(self) -> None:
+        self.object_labels = DataLoader(load_object_labels, list)
+        self.prompt_object_slugs = DataLoader(load_prompt_object_slugs, list)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from asyncio.events import Handle
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from app import config
+from app.metrics import (
+    EVENT_LOOP_BLOCKED,
+    EVENT_LOOP_LAG,
+    EVENT_LOOP_SLOW_CALLBACKS,
+    request_route,
+)
+from loguru import logger
+
+APP_DIR = str(Path(__file__).parent)
+# Route of the callbacks that don't run on behalf of a request, like the background tasks
+BACKGROUND_ROUTE = "<background>"
+
+
+@dataclass
+class SlowCallbackStats:
+    """
+    Callbacks of a route that blocked the event loop at the same location.
+    """
+
+    route: str
+    location: str
+    count: int = 0
+    total_duration: float = 0.0
+    max_duration: float = 0.0
+    # Stack of the slowest callback, from the outermost frame
+    stack: list[str] = field(default_factory=list)
+
+
+def format_stack(stack: traceback.StackSummary) -> list[str]:
+    return [f"{frame.filename}:{frame.lineno} in {frame.name}" for frame in stack]
+
+
+def describe_callback(handle: Handle) -> traceback.StackSummary:
+    """
+    Describes a callback that blocked too briefly for the watchdog to sample its stack, by the
+    coroutine of its task or the function itself.
+    """
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if isinstance(task, asyncio.Task):
+        callback = task.get_coro()
+    code = getattr(callback, "cr_code", None) or getattr(callback, "__code__", None)
+    if code is None:
+        return traceback.StackSummary.from_list([("<unknown>", 0, repr(callback), None)])
+    return traceback.StackSummary.from_list(
+        [(code.co_filename, code.co_firstlineno, code.co_qualname, None)]
+    )
+
+
+class LoopMonitor:
+    """
+    Opt-in detector of the work that blocks the event loop, enabled by `LOOP_MONITOR_ENABLE`.
+
+    Every callback run by the loop is timed and the ones that take longer than `slow_callback`
+    seconds are grouped by the route of the request they ran for and the innermost frame of
+    the API code they were stuck in. That frame comes from the stack of the loop thread,
+    sampled by a watchdog thread while the callback is still running, so it points at the
+    blocking call instead of the coroutine that made it. The lag of the loop is probed every
+    `interval` seconds.
+    """
+
+    def __init__(self, slow_callback: float, interval: float, lag_samples: int = 1000) -> None:
+        self.slow_callback = slow_callback
+        self.interval = interval
+        self.slow_callbacks: dict[tuple[str, str], SlowCallbackStats] = {}
+        self.lags: deque[float] = deque(maxlen=lag_samples)
+        self.max_lag = 0.0
+        # Callback being run by the loop with its start, read by the watchdog
+        self._running: tuple[Handle, float] | None = None
+        # Stacks sampled by the watchdog by callback, until the callback ends
+        self._stacks: dict[int, traceback.StackSummary] = {}
+        self._thread_id: int | None = None
+        self._original_run: Callable[[Handle], None] | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._original_run is not None
+
+    def reset(self) -> None:
+        self.slow_callbacks = {}
+        self.lags.clear()
+        self.max_lag = 0.0
+
+    def report(self, limit: int | None = None) -> dict[str, Any]:
+        """
+        Reports the lag of the loop and the slow callbacks, ranked by the total time they
+        blocked the loop.
+
+        Args:
+            limit (int | None, optional): The maximum number of slow callbacks. Defaults to None.
+
+        Returns:
+            dict[str, Any]: The report, like an `EventLoopReportOut`.
+        """
+        lags = sorted(self.lags)
+
+        def percentile(quantile: float) -> float | None:
+            if len(lags) == 0:
+                return None
+            return lags[min(int(quantile * len(lags)), len(lags) - 1)]
+
+        slow_callbacks = sorted(
+            self.slow_callbacks.values(), key=lambda stats: stats.total_duration, reverse=True
+        )
+        return {
+            "slow_callback": self.slow_callback,
+            "lag": {
+                "samples": len(lags),
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": self.max_lag,
+            },
+            "slow_callbacks": [asdict(stats) for stats in slow_callbacks[:limit]],
+        }
+
+    def _record(self, handle: Handle, route: str | None, duration: float) -> None:
+        route = route or BACKGROUND_ROUTE
+        stack = self._stacks.pop(id(handle), None) or describe_callback(handle)
+
+        # The innermost frame of the API, skipping the libraries it called
+        frame = next(
+            (frame for frame in reversed(stack) if frame.filename.startswith(APP_DIR)),
+            stack[-1],
+        )
+        location = f"{frame.filename}:{frame.lineno} in {frame.name}"
+
+        key = (route, location)
+        stats = self.slow_callbacks.get(key)
+        if stats is None:
+            stats = self.slow_callbacks[key] = SlowCallbackStats(route=route, location=location)
+            logger.warning(f"Event loop blocked for {duration:.3f}s by {location} in {route}")
+        stats.count += 1
+        stats.total_duration += duration
+        if duration >= stats.max_duration:
+            stats.max_duration = duration
+            stats.stack = format_stack(stack)
+        EVENT_LOOP_SLOW_CALLBACKS.labels(route).inc()
+        EVENT_LOOP_BLOCKED.labels(route).inc(duration)
+
+    def _install(self) -> None:
+        monitor = self
+        original_run = Handle._run
+
+        def _run(handle: Handle) -> None:
+            if threading.get_ident() != monitor._thread_id:
+                original_run(handle)
+                return
+
+            # Restored after the callback, since `nest_asyncio` runs callbacks inside callbacks
+            previous = monitor._running
+            # Read before the callback, which may finish the request and start another one
+            route = handle._context.get(request_route)
+            start = time.perf_counter()
+            monitor._running = (handle, start)
+            try:
+                original_run(handle)
+            finally:
+                monitor._running = previous
+                duration = time.perf_counter() - start
+                if duration >= monitor.slow_callback:
+                    monitor._record(handle, route, duration)
+                else:
+                    monitor._stacks.pop(id(handle), None)
+
+        self._original_run = original_run
+        Handle._run = _run
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.slow_callback / 2):
+            running = self._running
+            if running is None:
+                continue
+            handle, start = running
+            if time.perf_counter() - start < self.slow_callback or id(handle) in self._stacks:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stacks[id(handle)] = traceback.extract_stack(frame)
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+
+    async def start(self) -> None:
+        if not config.LOOP_MONITOR_ENABLE or self.enabled:
+            return
+
+        self._thread_id = threading.get_ident()
+        self._install()
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        self._task = asyncio.create_task(self._probe())
+        logger.info(f"Monitoring callbacks that block the event loop for {self.slow_callback}s")
+
+    async def stop(self) -> None:
+        if not self.enabled:
+            return
+
+        Handle._run = self._original_run
+        self._original_run = None
+        self._stopped.set()
+        self._watchdog.join()
+        self._task.cancel()
+        self._task = None
+        self._stacks = {}
+
+
+loop_monitor = LoopMonitor(config.LOOP_MONITOR_SLOW_CALLBACK, config.LOOP_MONITOR_INTERVAL)
@@ -3,13 +3,17 @@ import sys
 
 import sentry_sdk
 from app import config
+from app.cache import init_cache
 from app.db import TORTOISE_ORM
+from app.heartbeats import heartbeats
+from app.live_state import live_state
+from app.loop_monitor import loop_monitor
+from app.metrics import MetricsMiddleware, get_metrics
 from app.oidc import AuthError
-from app.routers import agents, auth, cameras, identifications, objects, prompts
+from app.profiler import ProfilerMiddleware
+from app.routers import agents, auth, cameras, debug, identifications, objects, prompts
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
 from fastapi_pagination import add_pagination
 from loguru import logger
 from starlette.responses import JSONResponse
@@ -46,13 +50,28 @@ app.add_middleware(
     allow_credentials=config.ALLOW_CREDENTIALS,
 )
 
+# Inside the metrics middleware, so the profiled requests are also measured
+app.add_middleware(ProfilerMiddleware)
+
+# Added last so it is the outermost middleware and also measures the CORS preflight requests
+app.add_middleware(MetricsMiddleware)
+
+app.add_route("/metrics", get_metrics, include_in_schema=False)
 app.include_router(auth.router)
 app.include_router(agents.router)
 app.include_router(cameras.router)
 app.include_router(objects.router)
 app.include_router(prompts.router)
 app.include_router(identifications.router)
+app.include_router(debug.router)
 
+# Registered first, so the rest of the startup is also monitored
+app.add_event_handler("startup", loop_monitor.start)
+app.add_event_handler("shutdown", loop_monitor.stop)
+# Registered before Tortoise, so the pending heartbeats are flushed before its connections close
+app.add_event_handler("startup", heartbeats.start)
+app.add_event_handler("shutdown", heartbeats.stop)
+app.add_event_handler("shutdown", live_state.stop)
 
 register_tortoise(
     app,
@@ -63,8 +82,13 @@ register_tortoise(
 
 add_pagination(app)
 
+# Registered after Tortoise, which the live state loads from
+app.add_event_handler("startup", live_state.start)
+# Registered last, so the timings include the startup of the database and the live state
+app.add_event_handler("startup", config.log_startup_timings)
+
 
-FastAPICache.init(InMemoryBackend())
+init_cache()
 
 
 @app.exception_handler(AuthError)
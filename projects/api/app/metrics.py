@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = Counter(
+    "api_requests_total",
+    "Number of requests by route and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "api_request_duration_seconds",
+    "Request latency by route.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "api_requests_in_progress",
+    "Number of requests being handled by route.",
+    ["method", "route"],
+)
+RESPONSE_SIZE = Histogram(
+    "api_response_size_bytes",
+    "Response body size by route.",
+    ["method", "route"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "api_request_db_queries",
+    "Number of SQL queries run by a request, by route.",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_DURATION = Histogram(
+    "api_request_db_duration_seconds",
+    "Time spent running SQL queries by a request, by route.",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+CACHE_REQUESTS = Counter(
+    "api_cache_requests_total",
+    "Number of cache lookups by cache and result.",
+    ["cache", "result"],
+)
+COALESCED_CALLS = Counter(
+    "api_coalesced_calls_total",
+    "Number of calls that awaited the result of a concurrent call with the same arguments.",
+    ["function"],
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "api_event_loop_lag_seconds",
+    "Delay of the event loop to wake up a sleeping task, probed by the loop monitor.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EVENT_LOOP_SLOW_CALLBACKS = Counter(
+    "api_event_loop_slow_callbacks_total",
+    "Number of callbacks that blocked the event loop, by route.",
+    ["route"],
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "api_event_loop_blocked_seconds_total",
+    "Time the event loop was blocked by slow callbacks, by route.",
+    ["route"],
+)
+
+
+@dataclass
+class QueryStats:
+    """
+    SQL queries run while handling a request.
+    """
+
+    count: int = 0
+    duration: float = 0.0
+
+
+# Set by `MetricsMiddleware` for each request, the queries outside a request aren't counted
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# Method and route path of the current request, set by `MetricsMiddleware`
+request_route: ContextVar[str | None] = ContextVar("request_route", default=None)
+
+
+@contextmanager
+def track_query() -> Iterator[None]:
+    """
+    Counts a SQL query and its duration in the stats of the current request.
+    """
+    stats = query_stats.get()
+    if stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+
+
+def get_route_path(scope: Scope) -> str:
+    """
+    Gets the path template of the route that handles a request, so the metrics of every camera
+    or identification are grouped together.
+
+    Args:
+        scope (Scope): The request scope.
+
+    Returns:
+        str: The route path or `UNMATCHED_ROUTE`.
+    """
+    partial = None
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, response size and SQL queries of every HTTP request by route.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = get_route_path(scope)
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        route_token = request_route.set(f"{method} {route}")
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            query_stats.reset(token)
+            request_route.reset(route_token)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_DURATION.labels(method, route).observe(duration)
+            RESPONSE_SIZE.labels(method, route).observe(size)
+            REQUEST_DB_QUERIES.labels(method, route).observe(stats.count)
+            REQUEST_DB_DURATION.labels(method, route).observe(stats.duration)
+
+
+async def get_metrics(request: Request) -> Response:
+    """
+    Exposes the metrics in the Prometheus text format.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -29,18 +29,24 @@ class Camera(Model):
 class Snapshot(Model):
     id = fields.UUIDField(pk=True)
     public_url = fields.CharField(max_length=255)
-    timestamp = fields.DatetimeField(null=True)
+    timestamp = fields.DatetimeField(null=True, index=True)
     camera = fields.ForeignKeyField("app.Camera")
     identifications = fields.ReverseRelation["Identification"]
 
+    class Meta:
+        indexes = (("camera_id", "timestamp"),)
+
 
 class Identification(Model):
     id = fields.UUIDField(pk=True)
     snapshot = fields.ForeignKeyField("app.Snapshot")
     label = fields.ForeignKeyField("app.Label")
-    timestamp = fields.DatetimeField()
+    timestamp = fields.DatetimeField(index=True)
     label_explanation = fields.TextField()
 
+    class Meta:
+        indexes = (("snapshot_id",),)
+
 
 class IdentificationMaker(Model):
     id = fields.UUIDField(pk=True)
@@ -50,6 +56,7 @@ class IdentificationMaker(Model):
 
     class Meta:
         table = "identification_marker"
+        indexes = (("identification_id",),)
 
 
 class WhitelistIdentification(Model):
@@ -59,6 +66,7 @@ class WhitelistIdentification(Model):
 
     class Meta:
         table = "whitelist_identification"
+        indexes = (("identification_id", "username"),)
 
 
 class UserIdentification(Model):
@@ -73,6 +81,19 @@ class UserIdentification(Model):
         unique_together = ("username", "identification")
 
 
+# Human identifications of marked identifications counted by snapshot and label. It is kept
+# up to date by `app.utils.refresh_human_identification_aggregate`.
+class HumanIdentificationAggregate(Model):
+    id = fields.UUIDField(pk=True)
+    snapshot = fields.ForeignKeyField("app.Snapshot")
+    label = fields.ForeignKeyField("app.Label")
+    count = fields.IntField()
+
+    class Meta:
+        table = "human_identification_aggregate"
+        unique_together = (("snapshot", "label"),)
+
+
 class HideIdentification(Model):
     id = fields.UUIDField(pk=True)
     timestamp = fields.DatetimeField()
@@ -1,16 +1,20 @@
 # -*- coding: utf-8 -*-
+import hashlib
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Annotated
 
 from app import config
+from app.cache import LRUCache, counted_cache, single_flight
 from app.pydantic_models import OIDCUser, Token
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi_cache.decorator import cache
 from httpx import AsyncClient
-from jose import jwt
+from jose import jwk, jwt
+from jose.backends.base import Key
 
 oidc_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+verified_tokens = LRUCache("tokens", maxsize=config.AUTH_CACHE_SIZE)
 
 
 class AuthError(Exception):
@@ -19,7 +23,8 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
-@cache(expire=60 * 45)
+@single_flight()
+@counted_cache("user_tokens", expire=60 * 45)
 async def get_user_token(username: str, password: str) -> tuple[str, str, float]:
     async with AsyncClient() as client:
         response = await client.post(
@@ -48,7 +53,39 @@ async def authenticate_user(form_data: OAuth2PasswordRequestForm) -> Token:
     return Token(access_token=token, token_type=token_type, expires_in=expires_in.seconds)
 
 
+@lru_cache(maxsize=1)
+def get_jws_keys() -> dict[str, tuple[Key, str]]:
+    """
+    Parses the OIDC issuer public keys once and indexes them by `kid`.
+
+    Returns:
+        dict[str, tuple[Key, str]]: The key and its algorithm for each `kid`.
+    """
+    return {
+        key["kid"]: (
+            jwk.construct(
+                {
+                    "kty": key["kty"],
+                    "kid": key["kid"],
+                    "use": key["use"],
+                    "n": key["n"],
+                    "e": key["e"],
+                },
+                key["alg"],
+            ),
+            key["alg"],
+        )
+        for key in config.JWS["keys"]
+    }
+
+
 async def get_current_user(authorization_header: Annotated[str, Depends(oidc_scheme)]):
+    # Agents send the same token on every call, so verified tokens are kept until they expire.
+    token_hash = hashlib.sha256(authorization_header.encode()).hexdigest()
+    user = verified_tokens.get(token_hash)
+    if user is not None:
+        return user
+
     try:
         unverified_header = jwt.get_unverified_header(authorization_header)
     except Exception:
@@ -57,20 +94,8 @@ async def get_current_user(authorization_header: Annotated[str, Depends(oidc_sch
             401,
         )
 
-    rsa_key = {}
-    algorithms = ""
-    for key in config.JWS["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"],
-            }
-            algorithms = key["alg"]
-
-    if not rsa_key:
+    keys = get_jws_keys()
+    if unverified_header.get("kid") not in keys:
         raise AuthError(
             {
                 "code": "invalid_rsa",
@@ -78,6 +103,7 @@ async def get_current_user(authorization_header: Annotated[str, Depends(oidc_sch
             },
             401,
         )
+    rsa_key, algorithms = keys[unverified_header["kid"]]
 
     try:
         payload = jwt.decode(
@@ -106,4 +132,7 @@ async def get_current_user(authorization_header: Annotated[str, Depends(oidc_sch
             401,
         )
 
-    return OIDCUser(**payload)
+    user = OIDCUser(**payload)
+    verified_tokens.set(token_hash, user, expires_at=user.exp)
+
+    return user
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import base64
+import binascii
+import json
+from math import ceil
+from typing import Any, Generic, Sequence, TypeVar
+
+from fastapi import HTTPException, Query, status
+from fastapi_pagination import Page
+from fastapi_pagination.default import Params
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class BigParams(Params):
+    size: int = Query(100, ge=1, le=3000)
+
+
+class CursorParams(BaseModel):
+    cursor: str | None = Query(
+        None,
+        description=(
+            "Enables cursor pagination. Send it empty to get the first page and then the "
+            "`next_cursor` of the previous page. `page` is ignored in this mode."
+        ),
+    )
+    include_total: bool = Query(
+        False, description="Counts the total of items in cursor pagination mode."
+    )
+
+    @property
+    def enabled(self) -> bool:
+        return self.cursor is not None
+
+
+class BigPage(Page[T], Generic[T]):
+    next_cursor: str | None = None
+
+    __params_type__ = BigParams
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encodes the sort key of the last item of a page into an opaque cursor.
+
+    Args:
+        *values (Any): The values of the sort key, in the ordering of the query.
+
+    Returns:
+        str: The cursor.
+    """
+    data = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any] | None:
+    """
+    Decodes a cursor created by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor. An empty cursor means the first page.
+        length (int): The number of values expected in the cursor.
+
+    Returns:
+        list[Any] | None: The values of the sort key or None for the first page.
+    """
+    if cursor == "":
+        return None
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != length:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+    return values
+
+
+def create_cursor_page(
+    items: Sequence[T],
+    params: BigParams,
+    next_cursor: str | None,
+    total: int | None = None,
+) -> BigPage[T]:
+    """
+    Creates a page for the cursor pagination mode.
+
+    Args:
+        items (Sequence[T]): The items of the page.
+        params (BigParams): The pagination parameters.
+        next_cursor (str | None): The cursor of the next page, None if it is the last one.
+        total (int | None, optional): The total of items, when requested. Defaults to None.
+
+    Returns:
+        BigPage[T]: The page.
+    """
+    return BigPage(
+        items=items,
+        total=total,
+        page=None,
+        size=params.size,
+        pages=None,
+        next_cursor=next_cursor,
+    )
+
+
+def create_page_dict(items: list[Any], params: BigParams, total: int) -> dict[str, Any]:
+    """
+    Creates a page like `create_page` as a dict, for items that are already serialized and
+    don't need to be validated by the page model.
+
+    Args:
+        items (list[Any]): The items of the page.
+        params (BigParams): The pagination parameters.
+        total (int): The total of items.
+
+    Returns:
+        dict[str, Any]: The page, like a `BigPage`.
+    """
+    return {
+        "items": items,
+        "total": total,
+        "page": params.page,
+        "size": params.size,
+        "pages": ceil(total / params.size),
+        "next_cursor": None,
+    }
+
+
+def create_cursor_page_dict(
+    items: list[Any],
+    params: BigParams,
+    next_cursor: str | None,
+    total: int | None = None,
+) -> dict[str, Any]:
+    """
+    Creates a page like `create_cursor_page` as a dict, for items that are already serialized.
+
+    Args:
+        items (list[Any]): The items of the page.
+        params (BigParams): The pagination parameters.
+        next_cursor (str | None): The cursor of the next page, None if it is the last one.
+        total (int | None, optional): The total of items, when requested. Defaults to None.
+
+    Returns:
+        dict[str, Any]: The page, like a `BigPage`.
+    """
+    return {
+        "items": items,
+        "total": total,
+        "page": None,
+        "size": params.size,
+        "pages": None,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Sampling profiler for individual requests. Admins profile a request by sending the
+`X-Profile: true` header or the `profile=true` query parameter. The response carries the id
+of the profile in `X-Profile-Id`, to read it from `GET /debug/profiles/{profile_id}`, or the
+reason it wasn't profiled in `X-Profile-Skipped`.
+
+Requests without the flag only pay for looking for it, so the profiler can stay enabled in
+production. Each worker profiles at most `PROFILER_RATE_LIMIT` requests per minute.
+"""
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import uuid4
+
+from app import config
+from app.metrics import get_route_path
+from app.oidc import AuthError, get_current_user
+from loguru import logger
+from pyinstrument import Profiler
+from pyinstrument.session import Session
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SKIPPED_HEADER = "X-Profile-Skipped"
+# Window of `PROFILER_RATE_LIMIT`, in seconds
+RATE_LIMIT_PERIOD = 60
+
+
+@dataclass
+class RequestProfile:
+    id: str
+    method: str
+    route: str
+    path: str
+    status: int
+    timestamp: datetime
+    duration: float
+    session: Session
+
+
+def is_profile_requested(scope: Scope) -> bool:
+    """
+    Checks the profile flag of a request, looking at the raw headers and query string first so
+    the requests without it aren't parsed.
+
+    Args:
+        scope (Scope): The request scope.
+
+    Returns:
+        bool: Whether the request asks to be profiled.
+    """
+    has_header = any(name == PROFILE_HEADER.encode() for name, _ in scope["headers"])
+    if not has_header and PROFILE_QUERY_PARAM.encode() not in scope["query_string"]:
+        return False
+
+    flag = Headers(scope=scope).get(PROFILE_HEADER)
+    if flag is None:
+        flag = QueryParams(scope["query_string"]).get(PROFILE_QUERY_PARAM)
+    return flag is not None and flag.lower() in ("true", "1")
+
+
+async def is_admin_request(scope: Scope) -> bool:
+    """
+    Checks that a request is authenticated as an admin, before the routes check it, so only
+    admins are profiled.
+    """
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+
+    try:
+        user = await get_current_user(token)
+    except AuthError:
+        return False
+    return "vision-ai" in user.groups and "vision-ai-admin" in user.groups
+
+
+class RequestProfiler:
+    """
+    Keeps the last `PROFILER_MAX_PROFILES` request profiles of this worker and rate limits new
+    ones to `PROFILER_RATE_LIMIT` per minute.
+    """
+
+    def __init__(self) -> None:
+        self.profiles: OrderedDict[str, RequestProfile] = OrderedDict()
+        self._started: deque[float] = deque()
+
+    def get(self, profile_id: str) -> RequestProfile | None:
+        return self.profiles.get(profile_id)
+
+    def list(self) -> list[RequestProfile]:
+        """Lists the profiles, from the newest."""
+        return list(reversed(self.profiles.values()))
+
+    def clear(self) -> None:
+        self.profiles.clear()
+        self._started.clear()
+
+    def acquire(self) -> bool:
+        """
+        Takes a slot of the rate limit.
+
+        Returns:
+            bool: Whether a request can be profiled now.
+        """
+        now = time.monotonic()
+        while self._started and self._started[0] <= now - RATE_LIMIT_PERIOD:
+            self._started.popleft()
+        if len(self._started) >= config.PROFILER_RATE_LIMIT:
+            return False
+        self._started.append(now)
+        return True
+
+    def add(self, profile: RequestProfile) -> None:
+        self.profiles[profile.id] = profile
+        while len(self.profiles) > config.PROFILER_MAX_PROFILES:
+            self.profiles.popitem(last=False)
+
+
+request_profiler = RequestProfiler()
+
+
+class ProfilerMiddleware:
+    """
+    Profiles the requests flagged by admins with a sampling profiler, see `app.profiler`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not config.PROFILER_ENABLE or not is_profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not await is_admin_request(scope):
+            await self.app(
+                scope, receive, self._with_header(send, PROFILE_SKIPPED_HEADER, "forbidden")
+            )
+            return
+        if not request_profiler.acquire():
+            logger.warning(f"Skipped profiling {scope['path']}, rate limit reached")
+            await self.app(
+                scope, receive, self._with_header(send, PROFILE_SKIPPED_HEADER, "rate-limited")
+            )
+            return
+
+        profile_id = uuid4().hex
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profiler = Profiler(interval=config.PROFILER_INTERVAL, async_mode="enabled")
+        timestamp = datetime.now()
+        profiler.start()
+        try:
+            await self.app(
+                scope, receive, self._with_header(send_wrapper, PROFILE_ID_HEADER, profile_id)
+            )
+        finally:
+            session = profiler.stop()
+            request_profiler.add(
+                RequestProfile(
+                    id=profile_id,
+                    method=scope["method"],
+                    route=get_route_path(scope),
+                    path=scope["path"],
+                    status=status_code,
+                    timestamp=timestamp,
+                    duration=session.duration,
+                    session=session,
+                )
+            )
+            logger.info(f"Profiled {scope['method']} {scope['path']} as {profile_id}")
+
+    @staticmethod
+    def _with_header(send: Send, name: str, value: str) -> Send:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                MutableHeaders(scope=message)[name] = value
+            await send(message)
+
+        return send_wrapper
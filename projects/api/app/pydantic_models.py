@@ -78,6 +78,26 @@ class SnapshotOut(BaseModel):
     timestamp: datetime | None
 
 
+class SnapshotBulkItemIn(SnapshotIn):
+    camera_id: str
+
+
+class SnapshotBulkIn(BaseModel):
+    snapshots: list[SnapshotBulkItemIn]
+
+
+class SnapshotBulkItemOut(BaseModel):
+    camera_id: str
+    status_code: int
+    detail: str | None
+    snapshot: SnapshotOut | None
+
+
+class SnapshotBulkOut(BaseModel):
+    count: int
+    items: list[SnapshotBulkItemOut]
+
+
 class IdentificationOut(BaseModel):
     id: UUID
     object: str
@@ -91,6 +111,29 @@ class IdentificationOut(BaseModel):
     snapshot: SnapshotOut
 
 
+class IdentificationBulkItemIn(BaseModel):
+    object: str
+    label: str
+    label_explanation: str
+
+
+class IdentificationBulkIn(BaseModel):
+    objects: list[IdentificationBulkItemIn]
+
+
+class IdentificationBulkItemOut(BaseModel):
+    object: str
+    label: str
+    status_code: int
+    detail: str | None
+    identification: IdentificationOut | None
+
+
+class IdentificationBulkOut(BaseModel):
+    count: int
+    items: list[IdentificationBulkItemOut]
+
+
 class IdentificationHumanIN(BaseModel):
     identification_id: UUID
     label: str
@@ -195,6 +238,16 @@ class PromptsOut(BaseModel):
     prompts: list[PromptOut]
 
 
+class CompiledPrompt(BaseModel):
+    id: UUID
+    model: str
+    prompt_text: str
+    max_output_token: int
+    temperature: float
+    top_k: int
+    top_p: float
+
+
 class PredictOut(BaseModel):
     error: bool
     message: str | None
@@ -228,6 +281,12 @@ class HideOut(BaseModel):
     ids: list[UUID]
 
 
+class HideEventOut(BaseModel):
+    identification_id: UUID
+    object: str
+    timestamp: datetime
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -253,6 +312,38 @@ class OIDCUser(BaseModel):
     groups: list[str]
 
 
+class EventLoopLagOut(BaseModel):
+    samples: int
+    p50: float | None
+    p99: float | None
+    max: float
+
+
+class SlowCallbackOut(BaseModel):
+    route: str
+    location: str
+    count: int
+    total_duration: float
+    max_duration: float
+    stack: list[str]
+
+
+class EventLoopReportOut(BaseModel):
+    slow_callback: float
+    lag: EventLoopLagOut
+    slow_callbacks: list[SlowCallbackOut]
+
+
+class RequestProfileOut(BaseModel):
+    id: str
+    method: str
+    route: str
+    path: str
+    status: int
+    timestamp: datetime
+    duration: float
+
+
 User.update_forward_refs()
 AgentOut.update_forward_refs()
 CameraIdentificationOut.update_forward_refs()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from typing import Any
+
+from app.metrics import track_query
+from asyncpg import Record
+from tortoise import BaseDBAsyncClient
+
+# Flat columns of an identification with its label, object and snapshot
+IDENTIFICATION_COLUMNS = """
+  identification."id",
+  identification."timestamp",
+  identification.label_explanation,
+  label."value" AS label,
+  label."text" AS label_text,
+  "object".slug AS "object",
+  "object".title,
+  "object".question,
+  "object".explanation,
+  snapshot."id" AS snapshot_id,
+  snapshot.camera_id,
+  snapshot.public_url AS snapshot_url,
+  snapshot."timestamp" AS snapshot_timestamp
+"""
+
+IDENTIFICATION_JOINS = """
+  INNER JOIN snapshot ON snapshot."id" = identification.snapshot_id
+  INNER JOIN label ON label."id" = identification.label_id
+  INNER JOIN "object" ON "object"."id" = label.object_id
+"""
+
+
+async def fetch_records(conn: BaseDBAsyncClient, query: str, *values: Any) -> list[Record]:
+    """
+    Runs a query directly on the asyncpg connection of a Tortoise client, skipping the dicts
+    built by `execute_query_dict`. asyncpg prepares the statement the first time a connection
+    runs it and reuses it afterwards.
+
+    Args:
+        conn (BaseDBAsyncClient): The Tortoise client, e.g. from `get_read_connection`.
+        query (str): The query.
+        *values (Any): The query values.
+
+    Returns:
+        list[Record]: The rows.
+    """
+    async with conn.acquire_connection() as connection:
+        with track_query():
+            return await connection.fetch(query, *values)
+
+
+async def fetch_value(conn: BaseDBAsyncClient, query: str, *values: Any) -> Any:
+    """
+    Runs a query like `fetch_records` and returns the first column of its first row.
+    """
+    async with conn.acquire_connection() as connection:
+        with track_query():
+            return await connection.fetchval(query, *values)
+
+
+def identification_record_to_json(record: Record) -> dict[str, Any]:
+    """
+    Nests a row of `IDENTIFICATION_COLUMNS` like an `IdentificationOut`, ready for
+    `ORJSONResponse`. The datetimes are kept as is, but the UUIDs are turned into strings since
+    orjson doesn't serialize the UUID subclass of asyncpg.
+
+    Args:
+        record (Record): The row.
+
+    Returns:
+        dict[str, Any]: The identification.
+    """
+    return {
+        "id": str(record["id"]),
+        "object": record["object"],
+        "title": record["title"],
+        "question": record["question"],
+        "explanation": record["explanation"],
+        "timestamp": record["timestamp"],
+        "label": record["label"],
+        "label_text": record["label_text"],
+        "label_explanation": record["label_explanation"],
+        "snapshot": {
+            "id": str(record["snapshot_id"]),
+            "camera_id": record["camera_id"],
+            "image_url": record["snapshot_url"],
+            "timestamp": record["snapshot_timestamp"],
+        },
+    }
@@ -5,10 +5,15 @@ from typing import Annotated
 from uuid import UUID
 
 from app.dependencies import get_user, is_admin, is_agent
+from app.heartbeats import heartbeats
 from app.models import Agent, Camera
 from app.pydantic_models import AgentOut, CameraOut, HeartbeatIn, HeartbeatOut, User
-from app.utils import apply_to_list, transform_tortoise_to_pydantic
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.utils import (
+    apply_to_list,
+    get_conditional_response,
+    transform_tortoise_to_pydantic,
+)
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi_pagination import Page
 from fastapi_pagination.ext.tortoise import paginate as tortoise_paginate
 
@@ -18,7 +23,7 @@ router = APIRouter(prefix="/agents", tags=["Agents"])
 @router.get("", response_model=Page[AgentOut])
 async def get_agents(_: Annotated[User, Depends(is_admin)]) -> Page[AgentOut]:
     """Returns the list of registered agents."""
-    return await tortoise_paginate(
+    page = await tortoise_paginate(
         Agent,
         transformer=partial(
             apply_to_list,
@@ -35,6 +40,10 @@ async def get_agents(_: Annotated[User, Depends(is_admin)]) -> Page[AgentOut]:
             ),
         ),
     )
+    for agent in page.items:
+        agent.last_heartbeat = heartbeats.last_seen(agent.id, agent.last_heartbeat)
+
+    return page
 
 
 @router.get("/me", response_model=AgentOut)
@@ -47,15 +56,19 @@ async def get_agent_me(user: Annotated[User, Depends(is_agent)]) -> AgentOut:
         name=agent.name,
         slug=agent.slug,
         auth_sub=agent.auth_sub,
-        last_heartbeat=agent.last_heartbeat,
+        last_heartbeat=heartbeats.last_seen(agent.id, agent.last_heartbeat),
     )
 
 
 @router.get("/cameras", response_model=Page[CameraOut])
 async def get_cameras(
+    request: Request,
     user: Annotated[User, Depends(get_user)],
-) -> Page[CameraOut]:
-    """Returns the list of cameras that the agent must get snapshots from."""
+) -> Response:
+    """
+    Returns the list of cameras that the agent must get snapshots from. Answers `If-None-Match`
+    with 304 when they didn't change.
+    """
     if user.is_admin:
         queryset = Camera
     elif user.is_agent:
@@ -66,7 +79,7 @@ async def get_cameras(
             detail="Not allowed to list cameras",
         )
 
-    return await tortoise_paginate(
+    page = await tortoise_paginate(
         queryset,
         transformer=partial(
             apply_to_list,
@@ -85,6 +98,8 @@ async def get_cameras(
         ),
     )
 
+    return get_conditional_response(request, page)
+
 
 @router.get("/{agent_id}", response_model=AgentOut)
 async def get_agent(agent_id: UUID, _: Annotated[User, Depends(is_admin)]) -> AgentOut:
@@ -96,7 +111,7 @@ async def get_agent(agent_id: UUID, _: Annotated[User, Depends(is_admin)]) -> Ag
         name=agent.name,
         slug=agent.slug,
         auth_sub=agent.auth_sub,
-        last_heartbeat=agent.last_heartbeat,
+        last_heartbeat=heartbeats.last_seen(agent.id, agent.last_heartbeat),
     )
 
 
@@ -146,10 +161,8 @@ async def agent_heartbeat(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not allowed to send heartbeats for this agent.",
         )
-    agent = await Agent.get(id=agent_id)
     if heartbeat.healthy:
-        agent.last_heartbeat = datetime.now()
-        await agent.save()
+        heartbeats.record(agent_id, datetime.now())
     return HeartbeatOut(command="")  # TODO: Add commands
 
 
@@ -1,160 +1,310 @@
 # -*- coding: utf-8 -*-
+import json
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Any
 from uuid import UUID, uuid4
 
 from app import config
-from app.dependencies import is_admin, is_agent, is_ai
+from app.cache import (
+    CAMERAS_NAMESPACE,
+    counted_cache,
+    get_cameras_invalidated_at,
+    invalidate_cameras_cache,
+    single_flight,
+)
+from app.columnar import flatten_cameras, get_page_response
+from app.db import get_read_connection
+from app.dependencies import is_admin, is_agent, is_ai, use_read_replica
+from app.events import event_bus
+from app.live_state import live_state
 from app.models import Agent, Camera, Identification, Label, Object, Snapshot
+from app.pagination import (
+    BigPage,
+    BigParams,
+    CursorParams,
+    create_cursor_page,
+    create_cursor_page_dict,
+    create_page_dict,
+    decode_cursor,
+    encode_cursor,
+)
 from app.pydantic_models import (
     CameraIdentificationOut,
     CameraIn,
     CameraOut,
     CameraUpdate,
+    IdentificationBulkIn,
+    IdentificationBulkItemOut,
+    IdentificationBulkOut,
     IdentificationOut,
     ObjectOut,
     PredictOut,
+    SnapshotBulkIn,
+    SnapshotBulkItemOut,
+    SnapshotBulkOut,
     SnapshotIn,
     SnapshotOut,
     User,
 )
+from app.queries import (
+    IDENTIFICATION_COLUMNS,
+    IDENTIFICATION_JOINS,
+    fetch_records,
+    identification_record_to_json,
+)
 from app.utils import (
-    get_gcp_credentials,
-    get_prompt_formatted_text,
-    get_prompts_best_fit,
+    generate_snapshot_upload_urls,
+    get_compiled_prompt,
+    get_snapshot_blob_path,
     publish_message,
+    refresh_human_identification_aggregate,
 )
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
-from fastapi_cache.decorator import cache
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
 from fastapi_pagination import Page, Params
 from fastapi_pagination.api import create_page
-from google.cloud import storage
+from pydantic import parse_obj_as
+from tortoise import connections
 from tortoise.expressions import Q
-
-
-class BigParams(Params):
-    size: int = Query(100, ge=1, le=3000)
-
-
-class BigPage(Page[CameraIdentificationOut]):
-    __params_type__ = BigParams
-
+from tortoise.timezone import make_aware
+from tortoise.transactions import in_transaction
 
 router = APIRouter(prefix="/cameras", tags=["Cameras"])
 
 
-@cache(expire=60 * 5)
+@single_flight()
+@counted_cache(CAMERAS_NAMESPACE, expire=60 * 5, namespace=CAMERAS_NAMESPACE, stale=60)
 async def get_cameras_from_db(
-    size: int, offset: int, minute_interval: int
-) -> tuple[list[CameraIdentificationOut], int]:
+    size: int,
+    offset: int,
+    minute_interval: int,
+    after: str | None = None,
+    with_total: bool = True,
+) -> tuple[list[CameraIdentificationOut], int | None]:
     print("cameras cache miss")
-    cameras_out: dict[str, CameraIdentificationOut] = {}
-    ids = await Camera.all().limit(size).offset(offset).values_list("id", flat=True)
-
-    cameras = (
-        await Camera.all()
-        .filter(id__in=ids)
-        .select_related("objects")
-        .values(
-            "id",
-            "name",
-            "rtsp_url",
-            "update_interval",
-            "latitude",
-            "longitude",
-            "objects__slug",
-        )
+    lastminutes = make_aware(datetime.now() - timedelta(minutes=minute_interval))
+    values: list = [size, offset, lastminutes]
+
+    # Keyset pagination seeks through the primary key index instead of skipping rows.
+    where = ""
+    if after is not None:
+        values.append(after)
+        where = f'WHERE camera."id" > ${len(values)}'
+
+    # One row per camera, with its object slugs and the latest identification of each object
+    # inside the interval.
+    query = f"""
+    WITH page AS (
+      SELECT
+        camera."id",
+        camera."name",
+        camera.rtsp_url,
+        camera.update_interval,
+        camera.latitude,
+        camera.longitude
+      FROM
+        camera
+      {where}
+      ORDER BY
+        camera."id"
+      LIMIT $1 OFFSET $2
+    ),
+    latest AS (
+      SELECT DISTINCT ON (snapshot.camera_id, label.object_id)
+        snapshot.camera_id,
+        identification."id",
+        identification."timestamp",
+        identification.label_explanation,
+        label."value" AS label,
+        label."text" AS label_text,
+        "object".slug AS "object",
+        "object".title,
+        "object".question,
+        "object".explanation,
+        snapshot."id" AS snapshot_id,
+        snapshot.public_url AS snapshot_url,
+        snapshot."timestamp" AS snapshot_timestamp
+      FROM
+        identification
+        INNER JOIN snapshot ON snapshot."id" = identification.snapshot_id
+        INNER JOIN label ON label."id" = identification.label_id
+        INNER JOIN "object" ON "object"."id" = label.object_id
+      WHERE
+        snapshot.camera_id IN (SELECT page."id" FROM page)
+        AND identification."timestamp" >= $3
+      ORDER BY
+        snapshot.camera_id,
+        label.object_id,
+        identification."timestamp" DESC,
+        identification."id" DESC
     )
+    SELECT
+      page.*,
+      COALESCE(camera_objects.objects, '{{}}') AS objects,
+      COALESCE(camera_identifications.identifications, '[]') AS identifications
+    FROM
+      page
+      LEFT JOIN (
+        SELECT
+          camera_object.camera_id,
+          array_agg(DISTINCT "object".slug) AS objects
+        FROM
+          camera_object
+          INNER JOIN "object" ON "object"."id" = camera_object.object_id
+        WHERE
+          camera_object.camera_id IN (SELECT page."id" FROM page)
+        GROUP BY
+          camera_object.camera_id
+      ) AS camera_objects ON camera_objects.camera_id = page."id"
+      LEFT JOIN (
+        SELECT
+          latest.camera_id,
+          json_agg(latest ORDER BY latest."timestamp" DESC, latest."id" DESC) AS identifications
+        FROM
+          latest
+        GROUP BY
+          latest.camera_id
+      ) AS camera_identifications ON camera_identifications.camera_id = page."id"
+    ORDER BY
+      page."id"
+    """
+    # A page read from a lagging replica right after an invalidation would stay cached stale.
+    conn = get_read_connection(written_at=await get_cameras_invalidated_at())
+    cameras = await conn.execute_query_dict(query, values)
+
+    cameras_out = [
+        CameraIdentificationOut(
+            id=camera["id"],
+            name=camera["name"],
+            rtsp_url=camera["rtsp_url"],
+            update_interval=camera["update_interval"],
+            latitude=camera["latitude"],
+            longitude=camera["longitude"],
+            objects=camera["objects"],
+            identifications=[
+                IdentificationOut(
+                    id=identification["id"],
+                    object=identification["object"],
+                    title=identification["title"],
+                    question=identification["question"],
+                    explanation=identification["explanation"],
+                    timestamp=identification["timestamp"],
+                    label=identification["label"],
+                    label_text=identification["label_text"],
+                    label_explanation=identification["label_explanation"],
+                    snapshot=SnapshotOut(
+                        id=identification["snapshot_id"],
+                        camera_id=camera["id"],
+                        image_url=identification["snapshot_url"],
+                        timestamp=identification["snapshot_timestamp"],
+                    ),
+                )
+                for identification in json.loads(camera["identifications"])
+            ],
+        )
+        for camera in cameras
+    ]
 
-    for camera in cameras:
-        id = camera["id"]
-        slug = camera["objects__slug"]
-
-        if id in cameras_out:
-            if slug is not None and slug not in cameras_out[id].objects:
-                cameras_out[id].objects.append(slug)
-        else:
-            cameras_out[id] = CameraIdentificationOut(
-                id=id,
-                name=camera["name"],
-                rtsp_url=camera["rtsp_url"],
-                update_interval=camera["update_interval"],
-                latitude=camera["latitude"],
-                longitude=camera["longitude"],
-                objects=[slug] if slug is not None else [],
-                identifications=[],
-            )
+    total = await Camera.all().using_db(conn).count() if with_total else None
 
-    lastminutes = datetime.now() - timedelta(minutes=minute_interval)
+    return cameras_out, total
 
-    identifications = (
-        await Identification.all()
-        .filter(snapshot__camera_id__in=ids, timestamp__gte=lastminutes)
-        .prefetch_related(
-            "snapshot",
-            "snapshot__camera",
-            "label",
-            "label__object",
-        )
-        .order_by("-timestamp")
-    )
 
-    identifications_slug: dict[str, list[str]] = {}
+def get_cameras_page_from_live_state(
+    params: BigParams, cursor_params: CursorParams, minute_interval: int
+) -> dict[str, Any]:
+    """
+    Builds a page of `GET /cameras` from the live state, without queries nor models.
 
-    for identification in identifications:
-        slug = identification.label.object.slug
-        id = identification.snapshot.camera.id
+    Args:
+        params (BigParams): The pagination parameters.
+        cursor_params (CursorParams): The cursor pagination parameters.
+        minute_interval (int): Only identifications in the last minutes are returned.
 
-        if id not in identifications_slug:
-            identifications_slug[id] = []
+    Returns:
+        dict[str, Any]: The page, like a `BigPage[CameraIdentificationOut]`.
+    """
+    if cursor_params.enabled:
+        after = decode_cursor(cursor_params.cursor, length=1)
+        # One extra camera tells whether there is a next page.
+        cameras = live_state.get_cameras(
+            params.size + 1, minute_interval, after=after[0] if after is not None else None
+        )
+        next_cursor = None
+        if len(cameras) > params.size:
+            cameras = cameras[: params.size]
+            next_cursor = encode_cursor(cameras[-1]["id"])
+        total = len(live_state) if cursor_params.include_total else None
+        return create_cursor_page_dict(cameras, params, next_cursor, total)
+
+    cameras = live_state.get_cameras(
+        params.size, minute_interval, offset=params.size * (params.page - 1)
+    )
+    return create_page_dict(cameras, params, len(live_state))
 
-        if slug in identifications_slug[id]:
-            continue
 
-        identifications_slug[id].append(slug)
-
-        cameras_out[id].identifications.append(
-            IdentificationOut(
-                id=identification.id,
-                object=slug,
-                title=identification.label.object.title,
-                question=identification.label.object.question,
-                explanation=identification.label.object.explanation,
-                timestamp=identification.timestamp,
-                label=identification.label.value,
-                label_text=identification.label.text,
-                label_explanation=identification.label_explanation,
-                snapshot=SnapshotOut(
-                    id=identification.snapshot.id,
-                    camera_id=id,
-                    image_url=identification.snapshot.public_url,
-                    timestamp=identification.snapshot.timestamp,
-                ),
-            )
+@router.get(
+    "",
+    response_model=BigPage[CameraIdentificationOut],
+    dependencies=[Depends(use_read_replica)],
+)
+async def get_cameras(
+    request: Request,
+    _: Annotated[User, Depends(is_admin)],
+    params: BigParams = Depends(),
+    cursor_params: CursorParams = Depends(),
+    minute_interval: int = 30,
+) -> Response:
+    """
+    Get a list of all cameras. Answers `If-None-Match` with 304 when they didn't change.
+
+    Send `Accept: application/vnd.apache.arrow.stream`, `application/vnd.apache.parquet` or
+    `application/msgpack` to get one row per identification in a columnar encoding instead.
+    """
+    if minute_interval <= live_state.window and await live_state.ensure_loaded():
+        return get_page_response(
+            request,
+            get_cameras_page_from_live_state(params, cursor_params, minute_interval),
+            flatten_cameras,
         )
 
-    return list(cameras_out.values()), await Camera.all().count()
-
+    if cursor_params.enabled:
+        after = decode_cursor(cursor_params.cursor, length=1)
+        # One extra camera tells whether there is a next page.
+        cameras, total = await get_cameras_from_db(
+            size=params.size + 1,
+            offset=0,
+            minute_interval=minute_interval,
+            after=after[0] if after is not None else None,
+            with_total=cursor_params.include_total,
+        )
+        # Cache hits return the decoded JSON instead of the models.
+        cameras = parse_obj_as(list[CameraIdentificationOut], cameras)
+        next_cursor = None
+        if len(cameras) > params.size:
+            cameras = cameras[: params.size]
+            next_cursor = encode_cursor(cameras[-1].id)
+
+        return get_page_response(
+            request, create_cursor_page(cameras, params, next_cursor, total), flatten_cameras
+        )
 
-@router.get("", response_model=BigPage)
-async def get_cameras(
-    _: Annotated[User, Depends(is_admin)], params: BigParams = Depends(), minute_interval: int = 30
-) -> Page[CameraIdentificationOut]:
-    """Get a list of all cameras."""
     offset = params.size * (params.page - 1)
     cameras, total = await get_cameras_from_db(
         size=params.size, offset=offset, minute_interval=minute_interval
     )
 
-    return create_page(cameras, total=total, params=params)
+    return get_page_response(
+        request, create_page(cameras, total=total, params=params), flatten_cameras
+    )
 
 
 @router.post("", response_model=CameraOut)
 async def create_camera(camera_: CameraIn, _: Annotated[User, Depends(is_admin)]) -> CameraOut:
     """Add a new camera."""
     camera = await Camera.create(**camera_.dict())
+    await invalidate_cameras_cache()
+    live_state.add_camera(camera)
     return CameraOut(
         id=camera.id,
         name=camera.name,
@@ -197,6 +347,8 @@ async def update_camera(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Camera not found.")
 
     await Camera.filter(id=camera_id).update(**camera_.dict(exclude_unset=True))
+    await invalidate_cameras_cache()
+    live_state.update_camera(camera_id, camera_.dict(exclude_unset=True))
     return CameraOut(
         id=camera.id,
         name=camera.name,
@@ -218,6 +370,8 @@ async def delete_camera(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Camera not found.")
 
     await Camera.filter(id=camera_id).delete()
+    await invalidate_cameras_cache()
+    live_state.remove_camera(camera_id)
 
 
 @router.get("/{camera_id}/objects", response_model=Page[ObjectOut])
@@ -299,24 +453,13 @@ async def create_camera_snapshot(
 
     id = uuid4()
 
-    credentials = get_gcp_credentials()
-    storage_client = storage.Client(credentials=credentials)
-    bucket = storage_client.bucket(config.GCS_BUCKET_NAME)
-    path_data = datetime.now().strftime("ano=%Y/mes=%m/dia=%d")
-    blob_path = f"{config.GCS_BUCKET_PATH_PREFIX}/{path_data}/camera_id={camera_id}/{id}.png"
-    blob = bucket.blob(blob_name=blob_path)
-    url = blob.generate_signed_url(
-        version="v4",
-        expiration=timedelta(minutes=15),
-        method="PUT",
-        content_md5=snapshot_in.hash_md5,
-        content_type="image/png",
-    )
+    blob_path = get_snapshot_blob_path(camera_id, id, datetime.now())
+    [(url, public_url)] = await generate_snapshot_upload_urls([(blob_path, snapshot_in.hash_md5)])
 
     snapshot = await Snapshot.create(
         id=id,
         camera=camera,
-        public_url=blob.public_url,
+        public_url=public_url,
         timestamp=None,
     )
 
@@ -328,6 +471,76 @@ async def create_camera_snapshot(
     )
 
 
+@router.post("/snapshots/bulk", response_model=SnapshotBulkOut)
+async def create_camera_snapshots_bulk(
+    data: SnapshotBulkIn,
+    user: Annotated[User, Depends(is_agent)],
+) -> SnapshotBulkOut:
+    """Post a snapshot of many cameras at once, getting the upload URL of each one."""
+    if len(data.snapshots) > config.SNAPSHOTS_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Up to {config.SNAPSHOTS_BULK_MAX_SIZE} snapshots can be posted at once.",
+        )
+
+    camera_ids = list({item.camera_id for item in data.snapshots})
+    allowed = set(
+        await Camera.filter(id__in=camera_ids, agents=user.agent_id).values_list("id", flat=True)
+    )
+
+    timestamp = datetime.now()
+    snapshots: list[Snapshot | None] = []
+    uploads = []
+    for item in data.snapshots:
+        if item.camera_id not in allowed:
+            snapshots.append(None)
+            continue
+
+        snapshot = Snapshot(id=uuid4(), camera_id=item.camera_id, timestamp=None)
+        snapshots.append(snapshot)
+        uploads.append(
+            (get_snapshot_blob_path(item.camera_id, snapshot.id, timestamp), item.hash_md5)
+        )
+
+    created = [snapshot for snapshot in snapshots if snapshot]
+    image_urls = {}
+    for snapshot, (url, public_url) in zip(created, await generate_snapshot_upload_urls(uploads)):
+        snapshot.public_url = public_url
+        image_urls[snapshot.id] = url
+    if len(created) > 0:
+        async with in_transaction("default"):
+            await Snapshot.bulk_create(created)
+
+    items = []
+    for item, snapshot in zip(data.snapshots, snapshots):
+        if snapshot is None:
+            items.append(
+                SnapshotBulkItemOut(
+                    camera_id=item.camera_id,
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Not allowed to post snapshots for this camera.",
+                    snapshot=None,
+                )
+            )
+            continue
+
+        items.append(
+            SnapshotBulkItemOut(
+                camera_id=item.camera_id,
+                status_code=status.HTTP_200_OK,
+                detail=None,
+                snapshot=SnapshotOut(
+                    id=snapshot.id,
+                    camera_id=item.camera_id,
+                    image_url=image_urls[snapshot.id],
+                    timestamp=snapshot.timestamp,
+                ),
+            )
+        )
+
+    return SnapshotBulkOut(count=len(created), items=items)
+
+
 @router.post("/{camera_id}/snapshots/{snapshot_id}/predict", response_model=PredictOut)
 async def predict(
     camera_id: str,
@@ -356,26 +569,24 @@ async def predict(
     camera_snapshot_slugs = [item.slug for item in objects]
 
     if len(camera_snapshot_slugs):
-        prompts = await get_prompts_best_fit(objects=objects, one=True)
-        if len(prompts) == 0:
+        compiled_prompt = await get_compiled_prompt(objects=objects)
+        if compiled_prompt is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompts not found")
 
-        prompt = prompts[0]  # TODO: generalize this
-        formatted_text = await get_prompt_formatted_text(prompt=prompt, objects=objects)
         message = {
             "camera_id": camera_id,
             "snapshot_id": snapshot.id,
             "image_url": snapshot.public_url,
-            "prompt_text": formatted_text,
+            "prompt_text": compiled_prompt.prompt_text,
             "object_ids": camera_snapshot_ids,
             "object_slugs": camera_snapshot_slugs,
-            "model": prompt.model,
-            "max_output_tokens": prompt.max_output_token,
-            "temperature": prompt.temperature,
-            "top_k": prompt.top_k,
-            "top_p": prompt.top_p,
+            "model": compiled_prompt.model,
+            "max_output_tokens": compiled_prompt.max_output_token,
+            "temperature": compiled_prompt.temperature,
+            "top_k": compiled_prompt.top_k,
+            "top_p": compiled_prompt.top_p,
         }
-        publish_message(data=message)
+        await publish_message(data=message)
 
     return PredictOut(error=False, message="OK")
 
@@ -389,41 +600,26 @@ async def get_identification(
     _: Annotated[User, Depends(is_agent)],
 ) -> list[IdentificationOut]:
     """Get a camera snapshot identification."""
-    camera = await Camera.get_or_none(id=camera_id)
-    if not camera:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Camera not found.")
-    snapshot = await Snapshot.get_or_none(id=snapshot_id, camera=camera)
-    if not snapshot:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found.")
-
-    identifications = (
-        await Identification.all()
-        .filter(snapshot=snapshot)
-        .prefetch_related("label", "label__object")
-    )
-
-    identifications = [
-        IdentificationOut(
-            id=identification.id,
-            object=identification.label.object.slug,
-            title=identification.label.object.title,
-            question=identification.label.object.question,
-            explanation=identification.label.object.explanation,
-            timestamp=identification.timestamp,
-            label=identification.label.value,
-            label_text=identification.label.text,
-            label_explanation=identification.label_explanation,
-            snapshot=SnapshotOut(
-                id=snapshot.id,
-                camera_id=camera.id,
-                image_url=snapshot.public_url,
-                timestamp=snapshot.timestamp,
-            ),
-        )
-        for identification in identifications
-    ]
-
-    return JSONResponse(content=jsonable_encoder(identifications))  # noqa
+    query = f"""
+    SELECT
+      {IDENTIFICATION_COLUMNS}
+    FROM
+      identification
+      {IDENTIFICATION_JOINS}
+    WHERE
+      snapshot."id" = $1
+      AND snapshot.camera_id = $2
+    """
+    records = await fetch_records(connections.get("default"), query, snapshot_id, camera_id)
+
+    # Only tell a missing camera from a missing snapshot when there is nothing to return
+    if len(records) == 0:
+        if not await Camera.exists(id=camera_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Camera not found.")
+        if not await Snapshot.exists(id=snapshot_id, camera_id=camera_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found.")
+
+    return ORJSONResponse([identification_record_to_json(record) for record in records])
 
 
 @router.post(
@@ -456,8 +652,10 @@ async def create_identification(
         timestamp=datetime.now(),
         label_explanation=label_explanation,
     )
+    await invalidate_cameras_cache()
+    live_state.add_identification(identification, label, snapshot)
 
-    return IdentificationOut(
+    identification_out = IdentificationOut(
         id=identification.id,
         object=object_.slug,
         title=object_.title,
@@ -474,6 +672,99 @@ async def create_identification(
             timestamp=snapshot.timestamp,
         ),
     )
+    event_bus.publish("identification", object_.slug, identification_out.json())
+
+    return identification_out
+
+
+@router.post(
+    "/{camera_id}/snapshots/{snapshot_id}/identifications/bulk",
+    response_model=IdentificationBulkOut,
+)
+async def create_identifications_bulk(
+    camera_id: str,
+    snapshot_id: UUID,
+    data: IdentificationBulkIn,
+    _: Annotated[User, Depends(is_ai)],
+) -> IdentificationBulkOut:
+    """Add every identification of a camera snapshot at once."""
+    snapshot = await Snapshot.get_or_none(id=snapshot_id, camera_id=camera_id)
+    if not snapshot:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found.")
+
+    slugs = list({item.object for item in data.objects})
+    labels = {
+        (label.object.slug, label.value): label
+        for label in await Label.filter(object__slug__in=slugs).select_related("object")
+    }
+
+    timestamp = datetime.now()
+    identifications: list[Identification | None] = [
+        (
+            Identification(
+                id=uuid4(),
+                snapshot=snapshot,
+                label=labels[(item.object, item.label)],
+                timestamp=timestamp,
+                label_explanation=item.label_explanation,
+            )
+            if (item.object, item.label) in labels
+            else None
+        )
+        for item in data.objects
+    ]
+    created = [identification for identification in identifications if identification]
+    if len(created) > 0:
+        async with in_transaction("default"):
+            await Identification.bulk_create(created)
+        await invalidate_cameras_cache()
+        for identification in created:
+            live_state.add_identification(identification, identification.label, snapshot)
+
+    items = []
+    for item, identification in zip(data.objects, identifications):
+        if identification is None:
+            items.append(
+                IdentificationBulkItemOut(
+                    object=item.object,
+                    label=item.label,
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Label not found.",
+                    identification=None,
+                )
+            )
+            continue
+
+        label = identification.label
+        identification_out = IdentificationOut(
+            id=identification.id,
+            object=label.object.slug,
+            title=label.object.title,
+            question=label.object.question,
+            explanation=label.object.explanation,
+            timestamp=identification.timestamp,
+            label=label.value,
+            label_text=label.text,
+            label_explanation=identification.label_explanation,
+            snapshot=SnapshotOut(
+                id=snapshot.id,
+                camera_id=camera_id,
+                image_url=snapshot.public_url,
+                timestamp=snapshot.timestamp,
+            ),
+        )
+        event_bus.publish("identification", label.object.slug, identification_out.json())
+        items.append(
+            IdentificationBulkItemOut(
+                object=item.object,
+                label=item.label,
+                status_code=status.HTTP_200_OK,
+                detail=None,
+                identification=identification_out,
+            )
+        )
+
+    return IdentificationBulkOut(count=len(created), items=items)
 
 
 @router.delete("/{camera_id}/snapshots/{snapshot_id}/identifications/{identification_id}")
@@ -491,3 +782,6 @@ async def delete_identification(
     if not snapshot:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found.")
     await Identification.filter(id=identification_id, snapshot=snapshot).delete()
+    await refresh_human_identification_aggregate([snapshot.id])
+    await invalidate_cameras_cache()
+    await live_state.reload_camera(camera.id)
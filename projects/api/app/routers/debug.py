@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from typing import Annotated, Literal
+
+from app.dependencies import is_admin
+from app.loop_monitor import loop_monitor
+from app.profiler import request_profiler
+from app.pydantic_models import EventLoopReportOut, RequestProfileOut, User
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+
+def get_enabled_loop_monitor():
+    if not loop_monitor.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The event loop monitor is disabled, set LOOP_MONITOR_ENABLE to enable it.",
+        )
+    return loop_monitor
+
+
+@router.get("/event-loop", response_model=EventLoopReportOut)
+async def get_event_loop_report(
+    _: Annotated[User, Depends(is_admin)],
+    limit: int = Query(20, ge=1, le=1000),
+) -> EventLoopReportOut:
+    """
+    Reports the lag of the event loop of this worker and the callbacks that blocked it, ranked by
+    the total time they blocked it. Each one is grouped by route and by the line of the API it
+    was stuck in, with the stack of the slowest one.
+    """
+    return EventLoopReportOut(**get_enabled_loop_monitor().report(limit))
+
+
+@router.delete("/event-loop", response_model=EventLoopReportOut)
+async def reset_event_loop_report(
+    _: Annotated[User, Depends(is_admin)],
+) -> EventLoopReportOut:
+    """Clears the event loop report of this worker, returning it."""
+    monitor = get_enabled_loop_monitor()
+    report = EventLoopReportOut(**monitor.report())
+    monitor.reset()
+    return report
+
+
+@router.get("/profiles", response_model=list[RequestProfileOut])
+async def get_profiles(
+    _: Annotated[User, Depends(is_admin)],
+) -> list[RequestProfileOut]:
+    """
+    Lists the request profiles kept by this worker, from the newest. Admins profile a request by
+    sending the `X-Profile: true` header or the `profile=true` query parameter.
+    """
+    return [
+        RequestProfileOut(
+            id=profile.id,
+            method=profile.method,
+            route=profile.route,
+            path=profile.path,
+            status=profile.status,
+            timestamp=profile.timestamp,
+            duration=profile.duration,
+        )
+        for profile in request_profiler.list()
+    ]
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    _: Annotated[User, Depends(is_admin)],
+    profile_id: str,
+    format: Literal["html", "text", "speedscope"] = "html",
+) -> Response:
+    """
+    Renders a request profile as the interactive pyinstrument page, as a text call tree or as
+    a flamegraph to open in https://www.speedscope.app.
+    """
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found, it may have been evicted or taken by another worker.",
+        )
+
+    if format == "text":
+        return PlainTextResponse(ConsoleRenderer(unicode=True).render(profile.session))
+    if format == "speedscope":
+        return Response(
+            SpeedscopeRenderer().render(profile.session),
+            media_type="application/json",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'},
+        )
+    return HTMLResponse(HTMLRenderer().render(profile.session))
@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 import itertools
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Any
 from uuid import UUID
 
 import requests
 from app import config
-from app.dependencies import get_user, is_admin, is_human
+from app.columnar import flatten_identifications, get_page_response
+from app.db import get_read_connection
+from app.dependencies import get_user, is_admin, is_human, use_read_replica
+from app.events import event_bus
 from app.models import (
     HideIdentification,
     Identification,
@@ -16,8 +19,18 @@ from app.models import (
     UserIdentification,
     WhitelistIdentification,
 )
+from app.pagination import (
+    BigPage,
+    BigParams,
+    CursorParams,
+    create_cursor_page_dict,
+    create_page_dict,
+    decode_cursor,
+    encode_cursor,
+)
 from app.pydantic_models import (
     Aggregation,
+    HideEventOut,
     HideIn,
     HideOut,
     HumanIdentificationAggregation,
@@ -30,172 +43,336 @@ from app.pydantic_models import (
     SnapshotOut,
     User,
 )
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi_pagination import Page, create_page
-from fastapi_pagination.default import Params
+from app.queries import (
+    IDENTIFICATION_COLUMNS,
+    IDENTIFICATION_JOINS,
+    fetch_records,
+    fetch_value,
+    identification_record_to_json,
+)
+from app.utils import refresh_human_identification_aggregate
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from tortoise import connections
 from tortoise.expressions import Q
+from tortoise.timezone import make_aware
 
 router = APIRouter(prefix="/identifications", tags=["identifications"])
 
 
-class BigParams(Params):
-    size: int = Query(100, ge=1, le=3000)
+# Identifications marked for review, visible to the user ($1) and not yet identified by them.
+PENDING_IDENTIFICATIONS_CONDITION = """
+      EXISTS (
+        SELECT
+          1
+        FROM
+          identification_marker
+        WHERE
+          identification_marker.identification_id = identification."id"
+          AND (
+            identification_marker.all_users
+            OR EXISTS (
+              SELECT
+                1
+              FROM
+                whitelist_identification
+              WHERE
+                whitelist_identification.identification_id = identification."id"
+                AND whitelist_identification.username = $1
+            )
+          )
+      )
+      AND NOT EXISTS (
+        SELECT
+          1
+        FROM
+          user_identification
+        WHERE
+          user_identification.identification_id = identification."id"
+          AND user_identification.username = $1
+      )
+"""
+
+
+def parse_identifications_cursor(cursor: list[Any]) -> tuple[datetime | None, datetime, UUID]:
+    """
+    Parses the sort key of a decoded identifications cursor.
 
+    Args:
+        cursor (list[Any]): The decoded cursor.
 
-class BigPage(Page[IdentificationOut]):
-    __params_type__ = BigParams
+    Returns:
+        tuple[datetime | None, datetime, UUID]: The snapshot timestamp, timestamp and id.
+    """
+    snapshot_timestamp, timestamp, id = cursor
+    try:
+        return (
+            datetime.fromisoformat(snapshot_timestamp) if snapshot_timestamp is not None else None,
+            datetime.fromisoformat(timestamp),
+            UUID(id),
+        )
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
 
 
-@router.get("/ai", response_model=BigPage)
-async def get_ai_identifications(
-    user: Annotated[User, Depends(is_human)],
-    params: BigParams = Depends(),
-) -> Page[IdentificationOut]:
-    offset = params.size * (params.page - 1)
+def identifications_after_sql(cursor: list[Any], values: list[Any]) -> str:
+    """
+    Filters the identifications sorted by snapshot timestamp, timestamp and id that come after
+    the sort key of a cursor. Snapshots without timestamp are sorted last. The cursor values are
+    appended to `values`.
 
-    indentificateds = (
-        await UserIdentification.all()
-        .filter(username=user.name)
-        .values_list("identification_id", flat=True)
-    )
+    Args:
+        cursor (list[Any]): The decoded cursor.
+        values (list[Any]): The query values.
 
-    whitelist = (
-        await WhitelistIdentification.all()
-        .filter(username=user.name)
-        .values_list("identification_id", flat=True)
-    )
+    Returns:
+        str: The SQL condition.
+    """
+    snapshot_timestamp, timestamp, id = parse_identifications_cursor(cursor)
 
-    ids = (
-        await IdentificationMaker.all()
-        .filter(
-            Q(identification_id__not_in=indentificateds)
-            & Q(Q(all_users=True) | Q(identification_id__in=whitelist))
-        )
-        .values_list("identification_id", flat=True)
+    values += [timestamp, id]
+    same_snapshot_timestamp = (
+        f'(identification."timestamp", identification."id") > (${len(values) - 1}, ${len(values)})'
     )
+    if snapshot_timestamp is None:
+        return f'snapshot."timestamp" IS NULL AND {same_snapshot_timestamp}'
+
+    values.append(snapshot_timestamp)
+    return f"""(
+        snapshot."timestamp" > ${len(values)}
+        OR snapshot."timestamp" IS NULL
+        OR (snapshot."timestamp" = ${len(values)} AND {same_snapshot_timestamp})
+      )"""
+
+
+def create_identifications_cursor_page(
+    items: list[dict[str, Any]],
+    params: BigParams,
+    total: int | None,
+) -> dict[str, Any]:
+    """
+    Creates a cursor page from up to `params.size + 1` identifications. The extra identification
+    only tells whether there is a next page.
 
-    count = len(ids)
+    Args:
+        items (list[dict[str, Any]]): The identifications, from `identification_record_to_json`.
+        params (BigParams): The pagination parameters.
+        total (int | None): The total of identifications, when requested.
 
-    identifications = (
-        await Identification.all()
-        .filter(id__in=ids)
-        .order_by("snapshot__timestamp", "timestamp")
-        .limit(params.size)
-        .offset(offset)
-        .prefetch_related("snapshot", "snapshot__camera", "label", "label__object")
-    )
+    Returns:
+        dict[str, Any]: The page, like a `BigPage[IdentificationOut]`.
+    """
+    next_cursor = None
+    if len(items) > params.size:
+        items = items[: params.size]
+        last = items[-1]
+        next_cursor = encode_cursor(last["snapshot"]["timestamp"], last["timestamp"], last["id"])
 
-    out = [
-        IdentificationOut(
-            id=identification.id,
-            object=identification.label.object.slug,
-            title=identification.label.object.title,
-            question=identification.label.object.question,
-            explanation=identification.label.object.explanation,
-            timestamp=identification.timestamp,
-            label=identification.label.value,
-            label_text=identification.label.text,
-            label_explanation=identification.label_explanation,
-            snapshot=SnapshotOut(
-                id=identification.snapshot.id,
-                camera_id=identification.snapshot.camera.id,
-                image_url=identification.snapshot.public_url,
-                timestamp=identification.snapshot.timestamp,
-            ),
+    return create_cursor_page_dict(items, params, next_cursor, total)
+
+
+async def get_identifications_page(
+    condition: str,
+    values: list[Any],
+    params: BigParams,
+    cursor_params: CursorParams,
+) -> dict[str, Any]:
+    """
+    Gets a page of the identifications that match a condition, sorted by snapshot timestamp and
+    timestamp. In cursor mode they are also sorted by id and use keyset pagination, so every page
+    costs the same regardless of how deep it is.
+
+    Args:
+        condition (str): The SQL condition on the identification and its snapshot, label and
+            object.
+        values (list[Any]): The values of the condition.
+        params (BigParams): The pagination parameters.
+        cursor_params (CursorParams): The cursor pagination parameters.
+
+    Returns:
+        dict[str, Any]: The page, like a `BigPage[IdentificationOut]`.
+    """
+    conn = get_read_connection()
+    total = None
+    if not cursor_params.enabled or cursor_params.include_total:
+        total = await fetch_value(
+            conn,
+            f"SELECT COUNT(*) FROM identification {IDENTIFICATION_JOINS} WHERE {condition}",
+            *values,
         )
-        for identification in identifications
-    ]
 
-    return create_page(out, total=count, params=params)
+    values = list(values)
+    if cursor_params.enabled:
+        after = decode_cursor(cursor_params.cursor, length=3)
+        if after is not None:
+            condition += f" AND {identifications_after_sql(after, values)}"
+        values.append(params.size + 1)
+        order_by = 'snapshot."timestamp", identification."timestamp", identification."id"'
+        limit = f"LIMIT ${len(values)}"
+    else:
+        values += [params.size, params.size * (params.page - 1)]
+        order_by = 'snapshot."timestamp", identification."timestamp"'
+        limit = f"LIMIT ${len(values) - 1} OFFSET ${len(values)}"
 
+    query = f"""
+    SELECT
+      {IDENTIFICATION_COLUMNS}
+    FROM
+      identification
+      {IDENTIFICATION_JOINS}
+    WHERE
+      {condition}
+    ORDER BY
+      {order_by}
+    {limit}
+    """
+    records = await fetch_records(conn, query, *values)
+    items = [identification_record_to_json(record) for record in records]
 
-@router.get("/ai/all", response_model=BigPage)
-async def get_all_ai_identifications(
-    _: Annotated[User, Depends(is_human)],
-    params: BigParams = Depends(),
-) -> Page[IdentificationOut]:
-    offset = params.size * (params.page - 1)
+    if cursor_params.enabled:
+        return create_identifications_cursor_page(items, params, total)
+    return create_page_dict(items, params, total)
 
-    ids = await IdentificationMaker.all().values_list("identification_id", flat=True)
 
-    count = len(ids)
+async def get_pending_identifications(
+    username: str, size: int, offset: int, after: list[Any] | None = None
+) -> list[dict[str, Any]]:
+    """
+    Gets the identifications a user still has to review, sorted by snapshot timestamp,
+    timestamp and id.
+
+    Args:
+        username (str): The username.
+        size (int): The maximum number of identifications.
+        offset (int): The number of identifications to skip.
+        after (list[Any], optional): A decoded cursor to seek from. Defaults to None.
+
+    Returns:
+        list[dict[str, Any]]: The identifications, from `identification_record_to_json`.
+    """
+    values: list[Any] = [username]
+    condition = PENDING_IDENTIFICATIONS_CONDITION
+    if after is not None:
+        condition += f"      AND {identifications_after_sql(after, values)}\n"
+    values += [size, offset]
+
+    query = f"""
+    SELECT
+      {IDENTIFICATION_COLUMNS}
+    FROM
+      identification
+      {IDENTIFICATION_JOINS}
+    WHERE
+      {condition}
+    ORDER BY
+      snapshot."timestamp",
+      identification."timestamp",
+      identification."id"
+    LIMIT ${len(values) - 1} OFFSET ${len(values)}
+    """
+    records = await fetch_records(connections.get("default"), query, *values)
+
+    return [identification_record_to_json(record) for record in records]
+
+
+async def count_pending_identifications(username: str) -> int:
+    """
+    Counts the identifications a user still has to review.
+
+    Args:
+        username (str): The username.
+
+    Returns:
+        int: The number of identifications.
+    """
+    query = f"""
+    SELECT
+      COUNT(*)
+    FROM
+      identification
+    WHERE
+      {PENDING_IDENTIFICATIONS_CONDITION}
+    """
+    return await fetch_value(connections.get("default"), query, username)
 
-    identifications = (
-        await Identification.all()
-        .filter(id__in=ids)
-        .order_by("snapshot__timestamp", "timestamp")
-        .limit(params.size)
-        .offset(offset)
-        .prefetch_related("snapshot", "snapshot__camera", "label", "label__object")
-    )
 
-    out = [
-        IdentificationOut(
-            id=identification.id,
-            object=identification.label.object.slug,
-            title=identification.label.object.title,
-            question=identification.label.object.question,
-            explanation=identification.label.object.explanation,
-            timestamp=identification.timestamp,
-            label=identification.label.value,
-            label_text=identification.label.text,
-            label_explanation=identification.label_explanation,
-            snapshot=SnapshotOut(
-                id=identification.snapshot.id,
-                camera_id=identification.snapshot.camera.id,
-                image_url=identification.snapshot.public_url,
-                timestamp=identification.snapshot.timestamp,
-            ),
+@router.get("/ai", response_model=BigPage[IdentificationOut])
+async def get_ai_identifications(
+    user: Annotated[User, Depends(is_human)],
+    params: BigParams = Depends(),
+    cursor_params: CursorParams = Depends(),
+) -> Response:
+    if cursor_params.enabled:
+        items = await get_pending_identifications(
+            user.name,
+            size=params.size + 1,
+            offset=0,
+            after=decode_cursor(cursor_params.cursor, length=3),
         )
-        for identification in identifications
-    ]
+        total = None
+        if cursor_params.include_total:
+            total = await count_pending_identifications(user.name)
+
+        return ORJSONResponse(create_identifications_cursor_page(items, params, total))
 
-    return create_page(out, total=count, params=params)
+    offset = params.size * (params.page - 1)
+    items = await get_pending_identifications(user.name, size=params.size, offset=offset)
 
+    return ORJSONResponse(
+        create_page_dict(items, params, await count_pending_identifications(user.name))
+    )
 
-@router.get("", response_model=BigPage)
+
+@router.get("/ai/all", response_model=BigPage[IdentificationOut])
+async def get_all_ai_identifications(
+    _: Annotated[User, Depends(is_human)],
+    params: BigParams = Depends(),
+    cursor_params: CursorParams = Depends(),
+) -> Response:
+    condition = """EXISTS (
+        SELECT
+          1
+        FROM
+          identification_marker
+        WHERE
+          identification_marker.identification_id = identification."id"
+      )"""
+    return ORJSONResponse(await get_identifications_page(condition, [], params, cursor_params))
+
+
+@router.get(
+    "",
+    response_model=BigPage[IdentificationOut],
+    dependencies=[Depends(use_read_replica)],
+)
 async def get_identifications(
+    request: Request,
     _: Annotated[User, Depends(get_user)],
     params: BigParams = Depends(),
+    cursor_params: CursorParams = Depends(),
     minute_interval: int = 30,
-) -> Page[IdentificationOut]:
-    interval = datetime.now() - timedelta(minutes=minute_interval)
-    offset = params.size * (params.page - 1)
-
-    count = await Identification.all().filter(snapshot__timestamp__gte=interval).count()
+) -> Response:
+    """
+    Returns the identifications of the last minutes. Answers `If-None-Match` with 304 when they
+    didn't change.
 
-    identifications = (
-        await Identification.all()
-        .order_by("snapshot__timestamp", "timestamp")
-        .filter(snapshot__timestamp__gte=interval)
-        .limit(params.size)
-        .offset(offset)
-        .prefetch_related("snapshot", "snapshot__camera", "label", "label__object")
+    Send `Accept: application/vnd.apache.arrow.stream`, `application/vnd.apache.parquet` or
+    `application/msgpack` to get the identifications as flat rows in a columnar encoding instead.
+    """
+    interval = make_aware(datetime.now() - timedelta(minutes=minute_interval))
+    page = await get_identifications_page(
+        'snapshot."timestamp" >= $1', [interval], params, cursor_params
     )
-
-    out = [
-        IdentificationOut(
-            id=identification.id,
-            object=identification.label.object.slug,
-            title=identification.label.object.title,
-            question=identification.label.object.question,
-            explanation=identification.label.object.explanation,
-            timestamp=identification.timestamp,
-            label=identification.label.value,
-            label_text=identification.label.text,
-            label_explanation=identification.label_explanation,
-            snapshot=SnapshotOut(
-                id=identification.snapshot.id,
-                camera_id=identification.snapshot.camera.id,
-                image_url=identification.snapshot.public_url,
-                timestamp=identification.snapshot.timestamp,
-            ),
-        )
-        for identification in identifications
-    ]
-
-    return create_page(out, total=count, params=params)
+    return get_page_response(request, page, flatten_identifications, response_class=ORJSONResponse)
 
 
 @router.post("", response_model=IdentificationOut)
@@ -241,6 +418,8 @@ async def create_user_identification(
         user_identification.label = label
         await user_identification.save()
 
+    await refresh_human_identification_aggregate([identification.snapshot.id])
+
     return IdentificationOut(
         id=identification.id,
         object=object_.slug,
@@ -348,6 +527,8 @@ async def create_marker(
 
         await IdentificationMaker.bulk_update(exist, fields=["tags"])
 
+    await refresh_human_identification_aggregate(snapshot_ids)
+
     return IdentificationMarkerOut(
         count=len(identifications) + len(exist_ids),
         ids=[identification.id for identification in identifications] + exist_ids,
@@ -398,46 +579,93 @@ async def delete_marker(
       "identification_marker"."identification_id" IN ('{"', '".join([str(id) for id in ids])}')
     """
     await conn.execute_query(query)
+    await refresh_human_identification_aggregate(snapshot_ids)
 
     return IdentificationMarkerOut(count=len(ids), ids=ids)
 
 
-@router.get("/aggregate", response_model=list[Aggregation])
+@router.get(
+    "/aggregate",
+    response_model=list[Aggregation],
+    dependencies=[Depends(use_read_replica)],
+)
 async def get_aggregation(
     _: Annotated[User, Depends(is_admin)],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    object_: str | None = Query(None, alias="object", description="Filters by object slug."),
+    page: int = Query(1, ge=1),
+    size: int | None = Query(
+        None, ge=1, le=3000, description="Paginates the snapshots. Returns all when empty."
+    ),
 ) -> list[Aggregation]:
-    query = """
+    values: list[Any] = []
+    snapshot_conditions = ["TRUE"]
+    if start is not None:
+        values.append(start)
+        snapshot_conditions.append(f'snapshot."timestamp" >= ${len(values)}')
+    if end is not None:
+        values.append(end)
+        snapshot_conditions.append(f'snapshot."timestamp" <= ${len(values)}')
+
+    object_condition = "TRUE"
+    if object_ is not None:
+        values.append(object_)
+        object_condition = f'"object".slug = ${len(values)}'
+
+    pagination = ""
+    if size is not None:
+        values += [size, size * (page - 1)]
+        pagination = f"LIMIT ${len(values) - 1} OFFSET ${len(values)}"
+
+    # The counts are maintained by `refresh_human_identification_aggregate`, so only the
+    # snapshots of the requested page are read.
+    query = f"""
+    WITH snapshots AS (
+      SELECT DISTINCT
+        snapshot.id,
+        snapshot."timestamp",
+        snapshot.public_url
+      FROM
+        human_identification_aggregate
+        INNER JOIN snapshot ON snapshot.id = human_identification_aggregate.snapshot_id
+        INNER JOIN label ON label.id = human_identification_aggregate.label_id
+        INNER JOIN "object" ON "object".id = label.object_id
+      WHERE
+        {" AND ".join(snapshot_conditions)}
+        AND {object_condition}
+      ORDER BY
+        snapshot."timestamp" DESC,
+        snapshot.id
+      {pagination}
+    )
     SELECT
-      COUNT(label."value") AS total,
+      human_identification_aggregate."count" AS total,
       label."value" AS label_value,
       "object"."name" AS object_name,
-      snapshot.id AS snapshot_id,
-      snapshot."timestamp" AS snapshot_timestamp,
-      snapshot.public_url AS snapshot_url
+      snapshots.id AS snapshot_id,
+      snapshots."timestamp" AS snapshot_timestamp,
+      snapshots.public_url AS snapshot_url
     FROM
-      user_identification
-      INNER JOIN identification_marker ON identification_marker.identification_id = user_identification.identification_id
-      LEFT JOIN identification ON identification.id = user_identification.identification_id
-      LEFT JOIN snapshot ON snapshot.id = identification.snapshot_id
-      LEFT JOIN label ON label.id = user_identification.label_id
-      LEFT JOIN "object" ON label.object_id = "object".id
-    GROUP BY
-      label."value",
-      "object"."name",
-      snapshot.id,
-      snapshot."timestamp",
-      snapshot.public_url
+      snapshots
+      INNER JOIN human_identification_aggregate ON human_identification_aggregate.snapshot_id = snapshots.id
+      INNER JOIN label ON label.id = human_identification_aggregate.label_id
+      INNER JOIN "object" ON "object".id = label.object_id
+    WHERE
+      {object_condition}
     ORDER BY
-      snapshot."timestamp" DESC
+      snapshots."timestamp" DESC,
+      snapshots.id
     """
-    conn = connections.get("default")
-    aggregation = await conn.execute_query_dict(query)
-    snapshots_id = [identification["snapshot_id"] for identification in aggregation]
-    ia_identifications = (
-        await Identification.all()
-        .filter(Q(snapshot_id__in=snapshots_id), ~Q(label__object__name="image_description"))
-        .prefetch_related("snapshot", "label", "label__object")
+    conn = get_read_connection()
+    aggregation = await conn.execute_query_dict(query, values)
+    snapshots_id = list({identification["snapshot_id"] for identification in aggregation})
+
+    ia_identifications = Identification.filter(
+        Q(snapshot_id__in=snapshots_id), ~Q(label__object__name="image_description")
     )
+    if object_ is not None:
+        ia_identifications = ia_identifications.filter(label__object__slug=object_)
 
     out: dict[UUID, Aggregation] = {}
     for identification in aggregation:
@@ -458,11 +686,13 @@ async def get_aggregation(
                 ia_identification=[],
                 human_identification=[human_identification],
             )
-    for identification in ia_identifications:
-        out[identification.snapshot.id].ia_identification.append(
+    for identification in await ia_identifications.values(
+        "snapshot_id", "label__value", "label__object__name"
+    ):
+        out[identification["snapshot_id"]].ia_identification.append(
             IaIdentificationAggregation(
-                object=identification.label.object.name,
-                label=identification.label.value,
+                object=identification["label__object__name"],
+                label=identification["label__value"],
             )
         )
 
@@ -474,7 +704,9 @@ async def create_hide(
     _: Annotated[User, Depends(is_human)],
     data: HideIn,
 ) -> HideOut:
-    all_identifications = await Identification.filter(id__in=data.identifications_id).all()
+    all_identifications = await Identification.filter(
+        id__in=data.identifications_id
+    ).select_related("label__object")
     if len(all_identifications) == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Identifications not found"
@@ -497,50 +729,64 @@ async def create_hide(
     if len(identifications) == 0:
         return HideOut(count=0, ids=[])
 
-    await HideIdentification.bulk_create(
-        [
-            HideIdentification(timestamp=datetime.now(), identification=identification)
-            for identification in identifications
-        ]
-    )
+    hides = [
+        HideIdentification(timestamp=datetime.now(), identification=identification)
+        for identification in identifications
+    ]
+    await HideIdentification.bulk_create(hides)
+    for hide in hides:
+        object_ = hide.identification.label.object.slug
+        event = HideEventOut(
+            identification_id=hide.identification.id, object=object_, timestamp=hide.timestamp
+        )
+        event_bus.publish("hide", object_, event.json())
 
     return HideOut(
         count=len(identifications), ids=[identification.id for identification in identifications]
     )
 
 
-@router.get("/hide", response_model=list[IdentificationOut])
-async def get_all_hide(_: Annotated[User, Depends(is_human)]) -> list[IdentificationOut]:
-    interval = datetime.now() - timedelta(hours=2)
-    hides = (
-        await HideIdentification.filter(timestamp__gte=interval)
-        .prefetch_related(
-            "identification",
-            "identification__label",
-            "identification__label__object",
-            "identification__snapshot",
-            "identification__snapshot__camera",
-        )
-        .all()
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_identifications(
+    _: Annotated[User, Depends(is_human)],
+    object_: list[str] | None = Query(None, alias="object", description="Filters by object slug."),
+    last_event_id: str | None = Header(
+        None, description="Resumes the stream after this event. Sent by `EventSource` clients."
+    ),
+) -> StreamingResponse:
+    """
+    Streams new identifications and hides as Server-Sent Events. `identification` events carry
+    an identification and `hide` events the id of a hidden identification. A `reset` event means
+    the stream could not be resumed and the client must reload its state.
+    """
+    return StreamingResponse(
+        event_bus.stream(objects=object_, last_event_id=last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    return [
-        IdentificationOut(
-            id=hide.identification.id,
-            object=hide.identification.label.object.slug,
-            title=hide.identification.label.object.title,
-            question=hide.identification.label.object.question,
-            explanation=hide.identification.label.object.explanation,
-            timestamp=hide.identification.timestamp,
-            label=hide.identification.label.value,
-            label_text=hide.identification.label.text,
-            label_explanation="Hide identification",
-            snapshot=SnapshotOut(
-                id=hide.identification.snapshot.id,
-                image_url=hide.identification.snapshot.public_url,
-                camera_id=hide.identification.snapshot.camera_id,
-                timestamp=hide.identification.snapshot.timestamp,
-            ),
-        )
-        for hide in hides
-    ]
+
+@router.get(
+    "/hide",
+    response_model=list[IdentificationOut],
+    dependencies=[Depends(use_read_replica)],
+)
+async def get_all_hide(_: Annotated[User, Depends(is_human)]) -> Response:
+    interval = make_aware(datetime.now() - timedelta(hours=2))
+    query = f"""
+    SELECT
+      {IDENTIFICATION_COLUMNS}
+    FROM
+      hide_identification
+      INNER JOIN identification ON identification."id" = hide_identification.identification_id
+      {IDENTIFICATION_JOINS}
+    WHERE
+      hide_identification."timestamp" >= $1
+    """
+    items = []
+    for record in await fetch_records(get_read_connection(), query, interval):
+        item = identification_record_to_json(record)
+        item["label_explanation"] = "Hide identification"
+        items.append(item)
+
+    return ORJSONResponse(items)
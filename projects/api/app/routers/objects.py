@@ -3,7 +3,10 @@ from functools import partial
 from typing import Annotated
 from uuid import UUID
 
-from app.dependencies import is_admin, is_agent
+from app.cache import invalidate_cameras_cache, invalidate_prompts_cache
+from app.dependencies import get_loaders, is_admin, is_agent, use_read_replica
+from app.live_state import live_state
+from app.loaders import Loaders
 from app.models import Camera, Label, Object
 from app.pydantic_models import (
     CameraOut,
@@ -20,49 +23,42 @@ from app.utils import apply_to_list, transform_tortoise_to_pydantic
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi_pagination import Page
 from fastapi_pagination.ext.tortoise import paginate as tortoise_paginate
-from tortoise.fields import ReverseRelation
 
 router = APIRouter(prefix="/objects", tags=["Objects"])
 
 
-@router.get("", response_model=Page[ObjectOut])
+@router.get("", response_model=Page[ObjectOut], dependencies=[Depends(use_read_replica)])
 async def get_objects(
     _: Annotated[User, Depends(is_agent)],
+    loaders: Annotated[Loaders, Depends(get_loaders)],
 ) -> Page[ObjectOut]:
     """Get a list of all objects."""
 
-    async def get_labels(labels_relation: ReverseRelation) -> list[LabelOut]:
-        labels: list[Label] = await labels_relation.all()
+    async def transform(objects: list[Object]) -> list[ObjectOut]:
+        labels = await loaders.object_labels.load_many([object.id for object in objects])
         return [
-            LabelOut(
-                id=label.id,
-                value=label.value,
-                criteria=label.criteria,
-                identification_guide=label.identification_guide,
-                text=label.text,
+            ObjectOut(
+                id=object.id,
+                name=object.name,
+                slug=object.slug,
+                title=object.title,
+                question=object.question,
+                explanation=object.explanation,
+                labels=[
+                    LabelOut(
+                        id=label.id,
+                        value=label.value,
+                        criteria=label.criteria,
+                        identification_guide=label.identification_guide,
+                        text=label.text,
+                    )
+                    for label in object_labels
+                ],
             )
-            for label in labels
+            for object, object_labels in zip(objects, labels)
         ]
 
-    return await tortoise_paginate(
-        Object,
-        transformer=partial(
-            apply_to_list,
-            fn=partial(
-                transform_tortoise_to_pydantic,
-                pydantic_model=ObjectOut,
-                vars_map=[
-                    ("id", "id"),
-                    ("name", "name"),
-                    ("slug", "slug"),
-                    ("title", "title"),
-                    ("question", "question"),
-                    ("explanation", "explanation"),
-                    ("labels", ("labels", get_labels)),
-                ],
-            ),
-        ),
-    )
+    return await tortoise_paginate(Object, transformer=transform)
 
 
 @router.post("", response_model=ObjectOut)
@@ -72,6 +68,9 @@ async def create_object(
 ) -> ObjectOut:
     """Add a new object."""
     object = await Object.create(**object_.dict())
+    # Cameras can identify it before watching it
+    live_state.set_object(object)
+    await invalidate_prompts_cache()
     return ObjectOut(
         id=object.id,
         name=object.name,
@@ -87,6 +86,7 @@ async def create_object(
 async def get_object(
     object_id: UUID,
     _: Annotated[User, Depends(is_agent)],
+    loaders: Annotated[Loaders, Depends(get_loaders)],
 ) -> ObjectOut:
     """Get an object."""
     object = await Object.get_or_none(id=object_id)
@@ -96,19 +96,6 @@ async def get_object(
             detail="Object not found",
         )
 
-    async def get_labels(labels_relation: ReverseRelation) -> list[LabelOut]:
-        labels: list[Label] = await labels_relation.all()
-        return [
-            LabelOut(
-                id=label.id,
-                value=label.value,
-                criteria=label.criteria,
-                identification_guide=label.identification_guide,
-                text=label.text,
-            )
-            for label in labels
-        ]
-
     return ObjectOut(
         id=object.id,
         name=object.name,
@@ -116,7 +103,16 @@ async def get_object(
         title=object.title,
         question=object.question,
         explanation=object.explanation,
-        labels=await get_labels(object.labels),
+        labels=[
+            LabelOut(
+                id=label.id,
+                value=label.value,
+                criteria=label.criteria,
+                identification_guide=label.identification_guide,
+                text=label.text,
+            )
+            for label in await loaders.object_labels.load(object.id)
+        ],
     )
 
 
@@ -144,6 +140,9 @@ async def update_object(
     if object_.explanation:
         object.explanation = object_.explanation
     await object.save()
+    await invalidate_cameras_cache()
+    live_state.set_object(object)
+    await invalidate_prompts_cache()
     return ObjectOut(
         id=object.id,
         name=object.name,
@@ -177,6 +176,9 @@ async def delete_object(
             detail="Object not found",
         )
     await object.delete()
+    await invalidate_cameras_cache()
+    live_state.remove_object(object.id)
+    await invalidate_prompts_cache()
     return ObjectOut(
         id=object.id,
         name=object.name,
@@ -250,6 +252,7 @@ async def add_label_to_object(
         order = last_label.order + 1
 
     label_raw = await Label.create(object=object, order=order, **label.dict())
+    await invalidate_prompts_cache()
     return LabelOut(
         id=label_raw.id,
         value=label.value,
@@ -297,6 +300,9 @@ async def update_object_label(
     if label_.text:
         label_obj.text = label_.text
     await label_obj.save()
+    await invalidate_cameras_cache()
+    live_state.update_label(label_obj)
+    await invalidate_prompts_cache()
     return LabelOut(
         id=label_obj.id,
         value=label_obj.value,
@@ -337,6 +343,7 @@ async def order_object_label(
         labels[index].order = order[label.value]
 
     await Label.bulk_update(labels, fields=["order"])
+    await invalidate_prompts_cache()
 
     return sorted(
         [
@@ -381,7 +388,12 @@ async def delete_object_label(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Label not found",
         )
+    camera_ids = await live_state.fetch_label_camera_ids(label_obj.id)
     await label_obj.delete()
+    await invalidate_cameras_cache()
+    for camera_id in camera_ids:
+        await live_state.reload_camera(camera_id)
+    await invalidate_prompts_cache()
     return LabelOut(
         id=label_obj.id,
         value=label_obj.value,
@@ -444,6 +456,8 @@ async def add_camera_to_object(
             detail="Camera not found",
         )
     await object.cameras.add(camera)
+    await invalidate_cameras_cache()
+    live_state.add_camera_object(camera.id, object)
     return CameraOut(
         id=camera.id,
         name=camera.name,
@@ -474,6 +488,8 @@ async def remove_camera_from_object(
             detail="Camera not found",
         )
     await object.cameras.remove(camera)
+    await invalidate_cameras_cache()
+    live_state.remove_camera_object(camera.id, object.id)
     return CameraOut(
         id=camera.id,
         name=camera.name,
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
-from functools import partial
 from typing import Annotated
 from uuid import UUID
 
-from app.dependencies import is_admin, is_agent
+from app.cache import invalidate_prompts_cache
+from app.dependencies import get_loaders, is_admin, is_agent, use_read_replica
+from app.loaders import Loaders
 from app.models import Object, Prompt, PromptObject
 from app.pydantic_models import (
     LabelOut,
@@ -14,55 +15,39 @@ from app.pydantic_models import (
     PromptsOut,
     User,
 )
-from app.utils import (
-    apply_to_list,
-    get_prompt_formatted_text,
-    get_prompts_best_fit,
-    transform_tortoise_to_pydantic,
-)
+from app.utils import get_prompt_formatted_text, get_prompts_best_fit
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi_pagination import Page
 from fastapi_pagination.ext.tortoise import paginate as tortoise_paginate
-from tortoise.fields import ReverseRelation
 
 router = APIRouter(prefix="/prompts", tags=["Prompts"])
 
 
-@router.get("", response_model=Page[PromptOut])
+@router.get("", response_model=Page[PromptOut], dependencies=[Depends(use_read_replica)])
 async def get_prompts(
     _: Annotated[User, Depends(is_admin)],
+    loaders: Annotated[Loaders, Depends(get_loaders)],
 ) -> Page[PromptOut]:
     """Get a list of all prompts."""
 
-    async def get_objects(objects_relation: ReverseRelation) -> list[str]:
-        return (
-            await Object.filter(prompts__in=await objects_relation.all())
-            .all()
-            .order_by("prompts__order")
-            .values_list("slug", flat=True)
-        )
+    async def transform(prompts: list[Prompt]) -> list[PromptOut]:
+        objects = await loaders.prompt_object_slugs.load_many([prompt.id for prompt in prompts])
+        return [
+            PromptOut(
+                id=prompt.id,
+                name=prompt.name,
+                model=prompt.model,
+                prompt_text=prompt.prompt_text,
+                max_output_token=prompt.max_output_token,
+                temperature=prompt.temperature,
+                top_k=prompt.top_k,
+                top_p=prompt.top_p,
+                objects=prompt_objects,
+            )
+            for prompt, prompt_objects in zip(prompts, objects)
+        ]
 
-    return await tortoise_paginate(
-        Prompt,
-        transformer=partial(
-            apply_to_list,
-            fn=partial(
-                transform_tortoise_to_pydantic,
-                pydantic_model=PromptOut,
-                vars_map=[
-                    ("id", "id"),
-                    ("name", "name"),
-                    ("model", "model"),
-                    ("prompt_text", "prompt_text"),
-                    ("max_output_token", "max_output_token"),
-                    ("temperature", "temperature"),
-                    ("top_k", "top_k"),
-                    ("top_p", "top_p"),
-                    ("objects", ("objects", get_objects)),
-                ],
-            ),
-        ),
-    )
+    return await tortoise_paginate(Prompt, transformer=transform)
 
 
 @router.post("", response_model=PromptOut)
@@ -72,6 +57,7 @@ async def create_prompt(
 ) -> PromptOut:
     """Add a new prompt."""
     prompt = await Prompt.create(**prompt_.dict())
+    await invalidate_prompts_cache()
     return PromptOut(
         id=prompt.id,
         name=prompt.name,
@@ -124,6 +110,7 @@ async def update_prompt(
     if prompt is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
     await prompt.update_from_dict(prompt_.dict()).save()
+    await invalidate_prompts_cache()
     objects = (
         await Object.filter(prompts__prompt=prompt)
         .order_by("prompts__order")
@@ -153,17 +140,21 @@ async def delete_prompt(
     if prompt is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
     await prompt.delete()
+    await invalidate_prompts_cache()
 
 
 @router.get("/{prompt_id}/objects", response_model=list[ObjectOut])
 async def get_prompt_objects(
     prompt_id: UUID,
     _: Annotated[User, Depends(is_agent)],
+    loaders: Annotated[Loaders, Depends(get_loaders)],
 ) -> list[ObjectOut]:
     """Get a prompt's objects."""
     prompt = await Prompt.get_or_none(id=prompt_id)
     if prompt is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
+    objects = await Object.filter(prompts__prompt=prompt).order_by("prompts__order").all()
+    labels = await loaders.object_labels.load_many([object_.id for object_ in objects])
     return [
         ObjectOut(
             id=object_.id,
@@ -179,10 +170,10 @@ async def get_prompt_objects(
                     identification_guide=label.identification_guide,
                     text=label.text,
                 )
-                for label in await object_.labels.all()
+                for label in object_labels
             ],
         )
-        for object_ in await Object.filter(prompts__prompt=prompt).order_by("prompts__order").all()
+        for object_, object_labels in zip(objects, labels)
     ]
 
 
@@ -191,6 +182,7 @@ async def add_prompt_object(
     prompt_id: UUID,
     object_id: UUID,
     _: Annotated[User, Depends(is_admin)],
+    loaders: Annotated[Loaders, Depends(get_loaders)],
 ) -> ObjectOut:
     """Add an object to a prompt."""
     prompt = await Prompt.get_or_none(id=prompt_id)
@@ -206,6 +198,7 @@ async def add_prompt_object(
         order = prompt_object.order + 1
 
     await PromptObject.create(prompt=prompt, object=object_, order=order)
+    await invalidate_prompts_cache()
 
     return ObjectOut(
         id=object_.id,
@@ -221,7 +214,7 @@ async def add_prompt_object(
                 identification_guide=label.identification_guide,
                 text=label.text,
             )
-            for label in await object_.labels.all()
+            for label in await loaders.object_labels.load(object_.id)
         ],
     )
 
@@ -254,6 +247,7 @@ async def order_prompt_object(
         prompt_objects[index].order = object_slugs[prompt_object.object.slug]
 
     await PromptObject.bulk_update(prompt_objects, fields=["order"])
+    await invalidate_prompts_cache()
 
     return PromptOut(
         id=prompt.id,
@@ -282,12 +276,14 @@ async def remove_prompt_object(
     if object_ is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Object not found")
     await PromptObject.filter(prompt=prompt, object=object_).delete()
+    await invalidate_prompts_cache()
 
 
 @router.post("/best_fit", response_model=PromptsOut)
 async def get_best_fit_prompts(
     request: ObjectsSlugIn,
     _: Annotated[User, Depends(is_agent)],
+    loaders: Annotated[Loaders, Depends(get_loaders)],
 ) -> PromptsOut:
     """Get the best fit prompts for a list of objects."""
     object_slugs = request.objects
@@ -305,14 +301,11 @@ async def get_best_fit_prompts(
         prompts_formatted_text.append(
             await get_prompt_formatted_text(prompt=prompt, objects=objects)
         )
+    objects_slugs = await loaders.prompt_object_slugs.load_many([prompt.id for prompt in prompts])
     ret_prompts = []
-    for prompt, prompt_formatted_text in zip(prompts, prompts_formatted_text):
-        object_slugs = (
-            await Object.filter(prompts__prompt=prompt)
-            .all()
-            .order_by("prompts__order")
-            .values_list("slug", flat=True)
-        )
+    for prompt, prompt_formatted_text, object_slugs in zip(
+        prompts, prompts_formatted_text, objects_slugs
+    ):
         ret_prompts.append(
             PromptOut(
                 id=prompt.id,
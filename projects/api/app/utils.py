@@ -1,19 +1,38 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import base64
+import hashlib
 import inspect
 import json
 from asyncio import Task
-from typing import Any, Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Hashable
+from uuid import UUID
 
 import nest_asyncio
 from app import config
+from app.cache import (
+    PROMPTS_EXPIRE,
+    PROMPTS_NAMESPACE,
+    get_cache_stats,
+    get_prompts_cache_key,
+    single_flight,
+)
 from app.models import Label, Object, Prompt
-from google.cloud import pubsub
+from app.pydantic_models import CompiledPrompt
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi_cache import FastAPICache
+from google.cloud import pubsub, storage
 from google.oauth2 import service_account
+from loguru import logger
 from pydantic import BaseModel
 from tortoise.functions import Count
 from tortoise.models import Model
+from tortoise.transactions import in_transaction
 from vision_ai.base.shared_models import Output, OutputFactory
 
 
@@ -65,8 +84,14 @@ def get_gcp_credentials(
     scopes: list[str] | None = None,
 ) -> service_account.Credentials:
     """
-    Gets credentials from env vars
+    Gets credentials from env vars. The credentials are created once per set of scopes and
+    reused by the whole process.
     """
+    return _get_gcp_credentials(tuple(scopes) if scopes else None)
+
+
+@lru_cache(maxsize=None)
+def _get_gcp_credentials(scopes: tuple[str, ...] | None) -> service_account.Credentials:
     env: str = config.GCP_SERVICE_ACCOUNT_CREDENTIALS
     if not env:
         raise ValueError("GCP_SERVICE_ACCOUNT_CREDENTIALS env var not set!")
@@ -127,6 +152,7 @@ async def get_objects_table(objects: list[Object]) -> str:
     return header + rows
 
 
+@lru_cache(maxsize=1)
 def get_output_schema_and_sample() -> tuple[str, str]:
     """
     Gets the output schema and sample for the vision AI model.
@@ -139,6 +165,15 @@ def get_output_schema_and_sample() -> tuple[str, str]:
     return output_schema, output_sample
 
 
+def _get_objects_key(objects: list[Object]) -> Hashable:
+    return frozenset(object_.id for object_ in objects)
+
+
+def _get_prompt_objects_key(prompt: Prompt, objects: list[Object]) -> Hashable:
+    return prompt.id, _get_objects_key(objects)
+
+
+@single_flight(_get_prompt_objects_key)
 async def get_prompt_formatted_text(prompt: Prompt, objects: list[Object]) -> str:
     """
     Gets the full text of a prompt.
@@ -204,36 +239,251 @@ async def get_prompts_best_fit(objects: list[Object], one: bool = False) -> list
     return final_prompts
 
 
+@single_flight(_get_objects_key)
+async def get_compiled_prompt(objects: list[Object]) -> CompiledPrompt | None:
+    """
+    Gets the best fit prompt for a set of objects with its text already formatted.
+
+    The result is cached by the set of objects ids and the catalog version, so the prompts of a
+    camera are only compiled again after its objects change or the catalog is written.
+
+    Args:
+        objects (list[Object]): The objects.
+
+    Returns:
+        CompiledPrompt | None: The compiled prompt or None if no prompt fits the objects.
+    """
+    stats = get_cache_stats(PROMPTS_NAMESPACE)
+    backend = FastAPICache.get_backend()
+    key = await get_prompts_cache_key([str(object_.id) for object_ in objects])
+
+    cached = await backend.get(key)
+    if cached is not None:
+        stats.hit()
+        return None if cached in ("null", b"null") else CompiledPrompt.parse_raw(cached)
+
+    stats.miss()
+    logger.debug(f"Compiled prompts cache hit ratio: {stats.hit_ratio:.2%}")
+    compiled_prompt = None
+    prompts = await get_prompts_best_fit(objects=objects, one=True)
+    if len(prompts) > 0:
+        prompt = prompts[0]
+        compiled_prompt = CompiledPrompt(
+            id=prompt.id,
+            model=prompt.model,
+            prompt_text=await get_prompt_formatted_text(prompt=prompt, objects=objects),
+            max_output_token=prompt.max_output_token,
+            temperature=prompt.temperature,
+            top_k=prompt.top_k,
+            top_p=prompt.top_p,
+        )
+
+    value = compiled_prompt.json() if compiled_prompt is not None else "null"
+    await backend.set(key, value, expire=PROMPTS_EXPIRE)
+
+    return compiled_prompt
+
+
+@lru_cache(maxsize=1)
 def get_pubsub_client() -> pubsub.PublisherClient:
     """
-    Get a PubSub client with the credentials from the environment.
+    Get a PubSub client with the credentials from the environment. The client is created once
+    and reused, so concurrent publishes are batched together.
 
     Returns:
-        storage.Client: The GCS client.
+        pubsub.PublisherClient: The PubSub client.
     """
     credentials = get_gcp_credentials(scopes=["https://www.googleapis.com/auth/pubsub"])
-    return pubsub.PublisherClient(credentials=credentials)
+    batch_settings = pubsub.types.BatchSettings(
+        max_messages=config.GCP_PUBSUB_BATCH_MAX_MESSAGES,
+        max_latency=config.GCP_PUBSUB_BATCH_MAX_LATENCY,
+    )
+    return pubsub.PublisherClient(credentials=credentials, batch_settings=batch_settings)
+
 
+@lru_cache(maxsize=1)
+def get_storage_client() -> storage.Client:
+    """
+    Get a GCS client with the credentials from the environment. The client is created once
+    and reused.
+
+    Returns:
+        storage.Client: The GCS client.
+    """
+    return storage.Client(credentials=get_gcp_credentials())
+
+
+@lru_cache(maxsize=1)
+def get_signing_executor() -> ThreadPoolExecutor:
+    """
+    Get the pool of threads that sign the upload URLs of the snapshots, so the RSA signatures
+    don't block the event loop.
 
-def publish_message(
+    Returns:
+        ThreadPoolExecutor: The pool.
+    """
+    return ThreadPoolExecutor(
+        max_workers=config.GCS_SIGNING_WORKERS, thread_name_prefix="gcs-signing"
+    )
+
+
+def get_snapshot_blob_path(camera_id: str, snapshot_id: UUID, timestamp: datetime) -> str:
+    path_data = timestamp.strftime("ano=%Y/mes=%m/dia=%d")
+    return f"{config.GCS_BUCKET_PATH_PREFIX}/{path_data}/camera_id={camera_id}/{snapshot_id}.png"
+
+
+def sign_snapshot_uploads(uploads: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Signs the v4 URLs that agents PUT the snapshot images to.
+
+    Args:
+        uploads (list[tuple[str, str]]): The blob path and the base64 MD5 of each image.
+
+    Returns:
+        list[tuple[str, str]]: The signed URL and the public URL of each blob.
+    """
+    bucket = get_storage_client().bucket(config.GCS_BUCKET_NAME)
+    urls = []
+    for blob_path, hash_md5 in uploads:
+        blob = bucket.blob(blob_name=blob_path)
+        url = blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(minutes=15),
+            method="PUT",
+            content_md5=hash_md5,
+            content_type="image/png",
+        )
+        urls.append((url, blob.public_url))
+    return urls
+
+
+async def generate_snapshot_upload_urls(uploads: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Signs the upload URLs of the snapshots like `sign_snapshot_uploads`, split in one chunk per
+    worker of `get_signing_executor`.
+
+    Args:
+        uploads (list[tuple[str, str]]): The blob path and the base64 MD5 of each image.
+
+    Returns:
+        list[tuple[str, str]]: The signed URL and the public URL of each blob, in order.
+    """
+    if len(uploads) == 0:
+        return []
+
+    size = -(-len(uploads) // config.GCS_SIGNING_WORKERS)
+    chunks = []
+    for start in range(0, len(uploads), size):
+        end = start + size
+        chunks.append(uploads[start:end])
+
+    loop = asyncio.get_running_loop()
+    executor = get_signing_executor()
+    signed = await asyncio.gather(
+        *[loop.run_in_executor(executor, sign_snapshot_uploads, chunk) for chunk in chunks]
+    )
+    return [url for chunk in signed for url in chunk]
+
+
+async def publish_message(
     *,
     data: dict[str, str],
     project_id: str = config.GCP_PUBSUB_PROJECT_ID,
     topic: str = config.GCP_PUBSUB_TOPIC_NAME,
-):
+) -> str:
     """
-    Publishes a message to a PubSub topic.
+    Publishes a message to a PubSub topic. The message is sent by the client's batching thread
+    and this coroutine waits for it without blocking the event loop.
 
     Args:
         data (dict[str, str]): The data to publish.
         project_id (str): The project id.
         topic (str): The topic name.
+
+    Returns:
+        str: The published message id.
     """
     client = get_pubsub_client()
     topic_name = f"projects/{project_id}/topics/{topic}"
     byte_data = json.dumps(data, default=str).encode("utf-8")
     future = client.publish(topic_name, byte_data)
-    return future.result()
+    return await asyncio.wrap_future(future)
+
+
+async def refresh_human_identification_aggregate(snapshot_ids: list[UUID]) -> None:
+    """
+    Recounts the human identifications of marked identifications of some snapshots into the
+    `human_identification_aggregate` table. Must be called after writing user identifications
+    or markers of these snapshots.
+
+    Args:
+        snapshot_ids (list[UUID]): The snapshots ids.
+    """
+    if len(snapshot_ids) == 0:
+        return
+
+    async with in_transaction("default") as conn:
+        await conn.execute_query(
+            "DELETE FROM human_identification_aggregate WHERE snapshot_id = ANY($1::UUID[])",
+            [snapshot_ids],
+        )
+        await conn.execute_query(
+            """
+            INSERT INTO human_identification_aggregate (id, snapshot_id, label_id, "count")
+            SELECT
+              gen_random_uuid(),
+              identification.snapshot_id,
+              user_identification.label_id,
+              COUNT(*)
+            FROM
+              user_identification
+              INNER JOIN identification_marker ON identification_marker.identification_id = user_identification.identification_id
+              INNER JOIN identification ON identification.id = user_identification.identification_id
+            WHERE
+              identification.snapshot_id = ANY($1::UUID[])
+            GROUP BY
+              identification.snapshot_id,
+              user_identification.label_id
+            ON CONFLICT (snapshot_id, label_id) DO UPDATE SET "count" = EXCLUDED."count"
+            """,
+            [snapshot_ids],
+        )
+
+
+def get_conditional_response(
+    request: Request, content: Any, response_class: type[Response] = JSONResponse
+) -> Response:
+    """
+    Renders a response, JSON by default, with a strong `ETag` derived from its body. If the request sends the
+    same tag in `If-None-Match`, an empty `304 Not Modified` is returned instead, so clients
+    polling an unchanged resource don't download it again.
+
+    Args:
+        request (Request): The request.
+        content (Any): The response content.
+        response_class (type[Response], optional): The class that renders the content. Only
+            `JSONResponse` gets the content through `jsonable_encoder`, `ORJSONResponse` renders
+            dicts of UUIDs and datetimes as is. Defaults to JSONResponse.
+
+    Returns:
+        Response: The rendered or the not modified response.
+    """
+    headers = {"Cache-Control": "no-cache"}
+    if response_class is JSONResponse:
+        content = jsonable_encoder(content)
+    response = response_class(content=content, headers=headers)
+    etag = f'"{hashlib.md5(response.body).hexdigest()}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, "ETag": etag}
+            )
+
+    response.headers["ETag"] = etag
+    return response
 
 
 def slugify(text: str) -> str:
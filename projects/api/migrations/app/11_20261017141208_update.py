@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX "idx_identificat_identif_6af179" ON "identification_marker" ("identification_id");
+        CREATE INDEX "idx_whitelist_i_identif_fb0f23" ON "whitelist_identification" ("identification_id", "username");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_identificat_identif_6af179";
+        DROP INDEX "idx_whitelist_i_identif_fb0f23";"""
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "human_identification_aggregate" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "count" INT NOT NULL,
+    "label_id" UUID NOT NULL REFERENCES "label" ("id") ON DELETE CASCADE,
+    "snapshot_id" UUID NOT NULL REFERENCES "snapshot" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_human_ident_snapsho_c6c265" UNIQUE ("snapshot_id", "label_id")
+);
+        INSERT INTO "human_identification_aggregate" ("id", "snapshot_id", "label_id", "count")
+        SELECT
+          gen_random_uuid(),
+          identification.snapshot_id,
+          user_identification.label_id,
+          COUNT(*)
+        FROM
+          user_identification
+          INNER JOIN identification_marker ON identification_marker.identification_id = user_identification.identification_id
+          INNER JOIN identification ON identification.id = user_identification.identification_id
+        GROUP BY
+          identification.snapshot_id,
+          user_identification.label_id;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "human_identification_aggregate";"""
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX "idx_snapshot_camera__e89364" ON "snapshot" ("camera_id", "timestamp");
+        CREATE INDEX "idx_identificat_timesta_48c0d9" ON "identification" ("timestamp");
+        CREATE INDEX "idx_identificat_snapsho_a5608c" ON "identification" ("snapshot_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "idx_snapshot_camera__e89364";
+        DROP INDEX "idx_identificat_timesta_48c0d9";
+        DROP INDEX "idx_identificat_snapsho_a5608c";"""
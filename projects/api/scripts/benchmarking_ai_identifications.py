@@ -0,0 +1,264 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the set-based review queue of `GET /identifications/ai` against the previous ORM
+implementation while the review history of the user grows.
+
+The dataset is created on the database configured in `app.db.TORTOISE_ORM`, which MUST be a
+disposable one: every camera, object, snapshot, identification and marker is deleted first.
+
+Usage:
+    python scripts/benchmarking_ai_identifications.py [--markers 100000] [--history 50000]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from app.db import TORTOISE_ORM
+from app.models import (
+    Camera,
+    Identification,
+    IdentificationMaker,
+    Label,
+    Object,
+    Snapshot,
+    UserIdentification,
+    WhitelistIdentification,
+)
+from app.pydantic_models import IdentificationOut, SnapshotOut
+from app.routers.identifications import (
+    count_pending_identifications,
+    get_pending_identifications,
+)
+from tortoise import Tortoise
+from tortoise.expressions import Q
+
+BATCH_SIZE = 5000
+USERNAME = "benchmark"
+
+
+async def get_ai_identifications_orm(
+    username: str, size: int, offset: int
+) -> tuple[list[IdentificationOut], int]:
+    """The ORM implementation of `GET /identifications/ai` used before the set-based query."""
+    indentificateds = (
+        await UserIdentification.all()
+        .filter(username=username)
+        .values_list("identification_id", flat=True)
+    )
+
+    whitelist = (
+        await WhitelistIdentification.all()
+        .filter(username=username)
+        .values_list("identification_id", flat=True)
+    )
+
+    ids = (
+        await IdentificationMaker.all()
+        .filter(
+            Q(identification_id__not_in=indentificateds)
+            & Q(Q(all_users=True) | Q(identification_id__in=whitelist))
+        )
+        .values_list("identification_id", flat=True)
+    )
+
+    count = len(ids)
+
+    identifications = (
+        await Identification.all()
+        .filter(id__in=ids)
+        .order_by("snapshot__timestamp", "timestamp")
+        .limit(size)
+        .offset(offset)
+        .prefetch_related("snapshot", "snapshot__camera", "label", "label__object")
+    )
+
+    out = [
+        IdentificationOut(
+            id=identification.id,
+            object=identification.label.object.slug,
+            title=identification.label.object.title,
+            question=identification.label.object.question,
+            explanation=identification.label.object.explanation,
+            timestamp=identification.timestamp,
+            label=identification.label.value,
+            label_text=identification.label.text,
+            label_explanation=identification.label_explanation,
+            snapshot=SnapshotOut(
+                id=identification.snapshot.id,
+                camera_id=identification.snapshot.camera.id,
+                image_url=identification.snapshot.public_url,
+                timestamp=identification.snapshot.timestamp,
+            ),
+        )
+        for identification in identifications
+    ]
+
+    return out, count
+
+
+async def get_ai_identifications_sql(
+    username: str, size: int, offset: int
+) -> tuple[list[IdentificationOut], int]:
+    out = await get_pending_identifications(username, size=size, offset=offset)
+    return out, await count_pending_identifications(username)
+
+
+async def bulk_create(model, rows: list) -> None:
+    for index in range(0, len(rows), BATCH_SIZE):
+        await model.bulk_create(rows[index : index + BATCH_SIZE])  # noqa
+
+
+async def populate(n_markers: int, n_objects: int) -> list[Identification]:
+    await UserIdentification.all().delete()
+    await WhitelistIdentification.all().delete()
+    await IdentificationMaker.all().delete()
+    await Identification.all().delete()
+    await Snapshot.all().delete()
+    await Label.all().delete()
+    await Object.all().delete()
+    await Camera.all().delete()
+
+    objects = [
+        Object(id=uuid4(), name=f"Object {i}", slug=f"object-{i}", title=f"Object {i}?")
+        for i in range(n_objects)
+    ]
+    await bulk_create(Object, objects)
+    labels = [
+        Label(
+            id=uuid4(),
+            object_id=object_.id,
+            value=value,
+            order=order,
+            criteria=value,
+            identification_guide=value,
+        )
+        for object_ in objects
+        for order, value in enumerate(["low", "medium", "high"])
+    ]
+    await bulk_create(Label, labels)
+
+    cameras = [
+        Camera(
+            id=f"{i:06d}",
+            name=f"Camera {i}",
+            rtsp_url=f"rtsp://camera-{i}",
+            update_interval=60,
+            latitude=random.uniform(-23.0, -22.7),
+            longitude=random.uniform(-43.7, -43.1),
+        )
+        for i in range(100)
+    ]
+    await bulk_create(Camera, cameras)
+
+    now = datetime.now()
+    snapshots: list[Snapshot] = []
+    identifications: list[Identification] = []
+    while len(identifications) < n_markers:
+        timestamp = now - timedelta(seconds=len(snapshots))
+        snapshot = Snapshot(
+            id=uuid4(),
+            camera_id=random.choice(cameras).id,
+            public_url=f"https://bucket/{uuid4()}.png",
+            timestamp=timestamp,
+        )
+        snapshots.append(snapshot)
+        for label in random.sample(labels, k=n_objects):
+            identifications.append(
+                Identification(
+                    id=uuid4(),
+                    snapshot_id=snapshot.id,
+                    label_id=label.id,
+                    timestamp=timestamp,
+                    label_explanation="synthetic",
+                )
+            )
+    await bulk_create(Snapshot, snapshots)
+    await bulk_create(Identification, identifications)
+
+    # One in ten markers is restricted to a whitelist that includes the user
+    markers = [
+        IdentificationMaker(
+            id=uuid4(), identification_id=identification.id, all_users=index % 10 != 0
+        )
+        for index, identification in enumerate(identifications[:n_markers])
+    ]
+    await bulk_create(IdentificationMaker, markers)
+    await bulk_create(
+        WhitelistIdentification,
+        [
+            WhitelistIdentification(
+                id=uuid4(), identification_id=marker.identification_id, username=USERNAME
+            )
+            for marker in markers
+            if not marker.all_users
+        ],
+    )
+
+    return identifications[:n_markers]
+
+
+async def add_history(identifications: list[Identification], start: int, end: int) -> None:
+    await bulk_create(
+        UserIdentification,
+        [
+            UserIdentification(
+                id=uuid4(),
+                timestamp=datetime.now(),
+                username=USERNAME,
+                label_id=identification.label_id,
+                identification_id=identification.id,
+            )
+            for identification in identifications[start:end]
+        ],
+    )
+
+
+async def timed(fn, **kwargs) -> tuple[float, list[IdentificationOut], int]:
+    start = time.perf_counter()
+    identifications, count = await fn(**kwargs)
+    return time.perf_counter() - start, identifications, count
+
+
+async def run(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    await Tortoise.generate_schemas()
+
+    print(f"Populating {args.markers} markers...")
+    identifications = await populate(args.markers, args.objects)
+
+    implementations = {
+        "orm": get_ai_identifications_orm,
+        "sql": get_ai_identifications_sql,
+    }
+    kwargs = {"username": USERNAME, "size": args.size, "offset": args.offset}
+    reviewed = 0
+    for history in sorted({0, args.history // 5, args.history}):
+        await add_history(identifications, reviewed, history)
+        reviewed = history
+        for name, fn in implementations.items():
+            await timed(fn, **kwargs)  # warm up
+            times = []
+            for _ in range(args.repeat):
+                elapsed, out, count = await timed(fn, **kwargs)
+                times.append(elapsed)
+            print(
+                f"history {history:>6}, {name}: {count} pending, {len(out)} returned, "
+                f"best {min(times):.3f}s, mean {sum(times) / len(times):.3f}s"
+            )
+
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--markers", type=int, default=100_000)
+    parser.add_argument("--history", type=int, default=50_000)
+    parser.add_argument("--objects", type=int, default=8)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,244 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the set-based `get_cameras_from_db` query against the previous ORM implementation
+on a synthetic dataset.
+
+The dataset is created on the database configured in `app.db.TORTOISE_ORM`, which MUST be a
+disposable one: every camera, object, snapshot and identification is deleted first.
+
+Usage:
+    python scripts/benchmarking_cameras_query.py [--cameras 3000] [--objects 8] [--snapshots 10]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from app.db import TORTOISE_ORM
+from app.models import Camera, Identification, Label, Object, Snapshot
+from app.pydantic_models import CameraIdentificationOut, IdentificationOut, SnapshotOut
+from app.routers.cameras import get_cameras_from_db
+from tortoise import Tortoise, connections
+
+BATCH_SIZE = 5000
+
+
+async def get_cameras_from_db_orm(
+    size: int, offset: int, minute_interval: int
+) -> tuple[list[CameraIdentificationOut], int]:
+    """The ORM implementation of `get_cameras_from_db` used before the set-based query."""
+    cameras_out: dict[str, CameraIdentificationOut] = {}
+    ids = await Camera.all().limit(size).offset(offset).values_list("id", flat=True)
+
+    cameras = (
+        await Camera.all()
+        .filter(id__in=ids)
+        .select_related("objects")
+        .values(
+            "id",
+            "name",
+            "rtsp_url",
+            "update_interval",
+            "latitude",
+            "longitude",
+            "objects__slug",
+        )
+    )
+
+    for camera in cameras:
+        id = camera["id"]
+        slug = camera["objects__slug"]
+
+        if id in cameras_out:
+            if slug is not None and slug not in cameras_out[id].objects:
+                cameras_out[id].objects.append(slug)
+        else:
+            cameras_out[id] = CameraIdentificationOut(
+                id=id,
+                name=camera["name"],
+                rtsp_url=camera["rtsp_url"],
+                update_interval=camera["update_interval"],
+                latitude=camera["latitude"],
+                longitude=camera["longitude"],
+                objects=[slug] if slug is not None else [],
+                identifications=[],
+            )
+
+    lastminutes = datetime.now() - timedelta(minutes=minute_interval)
+
+    identifications = (
+        await Identification.all()
+        .filter(snapshot__camera_id__in=ids, timestamp__gte=lastminutes)
+        .prefetch_related(
+            "snapshot",
+            "snapshot__camera",
+            "label",
+            "label__object",
+        )
+        .order_by("-timestamp")
+    )
+
+    identifications_slug: dict[str, list[str]] = {}
+
+    for identification in identifications:
+        slug = identification.label.object.slug
+        id = identification.snapshot.camera.id
+
+        if id not in identifications_slug:
+            identifications_slug[id] = []
+
+        if slug in identifications_slug[id]:
+            continue
+
+        identifications_slug[id].append(slug)
+
+        cameras_out[id].identifications.append(
+            IdentificationOut(
+                id=identification.id,
+                object=slug,
+                title=identification.label.object.title,
+                question=identification.label.object.question,
+                explanation=identification.label.object.explanation,
+                timestamp=identification.timestamp,
+                label=identification.label.value,
+                label_text=identification.label.text,
+                label_explanation=identification.label_explanation,
+                snapshot=SnapshotOut(
+                    id=identification.snapshot.id,
+                    camera_id=id,
+                    image_url=identification.snapshot.public_url,
+                    timestamp=identification.snapshot.timestamp,
+                ),
+            )
+        )
+
+    return list(cameras_out.values()), await Camera.all().count()
+
+
+async def bulk_create(model, rows: list) -> None:
+    for index in range(0, len(rows), BATCH_SIZE):
+        await model.bulk_create(rows[index : index + BATCH_SIZE])  # noqa
+
+
+async def populate(n_cameras: int, n_objects: int, n_snapshots: int, minute_interval: int) -> int:
+    await Identification.all().delete()
+    await Snapshot.all().delete()
+    await Label.all().delete()
+    await Object.all().delete()
+    await Camera.all().delete()
+
+    objects = [
+        Object(id=uuid4(), name=f"Object {i}", slug=f"object-{i}", title=f"Object {i}?")
+        for i in range(n_objects)
+    ]
+    await bulk_create(Object, objects)
+    labels = [
+        Label(
+            id=uuid4(),
+            object_id=object_.id,
+            value=value,
+            order=order,
+            criteria=value,
+            identification_guide=value,
+        )
+        for object_ in objects
+        for order, value in enumerate(["low", "medium", "high"])
+    ]
+    await bulk_create(Label, labels)
+
+    cameras = [
+        Camera(
+            id=f"{i:06d}",
+            name=f"Camera {i}",
+            rtsp_url=f"rtsp://camera-{i}",
+            update_interval=60,
+            latitude=random.uniform(-23.0, -22.7),
+            longitude=random.uniform(-43.7, -43.1),
+        )
+        for i in range(n_cameras)
+    ]
+    await bulk_create(Camera, cameras)
+    await connections.get("default").execute_many(
+        "INSERT INTO camera_object (camera_id, object_id) VALUES ($1, $2)",
+        [
+            [camera.id, object_.id]
+            for camera in cameras
+            for object_ in random.sample(objects, k=max(1, n_objects // 2))
+        ],
+    )
+
+    now = datetime.now()
+    snapshots: list[Snapshot] = []
+    identifications: list[Identification] = []
+    for camera in cameras:
+        for i in range(n_snapshots):
+            timestamp = now - timedelta(minutes=minute_interval * 2 * i / n_snapshots)
+            snapshot = Snapshot(
+                id=uuid4(),
+                camera_id=camera.id,
+                public_url=f"https://bucket/{uuid4()}.png",
+                timestamp=timestamp,
+            )
+            snapshots.append(snapshot)
+            for label in random.sample(labels, k=max(1, n_objects // 2)):
+                identifications.append(
+                    Identification(
+                        id=uuid4(),
+                        snapshot_id=snapshot.id,
+                        label_id=label.id,
+                        timestamp=timestamp,
+                        label_explanation="synthetic",
+                    )
+                )
+    await bulk_create(Snapshot, snapshots)
+    await bulk_create(Identification, identifications)
+
+    return len(identifications)
+
+
+async def timed(fn, **kwargs) -> tuple[float, list[CameraIdentificationOut]]:
+    start = time.perf_counter()
+    cameras, _ = await fn(**kwargs)
+    return time.perf_counter() - start, cameras
+
+
+async def run(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    await Tortoise.generate_schemas()
+
+    print(f"Populating {args.cameras} cameras...")
+    total = await populate(args.cameras, args.objects, args.snapshots, args.minute_interval)
+    print(f"Created {total} identifications")
+
+    # `__wrapped__` skips the `fastapi_cache` decorator, so every call hits the database.
+    implementations = {
+        "orm": get_cameras_from_db_orm,
+        "sql": get_cameras_from_db.__wrapped__,
+    }
+    kwargs = {"size": args.cameras, "offset": 0, "minute_interval": args.minute_interval}
+    for name, fn in implementations.items():
+        await timed(fn, **kwargs)  # warm up
+        times = []
+        for _ in range(args.repeat):
+            elapsed, cameras = await timed(fn, **kwargs)
+            times.append(elapsed)
+        identifications = sum(len(camera.identifications) for camera in cameras)
+        print(
+            f"{name}: {len(cameras)} cameras, {identifications} identifications, "
+            f"best {min(times):.3f}s, mean {sum(times) / len(times):.3f}s"
+        )
+
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cameras", type=int, default=3000)
+    parser.add_argument("--objects", type=int, default=8)
+    parser.add_argument("--snapshots", type=int, default=10)
+    parser.add_argument("--minute-interval", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
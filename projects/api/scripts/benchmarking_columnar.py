@@ -0,0 +1,115 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the JSON and the columnar encodings of `GET /cameras` and `GET /identifications` in
+payload size and in the client time to load a page into a flat data frame. JSON is flattened
+with `explode_df` and `pd.json_normalize` like the dashboards do, the columnar encodings are
+loaded with `VisionaiAPI._read_dataframe`.
+
+The API is started like in `benchmarking_load.py`, which seeds the database and MUST be given
+a disposable one.
+
+Usage:
+    python scripts/benchmarking_columnar.py --pgserver /tmp/vision-ai-load [--cameras 3000]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import pandas as pd
+import requests
+from benchmarking_load import (
+    FakeOIDCIssuer,
+    configure_environment,
+    seed,
+    start_api,
+    wait_for_api,
+)
+from vision_ai.base.api import (
+    ARROW_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    PARQUET_MEDIA_TYPE,
+    VisionaiAPI,
+)
+from vision_ai.base.pandas import explode_df
+
+
+def read_json_cameras(response: requests.Response) -> pd.DataFrame:
+    cameras = pd.DataFrame(response.json()["items"]).rename(columns={"id": "camera_id"})
+    return explode_df(cameras, "identifications")
+
+
+def read_json_identifications(response: requests.Response) -> pd.DataFrame:
+    return pd.json_normalize(response.json()["items"])
+
+
+def measure(url: str, headers: dict, read, repeat: int) -> tuple[int, int, float]:
+    """Returns the size of the body, the rows and the median seconds to load it."""
+    response = requests.get(url, headers=headers, timeout=120)
+    response.raise_for_status()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dataframe = read(response)
+        times.append(time.perf_counter() - start)
+    return len(response.content), len(dataframe), statistics.median(times)
+
+
+async def run(args: argparse.Namespace) -> None:
+    issuer = FakeOIDCIssuer()
+    configure_environment(args, issuer)
+    await seed(args)
+
+    process, base_url = start_api(args)
+    try:
+        await wait_for_api(process, base_url)
+        token = issuer.token("dashboard", "dashboard", ["vision-ai-admin"])
+        headers = {"Authorization": f"Bearer {token}"}
+        # The client helpers only read the response, so they don't need a session.
+        read_columnar = VisionaiAPI.__new__(VisionaiAPI)._read_dataframe
+
+        endpoints = {
+            "cameras": (
+                f"{base_url}/cameras?size=3000&minute_interval={args.minute_interval}",
+                read_json_cameras,
+            ),
+            "identifications": (
+                f"{base_url}/identifications?size=3000&minute_interval={args.minute_interval}",
+                read_json_identifications,
+            ),
+        }
+        for endpoint, (url, read_json) in endpoints.items():
+            print(f"GET /{endpoint}")
+            for name, accept, read in (
+                ("json", "application/json", read_json),
+                ("arrow", ARROW_MEDIA_TYPE, read_columnar),
+                ("parquet", PARQUET_MEDIA_TYPE, read_columnar),
+                ("msgpack", MSGPACK_MEDIA_TYPE, read_columnar),
+            ):
+                size, rows, elapsed = measure(url, {**headers, "Accept": accept}, read, args.repeat)
+                print(
+                    f"  {name}: {size / 2**10:.0f} KiB, {rows} rows, "
+                    f"loaded in {elapsed * 1000:.1f}ms"
+                )
+    finally:
+        process.terminate()
+        process.wait()
+        issuer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pgserver", help="Data directory of an embedded Postgres.")
+    parser.add_argument("--cameras", type=int, default=3000)
+    parser.add_argument("--objects", type=int, default=4)
+    parser.add_argument("--snapshots", type=int, default=1, help="Snapshots per camera.")
+    parser.add_argument("--minute-interval", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers.")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+    args.pubsub_emulator = None
+    args.markers = 0
+    args.agents = 1
+    asyncio.run(run(args))
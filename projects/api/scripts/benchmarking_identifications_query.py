@@ -0,0 +1,131 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the raw asyncpg and orjson path of `GET /identifications` against the previous ORM,
+pydantic and `jsonable_encoder` implementation on a synthetic dataset, in rows per second and
+peak memory to build and render a page.
+
+The dataset is created on the database configured in `app.db.TORTOISE_ORM`, which MUST be a
+disposable one: every camera, object, snapshot and identification is deleted first.
+
+Usage:
+    python scripts/benchmarking_identifications_query.py [--cameras 1000] [--size 3000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.db import TORTOISE_ORM
+from app.models import Identification
+from app.pagination import BigParams, CursorParams
+from app.pydantic_models import IdentificationOut, SnapshotOut
+from app.routers.identifications import get_identifications_page
+from benchmarking_cameras_query import populate
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi_pagination import create_page
+from tortoise import Tortoise
+from tortoise.timezone import make_aware
+
+
+async def get_identifications_orm(params: BigParams, minute_interval: int) -> bytes:
+    """The ORM implementation of `GET /identifications` used before the raw query."""
+    interval = datetime.now() - timedelta(minutes=minute_interval)
+    offset = params.size * (params.page - 1)
+
+    count = await Identification.all().filter(snapshot__timestamp__gte=interval).count()
+    identifications = (
+        await Identification.all()
+        .filter(snapshot__timestamp__gte=interval)
+        .order_by("snapshot__timestamp", "timestamp")
+        .limit(params.size)
+        .offset(offset)
+        .prefetch_related("snapshot", "label", "label__object")
+    )
+    out = [
+        IdentificationOut(
+            id=identification.id,
+            object=identification.label.object.slug,
+            title=identification.label.object.title,
+            question=identification.label.object.question,
+            explanation=identification.label.object.explanation,
+            timestamp=identification.timestamp,
+            label=identification.label.value,
+            label_text=identification.label.text,
+            label_explanation=identification.label_explanation,
+            snapshot=SnapshotOut(
+                id=identification.snapshot.id,
+                camera_id=identification.snapshot.camera_id,
+                image_url=identification.snapshot.public_url,
+                timestamp=identification.snapshot.timestamp,
+            ),
+        )
+        for identification in identifications
+    ]
+    page = create_page(out, total=count, params=params)
+    return JSONResponse(content=jsonable_encoder(page)).body
+
+
+async def get_identifications_sql(params: BigParams, minute_interval: int) -> bytes:
+    interval = make_aware(datetime.now() - timedelta(minutes=minute_interval))
+    page = await get_identifications_page(
+        'snapshot."timestamp" >= $1', [interval], params, CursorParams(cursor=None)
+    )
+    return ORJSONResponse(page).body
+
+
+async def get_peak_memory(fn, **kwargs) -> int:
+    """Returns the peak of memory allocated during a call, in bytes."""
+    tracemalloc.start()
+    await fn(**kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+async def run(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    await Tortoise.generate_schemas()
+
+    print(f"Populating {args.cameras} cameras...")
+    total = await populate(args.cameras, args.objects, args.snapshots, args.minute_interval)
+    print(f"Created {total} identifications")
+
+    implementations = {
+        "orm": get_identifications_orm,
+        "sql": get_identifications_sql,
+    }
+    kwargs = {
+        "params": BigParams(page=1, size=args.size),
+        "minute_interval": args.minute_interval * 2,
+    }
+    for name, fn in implementations.items():
+        await fn(**kwargs)  # warm up
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = await fn(**kwargs)
+            times.append(time.perf_counter() - start)
+        # Tracing slows everything down, so memory is measured on a separate call
+        peak = await get_peak_memory(fn, **kwargs)
+        best = min(times)
+        print(
+            f"{name}: {len(body)} bytes, best {best:.3f}s, "
+            f"mean {sum(times) / len(times):.3f}s, {args.size / best:.0f} rows/s, "
+            f"peak memory {peak / 2**20:.1f} MiB"
+        )
+
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cameras", type=int, default=1000)
+    parser.add_argument("--objects", type=int, default=8)
+    parser.add_argument("--snapshots", type=int, default=10)
+    parser.add_argument("--minute-interval", type=int, default=30)
+    parser.add_argument("--size", type=int, default=3000, help="Identifications per page.")
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,701 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Load tests the API with concurrent agents, identifiers, dashboards and human reviewers and
+reports the throughput and latency percentiles of each endpoint.
+
+The API is started with uvicorn against a local database, which MUST be a disposable one: every
+agent, camera, object, prompt, snapshot and identification is deleted before seeding. Pass
+`--pgserver <dir>` to run an embedded Postgres from the `pgserver` package instead of using the
+`DATABASE_*` environment variables. Tokens are signed by a fake OIDC issuer served by this
+script and snapshot upload URLs are signed with a throwaway service account, so no credentials
+are needed. Predictions publish to Pub/Sub, so the agents only call `predict` when
+`--pubsub-emulator` points to a Pub/Sub emulator.
+
+The report is written as CSV or JSON, by the extension of `--output`. A previous JSON report
+can be passed as `--baseline` to print the change of each endpoint.
+
+Usage:
+    python scripts/benchmarking_load.py --pgserver /tmp/vision-ai-load [--duration 60]
+        [--output report.json] [--baseline previous.json]
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess  # nosec: B404
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from uuid import UUID, uuid4
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+API_DIR = Path(__file__).resolve().parent.parent
+CLIENT_ID = "vision-ai-load-test"
+DATABASE_NAME = "vision_ai_load_test"
+LABELS = ["low", "medium", "high"]
+BATCH_SIZE = 5000
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def generate_private_key() -> tuple[rsa.RSAPrivateKey, str]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return key, pem
+
+
+class FakeOIDCIssuer:
+    """
+    Serves the JWKS of a throwaway key at `<issuer_url>/jwks/` and signs tokens with it.
+    """
+
+    def __init__(self) -> None:
+        _, self.pem = generate_private_key()
+        self.kid = uuid4().hex
+        public_key = jwk.construct(self.pem, "RS256").public_key().to_dict()
+        jwks = json.dumps({"keys": [{**public_key, "kid": self.kid, "use": "sig"}]}).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(jwks)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def token(self, sub: str, nickname: str, groups: list[str]) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": self.url,
+            "sub": sub,
+            "aud": CLIENT_ID,
+            "exp": now + 24 * 60 * 60,
+            "iat": now,
+            "auth_time": now,
+            "acr": "goauthentik.io/providers/oauth2/default",
+            "azp": CLIENT_ID,
+            "uid": sub,
+            "nickname": nickname,
+            "preferred_username": nickname,
+            "groups": ["vision-ai", *groups],
+        }
+        return jwt.encode(claims, self.pem, algorithm="RS256", headers={"kid": self.kid})
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+def get_fake_service_account() -> str:
+    """
+    Creates the base64 encoded credentials of a throwaway service account. Signed URLs are
+    created locally, so they work without a real account.
+    """
+    _, pem = generate_private_key()
+    info = {
+        "type": "service_account",
+        "project_id": CLIENT_ID,
+        "private_key_id": uuid4().hex,
+        "private_key": pem,
+        "client_email": f"load-test@{CLIENT_ID}.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+    return base64.b64encode(json.dumps(info).encode()).decode()
+
+
+def configure_environment(args: argparse.Namespace, issuer: FakeOIDCIssuer) -> None:
+    """
+    Sets the environment read by `app.config`, both in this process and in the API one.
+    """
+    env = {
+        "ENVIRONMENT": "dev",
+        "INFISICAL_ENABLE": "false",
+        "LOG_LEVEL": "WARNING",
+        "OIDC_CLIENT_ID": CLIENT_ID,
+        "OIDC_CLIENT_SECRET": "",
+        "OIDC_ISSUER_URL": issuer.url,
+        "OIDC_TOKEN_URL": f"{issuer.url}/token/",
+        "OIDC_API_URL": issuer.url,
+        "OIDC_API_TOKEN": "",
+        "GCP_SERVICE_ACCOUNT_CREDENTIALS": get_fake_service_account(),
+        "GCS_BUCKET_NAME": CLIENT_ID,
+        "GCS_BUCKET_PATH_PREFIX": "snapshots",
+        "GCP_PUBSUB_PROJECT_ID": CLIENT_ID,
+        "GCP_PUBSUB_TOPIC_NAME": "predictions",
+    }
+    if args.pubsub_emulator:
+        env["PUBSUB_EMULATOR_HOST"] = args.pubsub_emulator
+
+    if args.pgserver:
+        import pgserver
+
+        server = pgserver.get_server(args.pgserver, cleanup_mode=None)
+        server.psql(f"DROP DATABASE IF EXISTS {DATABASE_NAME}; CREATE DATABASE {DATABASE_NAME};")
+        uri = urlparse(server.get_uri())
+        env.update(
+            {
+                "DATABASE_HOST": parse_qs(uri.query)["host"][0],
+                "DATABASE_PORT": str(uri.port or 5432),
+                "DATABASE_USER": uri.username or "postgres",
+                "DATABASE_PASSWORD": uri.password or "",
+                "DATABASE_NAME": DATABASE_NAME,
+            }
+        )
+
+    os.environ.update(env)
+
+
+@dataclass
+class Dataset:
+    agents: list[tuple[UUID, str, list[str]]]
+    snapshots: list[tuple[str, UUID]]
+    objects: list[str]
+
+
+async def bulk_create(model, rows: list) -> None:
+    for index in range(0, len(rows), BATCH_SIZE):
+        await model.bulk_create(rows[index : index + BATCH_SIZE])  # noqa
+
+
+async def bulk_link(model, field_name: str, pairs: list[tuple]) -> None:
+    from tortoise import connections
+
+    field_ = model._meta.fields_map[field_name]
+    query = (
+        f'INSERT INTO "{field_.through}" ("{field_.backward_key}", "{field_.forward_key}") '
+        "VALUES ($1, $2)"
+    )
+    await connections.get("default").execute_many(query, pairs)
+
+
+async def seed(args: argparse.Namespace) -> Dataset:
+    """
+    Creates the agents, cameras with their objects, snapshots, identifications and markers used
+    by the scenarios.
+    """
+    from app.db import TORTOISE_ORM
+    from app.models import (
+        Agent,
+        Camera,
+        HideIdentification,
+        HumanIdentificationAggregate,
+        Identification,
+        IdentificationMaker,
+        Label,
+        Object,
+        Prompt,
+        PromptObject,
+        Snapshot,
+        UserIdentification,
+        WhitelistIdentification,
+    )
+    from tortoise import Tortoise
+
+    await Tortoise.init(config=TORTOISE_ORM)
+    await Tortoise.generate_schemas()
+
+    for model in [
+        UserIdentification,
+        WhitelistIdentification,
+        IdentificationMaker,
+        HideIdentification,
+        HumanIdentificationAggregate,
+        Identification,
+        Snapshot,
+        PromptObject,
+        Prompt,
+        Label,
+        Object,
+        Camera,
+        Agent,
+    ]:
+        await model.all().delete()
+
+    objects = [
+        Object(id=uuid4(), name=f"Object {i}", slug=f"object-{i}", title=f"Object {i}?")
+        for i in range(args.objects)
+    ]
+    await bulk_create(Object, objects)
+    labels = [
+        Label(
+            id=uuid4(),
+            object_id=object_.id,
+            value=value,
+            order=order,
+            criteria=value,
+            identification_guide=value,
+        )
+        for object_ in objects
+        for order, value in enumerate(LABELS)
+    ]
+    await bulk_create(Label, labels)
+    object_labels: dict[UUID, list[Label]] = defaultdict(list)
+    for label in labels:
+        object_labels[label.object_id].append(label)
+    prompt = await Prompt.create(
+        name="Load test",
+        model="gemini-pro-vision",
+        prompt_text=(
+            "Identify the objects:\n{objects_table_md}\n"
+            "Answer with this schema:\n{output_schema}\nFor example:\n{output_example}"
+        ),
+        max_output_token=1024,
+        temperature=0.2,
+        top_k=32,
+        top_p=1,
+    )
+    await bulk_create(
+        PromptObject,
+        [
+            PromptObject(id=uuid4(), prompt_id=prompt.id, object_id=object_.id, order=order)
+            for order, object_ in enumerate(objects)
+        ],
+    )
+
+    cameras = [
+        Camera(
+            id=f"{i:06d}",
+            name=f"Camera {i}",
+            rtsp_url=f"rtsp://camera-{i}",
+            update_interval=60,
+            latitude=random.uniform(-23.0, -22.7),
+            longitude=random.uniform(-43.7, -43.1),
+        )
+        for i in range(args.cameras)
+    ]
+    await bulk_create(Camera, cameras)
+    await bulk_link(
+        Camera,
+        "objects",
+        [(camera.id, object_.id) for camera in cameras for object_ in objects],
+    )
+
+    agents = [
+        Agent(id=uuid4(), name=f"Load agent {i}", slug=f"load-agent-{i}", auth_sub=f"agent-{i}")
+        for i in range(args.agents)
+    ]
+    await bulk_create(Agent, agents)
+    agent_cameras: dict[UUID, list[str]] = defaultdict(list)
+    for index, camera in enumerate(cameras):
+        agent_cameras[agents[index % len(agents)].id].append(camera.id)
+    await bulk_link(
+        Agent,
+        "cameras",
+        [(agent_id, camera_id) for agent_id, ids in agent_cameras.items() for camera_id in ids],
+    )
+
+    now = datetime.now()
+    snapshots: list[Snapshot] = []
+    identifications: list[Identification] = []
+    for camera in cameras:
+        for index in range(args.snapshots):
+            timestamp = now - timedelta(minutes=index * camera.update_interval / 60)
+            snapshot = Snapshot(
+                id=uuid4(),
+                camera_id=camera.id,
+                public_url=f"https://storage.googleapis.com/{CLIENT_ID}/{uuid4()}.png",
+                timestamp=timestamp,
+            )
+            snapshots.append(snapshot)
+            for object_ in objects:
+                identifications.append(
+                    Identification(
+                        id=uuid4(),
+                        snapshot_id=snapshot.id,
+                        label_id=random.choice(object_labels[object_.id]).id,
+                        timestamp=timestamp,
+                        label_explanation="synthetic",
+                    )
+                )
+    await bulk_create(Snapshot, snapshots)
+    await bulk_create(Identification, identifications)
+    await bulk_create(
+        IdentificationMaker,
+        [
+            IdentificationMaker(id=uuid4(), identification_id=identification.id)
+            for identification in random.sample(
+                identifications, k=min(args.markers, len(identifications))
+            )
+        ],
+    )
+
+    await Tortoise.close_connections()
+    print(
+        f"Seeded {len(cameras)} cameras, {len(snapshots)} snapshots, "
+        f"{len(identifications)} identifications and {min(args.markers, len(identifications))} "
+        "markers"
+    )
+
+    return Dataset(
+        agents=[(agent.id, agent.auth_sub, agent_cameras[agent.id]) for agent in agents],
+        snapshots=[(snapshot.camera_id, snapshot.id) for snapshot in snapshots],
+        objects=[object_.slug for object_ in objects],
+    )
+
+
+def create_topic() -> None:
+    """
+    Creates the predictions topic in the Pub/Sub emulator.
+    """
+    from google.api_core.exceptions import AlreadyExists
+    from google.cloud import pubsub
+
+    publisher = pubsub.PublisherClient()
+    topic = publisher.topic_path(
+        os.environ["GCP_PUBSUB_PROJECT_ID"], os.environ["GCP_PUBSUB_TOPIC_NAME"]
+    )
+    try:
+        publisher.create_topic(name=topic)
+    except AlreadyExists:
+        pass
+
+
+def start_api(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    port = args.port or get_free_port()
+    process = subprocess.Popen(  # nosec: B603
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+            # Like compose-entrypoint.sh, so the benchmark runs the production event loop
+            "--loop",
+            "asyncio",
+        ],
+        cwd=API_DIR,
+        env=os.environ.copy(),
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_for_api(process: subprocess.Popen, base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"The API exited with code {process.returncode}")
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError("The API didn't start in time")
+
+
+@dataclass
+class Recorder:
+    """
+    Latencies and errors of each endpoint, by its route template.
+    """
+
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    async def request(
+        self, client: httpx.AsyncClient, endpoint: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        """
+        Sends a request and records its latency under `endpoint`, e.g. "GET /cameras".
+        """
+        start = time.perf_counter()
+        try:
+            response = await client.request(endpoint.split(" ")[0], url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if response is None or response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return response
+
+    def report(self, duration: float) -> list[dict]:
+        rows = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            if len(latencies) > 1:
+                quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            else:
+                quantiles = latencies * 99
+            rows.append(
+                {
+                    "endpoint": endpoint,
+                    "requests": len(latencies),
+                    "errors": self.errors[endpoint],
+                    "throughput": round(len(latencies) / duration, 2),
+                    "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+                    "p50_ms": round(quantiles[49] * 1000, 2),
+                    "p95_ms": round(quantiles[94] * 1000, 2),
+                    "p99_ms": round(quantiles[98] * 1000, 2),
+                }
+            )
+        return rows
+
+
+@dataclass
+class Scenario:
+    base_url: str
+    issuer: FakeOIDCIssuer
+    dataset: Dataset
+    recorder: Recorder
+    deadline: float
+    think_time: float
+    predict: bool
+    # Snapshots created by the agents, identified by the identifiers
+    snapshots: list[tuple[str, UUID]] = field(default_factory=list)
+
+    def client(self, token: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=60,
+        )
+
+    def running(self) -> bool:
+        return time.monotonic() < self.deadline
+
+    async def think(self) -> None:
+        await asyncio.sleep(random.uniform(0, 2 * self.think_time))
+
+    async def agent(self, agent_id: UUID, sub: str, camera_ids: list[str]) -> None:
+        """Sends heartbeats, polls its cameras and takes snapshots of them."""
+        async with self.client(self.issuer.token(sub, sub, ["vision-ai-agent"])) as client:
+            etag = None
+            while self.running():
+                await self.recorder.request(
+                    client,
+                    "POST /agents/{agent_id}/heartbeat",
+                    f"/agents/{agent_id}/heartbeat",
+                    json={"healthy": True},
+                )
+                response = await self.recorder.request(
+                    client,
+                    "GET /agents/cameras",
+                    "/agents/cameras",
+                    params={"size": 100},
+                    headers={"If-None-Match": etag} if etag else {},
+                )
+                if response is not None:
+                    etag = response.headers.get("ETag", etag)
+
+                camera_id = random.choice(camera_ids)
+                content = os.urandom(1024)
+                response = await self.recorder.request(
+                    client,
+                    "POST /cameras/{camera_id}/snapshots",
+                    f"/cameras/{camera_id}/snapshots",
+                    json={
+                        "hash_md5": base64.b64encode(hashlib.md5(content).digest()).decode(),
+                        "content_length": len(content),
+                    },
+                )
+                if response is not None:
+                    snapshot_id = UUID(response.json()["id"])
+                    if self.predict:
+                        response = await self.recorder.request(
+                            client,
+                            "POST /cameras/{camera_id}/snapshots/{snapshot_id}/predict",
+                            f"/cameras/{camera_id}/snapshots/{snapshot_id}/predict",
+                        )
+                    if response is not None:
+                        self.snapshots.append((camera_id, snapshot_id))
+                await self.think()
+
+    async def identifier(self, index: int) -> None:
+        """Writes the identifications of the snapshots taken by the agents."""
+        token = self.issuer.token(f"identifier-{index}", f"identifier-{index}", ["vision-ai-ai"])
+        async with self.client(token) as client:
+            while self.running():
+                camera_id, snapshot_id = (
+                    self.snapshots.pop()
+                    if self.snapshots
+                    else random.choice(self.dataset.snapshots)
+                )
+                await self.recorder.request(
+                    client,
+                    "POST /cameras/{camera_id}/snapshots/{snapshot_id}/identifications/bulk",
+                    f"/cameras/{camera_id}/snapshots/{snapshot_id}/identifications/bulk",
+                    json={
+                        "objects": [
+                            {
+                                "object": slug,
+                                "label": random.choice(LABELS),
+                                "label_explanation": "load test",
+                            }
+                            for slug in self.dataset.objects
+                        ]
+                    },
+                )
+                await self.think()
+
+    async def dashboard(self, index: int) -> None:
+        """Polls the cameras and the identifications like the dashboard does."""
+        token = self.issuer.token(f"dashboard-{index}", f"dashboard-{index}", ["vision-ai-admin"])
+        etags: dict[str, str] = {}
+        async with self.client(token) as client:
+            while self.running():
+                for endpoint, url, params in [
+                    ("GET /cameras", "/cameras", {"size": 3000}),
+                    ("GET /identifications", "/identifications", {}),
+                ]:
+                    headers = {"If-None-Match": etags[url]} if url in etags else {}
+                    response = await self.recorder.request(
+                        client, endpoint, url, params=params, headers=headers
+                    )
+                    if response is not None and "ETag" in response.headers:
+                        etags[url] = response.headers["ETag"]
+                await self.think()
+
+    async def reviewer(self, index: int) -> None:
+        """Reviews the marked identifications one by one."""
+        token = self.issuer.token(f"reviewer-{index}", f"reviewer-{index}", [])
+        async with self.client(token) as client:
+            while self.running():
+                response = await self.recorder.request(
+                    client, "GET /identifications/ai", "/identifications/ai", params={"size": 10}
+                )
+                items = response.json()["items"] if response is not None else []
+                if len(items) > 0:
+                    await self.recorder.request(
+                        client,
+                        "POST /identifications",
+                        "/identifications",
+                        json={
+                            "identification_id": random.choice(items)["id"],
+                            "label": random.choice(LABELS),
+                        },
+                    )
+                await self.think()
+
+
+def write_report(rows: list[dict], path: Path, args: argparse.Namespace) -> None:
+    if path.suffix == ".csv":
+        with path.open("w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        return
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    path.write_text(json.dumps({"config": config, "endpoints": rows}, indent=2))
+
+
+def print_report(rows: list[dict], baseline: Path | None) -> None:
+    previous = {}
+    if baseline is not None:
+        previous = {row["endpoint"]: row for row in json.loads(baseline.read_text())["endpoints"]}
+
+    print(
+        f"{'endpoint':<72} {'requests':>8} {'errors':>6} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for row in rows:
+        line = (
+            f"{row['endpoint']:<72} {row['requests']:>8} {row['errors']:>6} "
+            f"{row['throughput']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}"
+        )
+        if row["endpoint"] in previous and previous[row["endpoint"]]["p95_ms"] > 0:
+            change = row["p95_ms"] / previous[row["endpoint"]]["p95_ms"] - 1
+            line += f" ({change:+.0%} p95)"
+        print(line)
+
+
+async def run(args: argparse.Namespace) -> None:
+    issuer = FakeOIDCIssuer()
+    configure_environment(args, issuer)
+    dataset = await seed(args)
+    if args.pubsub_emulator:
+        create_topic()
+
+    process, base_url = start_api(args)
+    try:
+        await wait_for_api(process, base_url)
+        print(f"Running for {args.duration}s against {base_url}...")
+
+        recorder = Recorder()
+        scenario = Scenario(
+            base_url=base_url,
+            issuer=issuer,
+            dataset=dataset,
+            recorder=recorder,
+            deadline=time.monotonic() + args.duration,
+            think_time=args.think_time,
+            predict=args.pubsub_emulator is not None,
+        )
+        start = time.monotonic()
+        await asyncio.gather(
+            *(scenario.agent(*agent) for agent in dataset.agents),
+            *(scenario.identifier(index) for index in range(args.identifiers)),
+            *(scenario.dashboard(index) for index in range(args.dashboards)),
+            *(scenario.reviewer(index) for index in range(args.reviewers)),
+        )
+        rows = recorder.report(time.monotonic() - start)
+    finally:
+        process.terminate()
+        process.wait()
+        issuer.close()
+
+    print_report(rows, args.baseline)
+    if args.output:
+        write_report(rows, args.output, args)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pgserver", help="Data directory of an embedded Postgres.")
+    parser.add_argument("--pubsub-emulator", help="host:port of a Pub/Sub emulator.")
+    parser.add_argument("--cameras", type=int, default=1000)
+    parser.add_argument("--objects", type=int, default=4)
+    parser.add_argument("--snapshots", type=int, default=10, help="Snapshots per camera.")
+    parser.add_argument("--markers", type=int, default=10_000)
+    parser.add_argument("--agents", type=int, default=10)
+    parser.add_argument("--identifiers", type=int, default=4)
+    parser.add_argument("--dashboards", type=int, default=20)
+    parser.add_argument("--reviewers", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load.")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean seconds between calls.")
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers.")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Report path, .csv or .json.")
+    parser.add_argument("--baseline", type=Path, help="Previous JSON report to compare to.")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,109 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares an agent creating the snapshots of all of its cameras with one
+`POST /cameras/{camera_id}/snapshots` per camera against a single `POST /cameras/snapshots/bulk`,
+in the time to get every upload URL.
+
+The API is started like in `benchmarking_load.py`, which seeds the database and MUST be given
+a disposable one.
+
+Usage:
+    python scripts/benchmarking_snapshots.py --pgserver /tmp/vision-ai-load [--cameras 500]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import os
+import statistics
+import time
+
+import httpx
+from benchmarking_load import (
+    FakeOIDCIssuer,
+    configure_environment,
+    seed,
+    start_api,
+    wait_for_api,
+)
+
+
+def get_snapshot_in() -> dict:
+    content = os.urandom(1024)
+    return {
+        "hash_md5": base64.b64encode(hashlib.md5(content).digest()).decode(),
+        "content_length": len(content),
+    }
+
+
+async def create_snapshots(client: httpx.AsyncClient, camera_ids: list[str], parallel: int) -> int:
+    """Creates a snapshot per camera, `parallel` at a time like the agent does."""
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def create(camera_id: str) -> None:
+        async with semaphore:
+            response = await client.post(f"/cameras/{camera_id}/snapshots", json=get_snapshot_in())
+            response.raise_for_status()
+
+    await asyncio.gather(*(create(camera_id) for camera_id in camera_ids))
+    return len(camera_ids)
+
+
+async def create_snapshots_bulk(client: httpx.AsyncClient, camera_ids: list[str], _: int) -> int:
+    response = await client.post(
+        "/cameras/snapshots/bulk",
+        json={
+            "snapshots": [{**get_snapshot_in(), "camera_id": camera_id} for camera_id in camera_ids]
+        },
+    )
+    response.raise_for_status()
+    return response.json()["count"]
+
+
+async def run(args: argparse.Namespace) -> None:
+    issuer = FakeOIDCIssuer()
+    configure_environment(args, issuer)
+    dataset = await seed(args)
+    _, sub, camera_ids = dataset.agents[0]
+
+    process, base_url = start_api(args)
+    try:
+        await wait_for_api(process, base_url)
+        token = issuer.token(sub, sub, ["vision-ai-agent"])
+        async with httpx.AsyncClient(
+            base_url=base_url, headers={"Authorization": f"Bearer {token}"}, timeout=120
+        ) as client:
+            for name, fn in (("single", create_snapshots), ("bulk", create_snapshots_bulk)):
+                await fn(client, camera_ids, args.parallel)  # warm up
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    count = await fn(client, camera_ids, args.parallel)
+                    times.append(time.perf_counter() - start)
+                elapsed = statistics.median(times)
+                print(
+                    f"{name}: {count} snapshots in {elapsed * 1000:.0f}ms, "
+                    f"{count / elapsed:.0f} snapshots/s"
+                )
+    finally:
+        process.terminate()
+        process.wait()
+        issuer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pgserver", help="Data directory of an embedded Postgres.")
+    parser.add_argument("--cameras", type=int, default=500)
+    parser.add_argument("--parallel", type=int, default=10, help="Agent parallel snapshots.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers.")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+    args.pubsub_emulator = None
+    args.objects = 1
+    args.snapshots = 0
+    args.markers = 0
+    args.agents = 1
+    asyncio.run(run(args))
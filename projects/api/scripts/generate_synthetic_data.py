@@ -0,0 +1,347 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Generates a synthetic dataset of cameras, snapshots, identifications, markers and human reviews
+at benchmark scale, e.g. 3000 cameras taking a snapshot every minute for 30 days.
+
+Rows are streamed in chunks, one camera at a time, so memory doesn't grow with the scale. They
+are written to Postgres with `COPY`, bypassing the ORM, and/or to a Parquet file per table for
+offline analysis (requires `pyarrow`). The data only depends on `--seed` and the scale
+options, so both outputs and every run with the same options hold the same rows.
+
+Postgres output uses the default connection of `app.db.TORTOISE_ORM` and expects the schema to
+be migrated. `--truncate` empties every table written to first.
+
+Usage:
+    python scripts/generate_synthetic_data.py --postgres [--truncate] [--cameras 3000]
+        [--days 30] [--interval 1] [--parquet data/]
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterator
+from uuid import UUID
+
+# Columns of each table, in the order of the generated rows
+TABLES = {
+    "object": ["id", "name", "slug", "title", "question", "explanation"],
+    "label": ["id", "order", "object_id", "value", "text", "criteria", "identification_guide"],
+    "camera": ["id", "name", "rtsp_url", "update_interval", "latitude", "longitude"],
+    "camera_object": ["camera_id", "object_id"],
+    "snapshot": ["id", "public_url", "timestamp", "camera_id"],
+    "identification": ["id", "snapshot_id", "label_id", "timestamp", "label_explanation"],
+    "identification_marker": ["id", "identification_id", "tags", "all_users"],
+    "user_identification": ["id", "timestamp", "username", "label_id", "identification_id"],
+}
+
+# Label values from the least to the most severe, with their weight in dry weather and in a
+# rain episode
+LABELS = [
+    ("low", 0.92, 0.45),
+    ("medium", 0.06, 0.35),
+    ("high", 0.02, 0.20),
+]
+
+REFRESH_AGGREGATE_QUERY = """
+TRUNCATE human_identification_aggregate;
+INSERT INTO human_identification_aggregate (id, snapshot_id, label_id, count)
+SELECT
+  gen_random_uuid(),
+  identification.snapshot_id,
+  user_identification.label_id,
+  COUNT(*)
+FROM
+  user_identification
+  INNER JOIN identification_marker ON identification_marker.identification_id = user_identification.identification_id
+  INNER JOIN identification ON identification.id = user_identification.identification_id
+GROUP BY
+  identification.snapshot_id,
+  user_identification.label_id;
+"""
+
+Rows = dict[str, list[tuple]]
+
+
+def random_uuid(rng: random.Random) -> UUID:
+    return UUID(int=rng.getrandbits(128), version=4)
+
+
+class Generator:
+    """
+    Deterministic rows of the dataset. Each camera has its own random generator, seeded by the
+    dataset seed and the camera index, so the rows of a camera don't depend on the others.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.start = datetime.combine(args.start, datetime.min.time(), tzinfo=timezone.utc)
+        self.end = self.start + timedelta(days=args.days)
+        self.reviewers = [f"reviewer-{index}" for index in range(args.reviewers)]
+
+        rng = random.Random(f"{args.seed}-catalog")
+        self.objects = [
+            (
+                random_uuid(rng),
+                f"Object {index}",
+                f"object-{index}",
+                f"Object {index}?",
+                f"Is there object {index} in the image?",
+                f"Object {index} explanation",
+            )
+            for index in range(args.objects)
+        ]
+        self.labels = {
+            object_[0]: [
+                (
+                    random_uuid(rng),
+                    order,
+                    object_[0],
+                    value,
+                    value.capitalize(),
+                    f"{value} criteria",
+                    f"{value} identification guide",
+                )
+                for order, (value, _, _) in enumerate(LABELS)
+            ]
+            for object_ in self.objects
+        }
+
+    def catalog(self) -> Rows:
+        return {
+            "object": self.objects,
+            "label": [label for labels in self.labels.values() for label in labels],
+        }
+
+    def camera(self, index: int) -> Rows:
+        """
+        Generates a camera with its objects, snapshots, identifications, markers and reviews.
+
+        Cameras are spread over Rio de Janeiro and each one watches some of the objects. Every
+        day has a chance of rain episodes that make the severe labels more likely, and cameras
+        miss a few snapshots.
+        """
+        args = self.args
+        rng = random.Random(f"{args.seed}-camera-{index}")
+        camera_id = f"{index:06d}"
+        rows: Rows = {table: [] for table in TABLES if table not in ("object", "label")}
+        rows["camera"].append(
+            (
+                camera_id,
+                f"Camera {index}",
+                f"rtsp://camera-{index}",
+                round(args.interval * 60),
+                rng.uniform(-23.08, -22.75),
+                rng.uniform(-43.79, -43.10),
+            )
+        )
+        objects = rng.sample(self.objects, k=rng.randint(1, len(self.objects)))
+        rows["camera_object"] = [(camera_id, object_[0]) for object_ in objects]
+
+        # Rain episodes as (start, end), more frequent on some cameras
+        exposure = rng.uniform(0.5, 1.5)
+        episodes = []
+        for day in range(args.days):
+            if rng.random() < args.rain_probability * exposure:
+                start = self.start + timedelta(days=day, hours=rng.uniform(0, 24))
+                episodes.append((start, start + timedelta(hours=rng.uniform(1, 6))))
+
+        step = timedelta(minutes=args.interval)
+        timestamp = self.start + timedelta(seconds=rng.uniform(0, step.total_seconds()))
+        episode = 0
+        while timestamp < self.end:
+            if rng.random() < args.missing:
+                timestamp += step
+                continue
+
+            snapshot_id = random_uuid(rng)
+            rows["snapshot"].append(
+                (
+                    snapshot_id,
+                    f"https://storage.googleapis.com/vision-ai/{camera_id}/{snapshot_id}.png",
+                    timestamp,
+                    camera_id,
+                )
+            )
+
+            while episode < len(episodes) and episodes[episode][1] < timestamp:
+                episode += 1
+            raining = episode < len(episodes) and episodes[episode][0] <= timestamp
+            weights = [rain if raining else dry for _, dry, rain in LABELS]
+
+            for object_ in objects:
+                labels = self.labels[object_[0]]
+                label = rng.choices(labels, weights=weights)[0]
+                identified_at = timestamp + timedelta(seconds=rng.uniform(5, 30))
+                identification_id = random_uuid(rng)
+                rows["identification"].append(
+                    (
+                        identification_id,
+                        snapshot_id,
+                        label[0],
+                        identified_at,
+                        f"The image shows {label[3]} {object_[2]}",
+                    )
+                )
+                if rng.random() >= args.marked:
+                    continue
+
+                rows["identification_marker"].append(
+                    (random_uuid(rng), identification_id, ["synthetic"], True)
+                )
+                # Reviewers agree with the AI most of the time
+                for reviewer in rng.sample(self.reviewers, k=rng.randint(0, len(self.reviewers))):
+                    review = label if rng.random() < args.agreement else rng.choice(labels)
+                    rows["user_identification"].append(
+                        (
+                            random_uuid(rng),
+                            identified_at + timedelta(minutes=rng.uniform(1, 120)),
+                            reviewer,
+                            review[0],
+                            identification_id,
+                        )
+                    )
+
+            timestamp += step
+
+        return rows
+
+
+class PostgresWriter:
+    """
+    Streams rows into Postgres with `COPY`.
+    """
+
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+
+    @classmethod
+    async def connect(cls, truncate: bool) -> "PostgresWriter":
+        import asyncpg
+        from app.db import TORTOISE_ORM
+
+        credentials = TORTOISE_ORM["connections"]["default"]["credentials"]
+        connection = await asyncpg.connect(
+            host=credentials["host"],
+            port=credentials["port"],
+            user=credentials["user"],
+            password=credentials["password"],
+            database=credentials["database"],
+        )
+        if truncate:
+            tables = ", ".join(f'"{table}"' for table in TABLES)
+            await connection.execute(f"TRUNCATE {tables} CASCADE")
+        return cls(connection)
+
+    async def write(self, rows: Rows) -> None:
+        for table, records in rows.items():
+            if len(records) > 0:
+                await self.connection.copy_records_to_table(
+                    table, records=records, columns=TABLES[table]
+                )
+
+    async def close(self) -> None:
+        print("Refreshing the human identifications aggregate...")
+        await self.connection.execute(REFRESH_AGGREGATE_QUERY)
+        await self.connection.execute("ANALYZE")
+        await self.connection.close()
+
+
+class ParquetWriter:
+    """
+    Writes the rows of each table to `<path>/<table>.parquet`, a row group per chunk.
+    """
+
+    def __init__(self, path: Path) -> None:
+        import pyarrow  # noqa: F401
+
+        self.path = path
+        self._writers: dict[str, Any] = {}
+
+    async def write(self, rows: Rows) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for table, records in rows.items():
+            if len(records) == 0:
+                continue
+
+            columns = list(zip(*records))
+            data = pa.table(
+                {
+                    name: [str(value) if isinstance(value, UUID) else value for value in column]
+                    for name, column in zip(TABLES[table], columns)
+                }
+            )
+            if table not in self._writers:
+                self.path.mkdir(parents=True, exist_ok=True)
+                self._writers[table] = pq.ParquetWriter(self.path / f"{table}.parquet", data.schema)
+            self._writers[table].write_table(data)
+
+    async def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+
+
+def iter_chunks(generator: Generator) -> Iterator[Rows]:
+    yield generator.catalog()
+    for index in range(generator.args.cameras):
+        yield generator.camera(index)
+
+
+async def run(args: argparse.Namespace) -> None:
+    if not args.postgres and args.parquet is None:
+        raise SystemExit("Choose at least one output: --postgres and/or --parquet")
+
+    writers: list[PostgresWriter | ParquetWriter] = []
+    if args.postgres:
+        writers.append(await PostgresWriter.connect(args.truncate))
+    if args.parquet is not None:
+        writers.append(ParquetWriter(args.parquet))
+
+    generator = Generator(args)
+    snapshots = math.floor(args.cameras * args.days * 24 * 60 / args.interval)
+    print(f"Generating about {snapshots} snapshots of {args.cameras} cameras with seed {args.seed}")
+
+    counts = {table: 0 for table in TABLES}
+    start = time.perf_counter()
+    for index, rows in enumerate(iter_chunks(generator)):
+        for writer in writers:
+            await writer.write(rows)
+        for table, records in rows.items():
+            counts[table] += len(records)
+        if index % 100 == 0:
+            elapsed = time.perf_counter() - start
+            print(
+                f"{index}/{args.cameras} cameras, {counts['identification']} identifications, "
+                f"{counts['identification'] / elapsed if elapsed else 0:.0f}/s"
+            )
+
+    for writer in writers:
+        await writer.close()
+
+    print(f"Done in {time.perf_counter() - start:.1f}s:")
+    for table, count in counts.items():
+        print(f" - {table}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--postgres", action="store_true", help="Write to the API database.")
+    parser.add_argument("--truncate", action="store_true", help="Empty the tables first.")
+    parser.add_argument("--parquet", type=Path, help="Directory of the Parquet datasets.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cameras", type=int, default=3000)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 1, 1))
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=1, help="Minutes between snapshots.")
+    parser.add_argument("--objects", type=int, default=4)
+    parser.add_argument("--missing", type=float, default=0.02, help="Share of missed snapshots.")
+    parser.add_argument("--rain-probability", type=float, default=0.3, help="Rainy days share.")
+    parser.add_argument("--marked", type=float, default=0.001, help="Share marked for review.")
+    parser.add_argument("--reviewers", type=int, default=5)
+    parser.add_argument("--agreement", type=float, default=0.8, help="Reviews equal to the AI.")
+    asyncio.run(run(parser.parse_args()))
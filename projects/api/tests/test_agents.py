@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
+import asyncio
+from datetime import datetime
 from uuid import uuid4
 
 import pytest
+from app.dependencies import agent_ids
+from app.heartbeats import HeartbeatBuffer, heartbeats
+from app.models import Agent
 from httpx import AsyncClient
 
 
@@ -26,6 +31,44 @@ async def test_agents_me_get(client: AsyncClient, authorization_header: dict, co
     context["agent_id"] = response.json()["id"]
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_heartbeats_stop_during_flush(monkeypatch: pytest.MonkeyPatch):
+    updating = asyncio.Event()
+    written: list[list[Agent]] = []
+
+    async def bulk_update(agents: list[Agent], fields: list[str]) -> None:
+        if not updating.is_set():
+            # The first update hangs until the buffer is stopped
+            updating.set()
+            await asyncio.sleep(60)
+        written.append(agents)
+
+    monkeypatch.setattr(Agent, "bulk_update", bulk_update)
+    buffer = HeartbeatBuffer(interval=0.01)
+    agent_id = uuid4()
+    buffer.record(agent_id, datetime.now())
+    await buffer.start()
+    await asyncio.wait_for(updating.wait(), timeout=5)
+
+    await buffer.stop()
+
+    # The cancelled batch is written by the last flush
+    assert [[agent.id for agent in agents] for agents in written] == [[agent_id]]
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_agents_me_get_cached_agent(
+    client: AsyncClient, authorization_header: dict, context: dict
+):
+    hits = agent_ids.stats.hits
+    response = await client.get("/agents/me", headers=authorization_header)
+    assert response.status_code == 200
+    assert response.json()["id"] == context["agent_id"]
+    assert agent_ids.stats.hits == hits + 1
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=31)
 async def test_agents_get(client: AsyncClient, authorization_header: dict, context: dict):
@@ -75,6 +118,19 @@ async def test_agents_get_cameras(client: AsyncClient, authorization_header: dic
     assert isinstance(response.json()["pages"], int)
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=33)
+async def test_agents_get_cameras_not_modified(client: AsyncClient, authorization_header: dict):
+    response = await client.get("/agents/cameras", headers=authorization_header)
+    assert response.status_code == 200
+
+    response = await client.get(
+        "/agents/cameras",
+        headers={**authorization_header, "If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=35)
 async def test_agents_get_by_id_cameras(
@@ -115,3 +171,29 @@ async def test_agents_post_heartbeat_to_other(
         json={"healthy": True},
     )
     assert response.status_code == 401
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=36)
+async def test_agents_post_heartbeat(
+    client: AsyncClient, authorization_header: dict, context: dict
+):
+    response = await client.post(
+        f"/agents/{context['agent_id']}/heartbeat",
+        headers=authorization_header,
+        json={"healthy": True},
+    )
+    assert response.status_code == 200
+
+    # The heartbeat is listed before it is written to the database
+    response = await client.get("/agents/me", headers=authorization_header)
+    last_heartbeat = response.json()["last_heartbeat"]
+    assert last_heartbeat is not None
+    agent = await Agent.get(id=context["agent_id"])
+    assert agent.last_heartbeat is None or agent.last_heartbeat.isoformat() < last_heartbeat
+
+    assert await heartbeats.flush() == 1
+    agent = await Agent.get(id=context["agent_id"])
+    assert agent.last_heartbeat is not None
+    response = await client.get("/agents/me", headers=authorization_header)
+    assert response.json()["last_heartbeat"] == last_heartbeat
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+from app.cache import clear_namespace, counted_cache, get_cache_stats, single_flight
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_single_flight():
+    calls = []
+
+    @single_flight()
+    async def compute(value: int) -> int:
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value < 0:
+            raise ValueError("negative")
+        return value * 2
+
+    assert await asyncio.gather(compute(1), compute(1), compute(value=1), compute(2)) == [
+        2,
+        2,
+        2,
+        4,
+    ]
+    assert calls == [1, 1, 2]
+
+    # Finished calls aren't reused
+    assert await compute(1) == 2
+    assert calls == [1, 1, 2, 1]
+
+    results = await asyncio.gather(compute(-1), compute(-1), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert calls == [1, 1, 2, 1, -1]
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_single_flight_cancelled_caller():
+    @single_flight()
+    async def compute(value: int) -> int:
+        await asyncio.sleep(0.01)
+        return value
+
+    first = asyncio.create_task(compute(1))
+    second = asyncio.create_task(compute(1))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_counted_cache_stale(monkeypatch: pytest.MonkeyPatch):
+    calls = 0
+
+    @counted_cache("test_stale", expire=10, namespace="test_stale", stale=60)
+    async def compute(value: int) -> list[int]:
+        nonlocal calls
+        calls += 1
+        return [value, calls]
+
+    stats = get_cache_stats("test_stale")
+    assert await compute(1) == [1, 1]
+    assert await compute(1) == [1, 1]
+    assert (stats.hits, stats.misses) == (1, 1)
+
+    # Expired, the stale result is returned while it is computed again
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    assert await asyncio.gather(compute(1), compute(1)) == [[1, 1], [1, 1]]
+    await asyncio.sleep(0)
+    assert calls == 2
+    assert await compute(1) == [1, 2]
+
+    # Past the stale period, the result is computed before returning
+    monkeypatch.setattr(time, "time", lambda: now + 30 + 10 + 61)
+    assert await compute(1) == [1, 3]
+    assert (stats.hits, stats.misses) == (4, 2)
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_counted_cache_invalidated_during_revalidation(monkeypatch: pytest.MonkeyPatch):
+    calls = 0
+    revalidating = asyncio.Event()
+    release = asyncio.Event()
+
+    @counted_cache("test_invalidated", expire=10, namespace="test_invalidated", stale=60)
+    async def compute(value: int) -> list[int]:
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            revalidating.set()
+            await release.wait()
+        return [value, calls]
+
+    assert await compute(1) == [1, 1]
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    assert await compute(1) == [1, 1]
+    await asyncio.wait_for(revalidating.wait(), timeout=5)
+
+    # A write invalidates the namespace while the revalidation computes the old result
+    await clear_namespace("test_invalidated")
+    release.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+    # The revalidated result is not written back, so the next call computes it again
+    assert calls == 2
+    assert await compute(1) == [1, 3]
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_counted_cache_invalidated_during_slow_revalidation():
+    calls = 0
+    revalidating = asyncio.Event()
+    release = asyncio.Event()
+
+    @counted_cache("test_slow_invalidated", expire=1, namespace="test_slow_invalidated", stale=60)
+    async def compute(value: int) -> list[int]:
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            revalidating.set()
+            await release.wait()
+        return [value, calls]
+
+    assert await compute(1) == [1, 1]
+
+    await asyncio.sleep(1.1)
+    assert await compute(1) == [1, 1]
+    await asyncio.wait_for(revalidating.wait(), timeout=5)
+
+    # The revalidation outlasts the second the backend would keep a key set without an expire
+    await clear_namespace("test_slow_invalidated")
+    await asyncio.sleep(1.1)
+    release.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+    assert calls == 2
+    assert await compute(1) == [1, 3]
@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
+import time
+
+import pyarrow as pa
 import pytest
-from httpx import AsyncClient
+from app import config
+from app.cache import PROMPTS_NAMESPACE, get_cache_stats, invalidate_prompts_cache
+from app.columnar import ARROW_MEDIA_TYPE
+from app.live_state import LiveState, live_state
+from app.utils import generate_snapshot_upload_urls
+from httpx import AsyncClient, Response
 
 
 @pytest.mark.anyio
@@ -62,6 +70,64 @@ async def test_cameras_get(client: AsyncClient, authorization_header: dict):
             assert isinstance(identification["snapshot"]["timestamp"], str)
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=41)
+async def test_cameras_get_not_modified(client: AsyncClient, authorization_header: dict):
+    response = await client.get("/cameras", headers=authorization_header)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = await client.get("/cameras", headers={**authorization_header, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    response = await client.get(
+        "/cameras", headers={**authorization_header, "If-None-Match": '"outdated"'}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=41)
+async def test_cameras_get_cursor(client: AsyncClient, authorization_header: dict):
+    response = await client.get("/cameras", headers=authorization_header)
+    assert response.status_code == 200
+    expected = [item["id"] for item in response.json()["items"]]
+
+    ids = []
+    cursor = ""
+    while cursor is not None:
+        response = await client.get(
+            "/cameras",
+            headers=authorization_header,
+            params={"size": 2, "cursor": cursor},
+        )
+        assert response.status_code == 200
+        assert response.json()["total"] is None
+        assert response.json()["size"] == 2
+        assert len(response.json()["items"]) <= 2
+        ids += [item["id"] for item in response.json()["items"]]
+        cursor = response.json()["next_cursor"]
+
+    assert ids == expected
+
+    response = await client.get(
+        "/cameras",
+        headers=authorization_header,
+        params={"cursor": "", "include_total": True},
+    )
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+    assert response.json()["next_cursor"] is None
+
+    response = await client.get(
+        "/cameras", headers=authorization_header, params={"cursor": "invalid"}
+    )
+    assert response.status_code == 400
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=42)
 async def test_cameras_create(client: AsyncClient, authorization_header: dict, context: dict):
@@ -216,6 +282,30 @@ async def test_snapshot_predict(client: AsyncClient, authorization_header: dict,
     assert response.json()["error"] is False
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=47)
+async def test_snapshot_predict_compiled_prompt_cache(
+    client: AsyncClient, authorization_header: dict, context: dict
+):
+    stats = get_cache_stats(PROMPTS_NAMESPACE)
+    path = f"/cameras/{context['test_camera_id']}/snapshots/{context['test_snapshot_id']}/predict"
+
+    response = await client.post(path, headers=authorization_header)
+    assert response.status_code == 200
+    hits, misses = stats.hits, stats.misses
+
+    response = await client.post(path, headers=authorization_header)
+    assert response.status_code == 200
+    assert stats.hits == hits + 1
+    assert stats.misses == misses
+
+    await invalidate_prompts_cache()
+    response = await client.post(path, headers=authorization_header)
+    assert response.status_code == 200
+    assert stats.hits == hits + 1
+    assert stats.misses == misses + 1
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=48)
 async def test_create_identification(
@@ -306,6 +396,326 @@ async def test_get_identifications(client: AsyncClient, authorization_header: di
     assert response.json()[0]["snapshot"]["id"] == context["test_snapshot_id"]
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=49)
+async def test_cameras_get_after_create_identification(
+    client: AsyncClient, authorization_header: dict, context: dict
+):
+    response = await client.get("/cameras", headers=authorization_header)
+
+    assert response.status_code == 200
+    cameras = {item["id"]: item for item in response.json()["items"]}
+    assert context["test_camera_id"] in cameras
+    identifications = cameras[context["test_camera_id"]]["identifications"]
+    assert context["test_identification_id"] in [item["id"] for item in identifications]
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+async def test_create_identifications_bulk(
+    client: AsyncClient,
+    authorization_header: dict,
+    context: dict,
+):
+    path = f"/cameras/{context['test_camera_id']}/snapshots/{context['test_snapshot_id']}/identifications"  # noqa
+    response = await client.post(
+        f"{path}/bulk",
+        headers=authorization_header,
+        json={
+            "objects": [
+                {
+                    "object": context["test_object_slug"],
+                    "label": context["test_label_value"],
+                    "label_explanation": "test",
+                },
+                {
+                    "object": context["test_object_slug"],
+                    "label": "not-a-label",
+                    "label_explanation": "test",
+                },
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+    assert len(response.json()["items"]) == 2
+    created, missing = response.json()["items"]
+    assert created["status_code"] == 200
+    assert created["identification"]["object"] == context["test_object_slug"]
+    assert created["identification"]["label"] == context["test_label_value"]
+    assert created["identification"]["label_explanation"] == "test"
+    assert created["identification"]["snapshot"]["id"] == context["test_snapshot_id"]
+    assert missing["status_code"] == 404
+    assert missing["identification"] is None
+
+    response = await client.get(path, headers=authorization_header)
+    assert response.status_code == 200
+    assert created["identification"]["id"] in [item["id"] for item in response.json()]
+
+    response = await client.delete(
+        f"{path}/{created['identification']['id']}", headers=authorization_header
+    )
+    assert response.status_code == 200
+
+    response = await client.post(
+        "/cameras/0004/snapshots/00000000-0000-0000-0000-000000000000/identifications/bulk",
+        headers=authorization_header,
+        json={"objects": []},
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_live_state_load_backoff(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, "LIVE_STATE_ENABLE", True)
+    state = LiveState(window=60, refresh_interval=60)
+    loads = 0
+
+    async def load() -> None:
+        nonlocal loads
+        loads += 1
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(state, "load", load)
+    assert not await state.ensure_loaded()
+    assert not await state.ensure_loaded()
+    # The failed load isn't retried by every request
+    assert loads == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert not await state.ensure_loaded()
+    assert loads == 2
+
+
+async def assert_live_state_matches_database(
+    client: AsyncClient, headers: dict, monkeypatch: pytest.MonkeyPatch
+) -> Response:
+    params = {"size": 100, "minute_interval": live_state.window}
+    monkeypatch.setattr(config, "LIVE_STATE_ENABLE", True)
+    response = await client.get("/cameras", headers=headers, params=params)
+    assert response.status_code == 200
+    assert live_state.loaded
+
+    monkeypatch.setattr(config, "LIVE_STATE_ENABLE", False)
+    expected = await client.get("/cameras", headers=headers, params=params)
+    assert expected.status_code == 200
+    assert response.json() == expected.json()
+    return response
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+async def test_cameras_live_state(
+    client: AsyncClient, authorization_header: dict, monkeypatch: pytest.MonkeyPatch
+):
+    response = await assert_live_state_matches_database(client, authorization_header, monkeypatch)
+    assert any(len(camera["identifications"]) > 0 for camera in response.json()["items"])
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+async def test_cameras_live_state_identification_of_new_object(
+    client: AsyncClient,
+    authorization_header: dict,
+    context: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    await assert_live_state_matches_database(client, authorization_header, monkeypatch)
+
+    # Identified by a camera that doesn't watch it
+    response = await client.post(
+        "/objects",
+        headers=authorization_header,
+        json={
+            "name": "Live State Object",
+            "slug": "live-state-object",
+            "title": "Live state title",
+            "question": "Live state question?",
+            "explanation": "Live state explanation",
+        },
+    )
+    assert response.status_code == 200
+    object_id = response.json()["id"]
+    response = await client.post(
+        f"/objects/{object_id}/labels",
+        headers=authorization_header,
+        json={
+            "value": "live-state-label",
+            "criteria": "Test Criteria",
+            "identification_guide": "Test Identification Guide",
+            "text": "Texto teste",
+        },
+    )
+    assert response.status_code == 200
+    path = f"/cameras/{context['test_camera_id']}/snapshots/{context['test_snapshot_id']}/identifications"  # noqa
+    response = await client.post(
+        f"{path}?object_id={object_id}&label_value=live-state-label&label_explanation=test",
+        headers=authorization_header,
+    )
+    assert response.status_code == 200
+    identification_id = response.json()["id"]
+
+    response = await assert_live_state_matches_database(client, authorization_header, monkeypatch)
+    cameras = {item["id"]: item for item in response.json()["items"]}
+    identifications = cameras[context["test_camera_id"]]["identifications"]
+    assert identification_id in [item["id"] for item in identifications]
+
+    response = await client.delete(f"/objects/{object_id}", headers=authorization_header)
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+async def test_cameras_live_state_label_changes(
+    client: AsyncClient,
+    authorization_header: dict,
+    context: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    object_id = context["test_object_id"]
+    response = await client.post(
+        f"/objects/{object_id}/labels",
+        headers=authorization_header,
+        json={
+            "value": "live-state-label",
+            "criteria": "Test Criteria",
+            "identification_guide": "Test Identification Guide",
+            "text": "Texto teste",
+        },
+    )
+    assert response.status_code == 200
+    label_id = response.json()["id"]
+    path = f"/cameras/{context['test_camera_id']}/snapshots/{context['test_snapshot_id']}/identifications"  # noqa
+    response = await client.post(
+        f"{path}?object_id={object_id}&label_value=live-state-label&label_explanation=test",
+        headers=authorization_header,
+    )
+    assert response.status_code == 200
+    identification_id = response.json()["id"]
+    await assert_live_state_matches_database(client, authorization_header, monkeypatch)
+
+    response = await client.put(
+        f"/objects/{object_id}/labels/{label_id}",
+        headers=authorization_header,
+        json={"value": "live-state-label-renamed", "text": "Texto renomeado"},
+    )
+    assert response.status_code == 200
+    response = await assert_live_state_matches_database(client, authorization_header, monkeypatch)
+    cameras = {item["id"]: item for item in response.json()["items"]}
+    identifications = {
+        item["id"]: item for item in cameras[context["test_camera_id"]]["identifications"]
+    }
+    assert identifications[identification_id]["label"] == "live-state-label-renamed"
+    assert identifications[identification_id]["label_text"] == "Texto renomeado"
+
+    # Deleting the label deletes its identifications, the previous one is the latest again
+    response = await client.delete(
+        f"/objects/{object_id}/labels/{label_id}", headers=authorization_header
+    )
+    assert response.status_code == 200
+    response = await assert_live_state_matches_database(client, authorization_header, monkeypatch)
+    cameras = {item["id"]: item for item in response.json()["items"]}
+    identifications = cameras[context["test_camera_id"]]["identifications"]
+    assert identification_id not in [item["id"] for item in identifications]
+    assert context["test_identification_id"] in [item["id"] for item in identifications]
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+@pytest.mark.parametrize("minute_interval", [30, 24 * 60])
+async def test_cameras_columnar(
+    client: AsyncClient, authorization_header: dict, minute_interval: int
+):
+    params = {"size": 100, "minute_interval": minute_interval}
+    response = await client.get("/cameras", headers=authorization_header, params=params)
+    assert response.status_code == 200
+    total = response.json()["total"]
+    expected = []
+    for camera in response.json()["items"]:
+        for identification in camera["identifications"] or [{"id": None}]:
+            expected.append((camera["id"], identification["id"]))
+
+    response = await client.get(
+        "/cameras",
+        headers={**authorization_header, "Accept": ARROW_MEDIA_TYPE},
+        params=params,
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Total"] == str(total)
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert list(zip(table["camera_id"].to_pylist(), table["identification_id"].to_pylist())) == (
+        expected
+    )
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_generate_snapshot_upload_urls(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, "GCS_SIGNING_WORKERS", 3)
+    uploads = [(f"prefix/test/{index}.png", "MD5") for index in range(10)]
+
+    urls = await generate_snapshot_upload_urls(uploads)
+
+    # Signed in chunks by the pool, but returned in order
+    assert len(urls) == len(uploads)
+    for (blob_path, _), (url, public_url) in zip(uploads, urls):
+        assert f"/{blob_path}?" in url
+        assert "X-Goog-Signature=" in url
+        assert public_url.endswith(f"/{blob_path}")
+    assert await generate_snapshot_upload_urls([]) == []
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+async def test_create_camera_snapshots_bulk(
+    client: AsyncClient,
+    authorization_header: dict,
+    context: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    camera_id = context["test_camera_id"]
+    snapshot = {"hash_md5": "MWNhMzA4ZGY2Y2RiMGE4YmY0MGQ1OWJlMmExN2VhYzEK", "content_length": 1234}
+    response = await client.post(
+        "/cameras/snapshots/bulk",
+        headers=authorization_header,
+        json={
+            "snapshots": [
+                {**snapshot, "camera_id": camera_id},
+                {**snapshot, "camera_id": "not-a-camera"},
+                {**snapshot, "camera_id": camera_id},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 2
+    assert [item["status_code"] for item in data["items"]] == [200, 401, 200]
+    assert data["items"][1]["snapshot"] is None
+
+    created = [item["snapshot"] for item in data["items"] if item["snapshot"] is not None]
+    assert created[0]["id"] != created[1]["id"]
+    for item in created:
+        assert item["camera_id"] == camera_id
+        assert f"/{item['id']}.png?" in item["image_url"]
+        assert item["timestamp"] is None
+
+    response = await client.get(f"/cameras/{camera_id}/snapshots", headers=authorization_header)
+    assert response.status_code == 200
+    snapshot_ids = [item["id"] for item in response.json()["items"]]
+    assert all(item["id"] in snapshot_ids for item in created)
+
+    monkeypatch.setattr(config, "SNAPSHOTS_BULK_MAX_SIZE", 2)
+    response = await client.post(
+        "/cameras/snapshots/bulk",
+        headers=authorization_header,
+        json={"snapshots": [{**snapshot, "camera_id": camera_id}] * 3},
+    )
+    assert response.status_code == 413
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=80)
 async def test_delete_identifications(
@@ -324,3 +734,11 @@ async def test_delete_camera(client: AsyncClient, authorization_header: dict, co
     path = f"/cameras/{context['test_camera_id']}"
     response = await client.delete(path, headers=authorization_header)
     assert response.status_code == 200
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=82)
+async def test_cameras_live_state_after_deletes(
+    client: AsyncClient, authorization_header: dict, monkeypatch: pytest.MonkeyPatch
+):
+    await assert_live_state_matches_database(client, authorization_header, monkeypatch)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pytest
+from app.columnar import (
+    ArrowResponse,
+    MsgpackResponse,
+    ParquetResponse,
+    get_columnar_response_class,
+)
+from fastapi import Request
+
+
+def make_request(accept: str | None) -> Request:
+    headers = [] if accept is None else [(b"accept", accept.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.run(order=1)
+@pytest.mark.parametrize(
+    "accept,expected",
+    [
+        (None, None),
+        ("*/*", None),
+        ("application/json", None),
+        ("application/vnd.apache.arrow.stream", ArrowResponse),
+        ("application/vnd.apache.parquet", ParquetResponse),
+        ("application/msgpack", MsgpackResponse),
+        ("application/json, application/msgpack", None),
+        ("application/json;q=0.5, application/msgpack", MsgpackResponse),
+        ("text/csv, application/vnd.apache.parquet;q=0.8, */*;q=0.1", ParquetResponse),
+        ("application/vnd.apache.arrow.stream;q=0, application/msgpack;q=0.9", MsgpackResponse),
+        ("application/vnd.apache.arrow.stream;q=invalid, application/json", None),
+    ],
+)
+def test_get_columnar_response_class(accept: str | None, expected: type | None):
+    assert get_columnar_response_class(make_request(accept)) is expected
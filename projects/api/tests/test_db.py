@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+from app import db
+from app.db import ReadReplicaRouter, ReplicaMonitor, read_from_replica
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_read_replica_router():
+    router = ReadReplicaRouter()
+    assert router.db_for_read(object) is None
+    assert router.db_for_write(object) is None
+
+    token = read_from_replica.set(True)
+    try:
+        assert router.db_for_read(object) == db.REPLICA_CONNECTION
+        assert router.db_for_write(object) is None
+    finally:
+        read_from_replica.reset(token)
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_get_read_connection(monkeypatch):
+    requested = []
+    monkeypatch.setattr(db.connections, "get", lambda name: requested.append(name) or name)
+
+    assert db.get_read_connection() == "default"
+
+    token = read_from_replica.set(True)
+    try:
+        assert db.get_read_connection() == db.REPLICA_CONNECTION
+        # A recent write may not be replicated yet
+        assert db.get_read_connection(written_at=time.time()) == "default"
+        assert db.get_read_connection(written_at=time.time() - 3600) == db.REPLICA_CONNECTION
+    finally:
+        read_from_replica.reset(token)
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_replica_monitor(monkeypatch):
+    class Replica:
+        lag = 1.0
+
+        async def execute_query_dict(self, query):
+            return [{"lag": self.lag}]
+
+    replica = Replica()
+    monkeypatch.setattr(db.connections, "get", lambda name: replica)
+
+    monitor = ReplicaMonitor(max_lag=5, interval=3600)
+    assert not monitor.available
+    assert await monitor.check()
+
+    # Checked again only after the interval
+    replica.lag = 10.0
+    assert await monitor.check()
+    monitor._checked_at = None
+    assert not await monitor.check()
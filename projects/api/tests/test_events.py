@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import pytest
+from app.events import EventBus
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_event_bus_publish():
+    bus = EventBus(history_size=10, queue_size=10)
+    everything = bus.subscribe()
+    cars = bus.subscribe(objects=["car"])
+
+    bus.publish("identification", "person", "{}")
+    event = bus.publish("identification", "car", "{}")
+
+    assert everything.queue.qsize() == 2
+    assert cars.queue.qsize() == 1
+    assert cars.queue.get_nowait() == event
+    assert len(bus) == 2
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_event_bus_resume():
+    bus = EventBus(history_size=2, queue_size=10)
+    first = bus.publish("identification", "car", '{"n": 1}')
+    bus.publish("identification", "person", '{"n": 2}')
+    third = bus.publish("hide", "car", '{"n": 3}')
+
+    stream = bus.stream(objects=["car"], last_event_id=first.id, keepalive_interval=0.01)
+    assert await stream.__anext__() == third.encode()
+    assert await stream.__anext__() == ": keep-alive\n\n"
+    await stream.aclose()
+    assert len(bus) == 0
+
+    # The first event left the history, so the stream can't be resumed from it
+    bus.publish("identification", "car", '{"n": 4}')
+    stream = bus.stream(last_event_id=first.id)
+    assert await stream.__anext__() == "event: reset\ndata: {}\n\n"
+    await stream.aclose()
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_event_bus_slow_subscriber():
+    bus = EventBus(history_size=10, queue_size=1)
+    subscription = bus.subscribe()
+
+    bus.publish("identification", "car", "{}")
+    bus.publish("identification", "car", "{}")
+
+    assert len(bus) == 0
+    assert subscription.queue.get_nowait() is None
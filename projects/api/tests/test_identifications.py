@@ -1,5 +1,14 @@
 # -*- coding: utf-8 -*-
+import io
+import json
+from datetime import datetime
+
+import msgpack
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
+from app.columnar import ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, PARQUET_MEDIA_TYPE
+from app.events import event_bus
 from httpx import AsyncClient
 
 
@@ -54,6 +63,84 @@ async def test_get_identification(
         assert isinstance(item["snapshot"]["timestamp"], str)
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=51)
+async def test_get_identification_not_modified(client: AsyncClient, authorization_header: dict):
+    response = await client.get("/identifications", headers=authorization_header)
+    assert response.status_code == 200
+
+    response = await client.get(
+        "/identifications",
+        headers={**authorization_header, "If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=51)
+async def test_get_identification_cursor(client: AsyncClient, authorization_header: dict):
+    response = await client.get("/identifications", headers=authorization_header)
+    assert response.status_code == 200
+    expected = {item["id"] for item in response.json()["items"]}
+
+    ids = []
+    cursor = ""
+    while cursor is not None:
+        response = await client.get(
+            "/identifications",
+            headers=authorization_header,
+            params={"size": 3, "cursor": cursor, "include_total": True},
+        )
+        assert response.status_code == 200
+        assert response.json()["total"] == 7
+        assert len(response.json()["items"]) <= 3
+        ids += [item["id"] for item in response.json()["items"]]
+        cursor = response.json()["next_cursor"]
+
+    assert len(ids) == 7
+    assert set(ids) == expected
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=51)
+@pytest.mark.parametrize("media_type", [ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE, MSGPACK_MEDIA_TYPE])
+async def test_get_identification_columnar(
+    client: AsyncClient, authorization_header: dict, media_type: str
+):
+    response = await client.get("/identifications", headers=authorization_header)
+    assert response.status_code == 200
+    expected = {
+        item["id"]: (item["snapshot"]["camera_id"], item["label"])
+        for item in response.json()["items"]
+    }
+
+    response = await client.get(
+        "/identifications",
+        headers={**authorization_header, "Accept": f"{media_type}, application/json;q=0.5"},
+        params={"size": 3, "cursor": ""},
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == media_type
+    assert response.headers["Vary"] == "Accept"
+    assert "X-Next-Cursor" in response.headers
+
+    if media_type == ARROW_MEDIA_TYPE:
+        columns = pa.ipc.open_stream(response.content).read_all().to_pydict()
+    elif media_type == PARQUET_MEDIA_TYPE:
+        columns = pq.read_table(io.BytesIO(response.content)).to_pydict()
+    else:
+        columns = msgpack.unpackb(response.content, timestamp=3)
+    assert len(columns["identification_id"]) == 3
+    for id, camera_id, label, snapshot_timestamp in zip(
+        columns["identification_id"],
+        columns["camera_id"],
+        columns["label"],
+        columns["snapshot_timestamp"],
+    ):
+        assert expected[id] == (camera_id, label)
+        assert isinstance(snapshot_timestamp, datetime)
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=52)
 async def test_create_marker_identifications(
@@ -363,6 +450,37 @@ async def test_recreate_human_identification(
     assert isinstance(response.json()["snapshot"]["timestamp"], str)
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=58)
+async def test_get_aggregation(client: AsyncClient, authorization_header: dict):
+    response = await client.get("/identifications/aggregate", headers=authorization_header)
+
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+    # The relabeled identification is counted only with its new label
+    human_identifications = [
+        (human["label"], human["count"])
+        for aggregation in response.json()
+        for human in aggregation["human_identification"]
+    ]
+    assert ("not-found", 1) in human_identifications
+    assert ("found", 1) not in human_identifications
+
+    response = await client.get(
+        "/identifications/aggregate?size=1&page=1", headers=authorization_header
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+    response = await client.get(
+        "/identifications/aggregate?object=not-an-object", headers=authorization_header
+    )
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=59)
 async def test_get_ai_identification(client: AsyncClient, authorization_header: dict):
@@ -414,6 +532,7 @@ async def test_get_ai_identification(client: AsyncClient, authorization_header:
 @pytest.mark.anyo
 @pytest.mark.run(order=60)
 async def test_create_hide(client: AsyncClient, authorization_header: dict, context: dict):
+    subscription = event_bus.subscribe()
     response = await client.post(
         "/identifications/hide",
         headers=authorization_header,
@@ -433,6 +552,13 @@ async def test_create_hide(client: AsyncClient, authorization_header: dict, cont
     for id in response.json()["ids"]:
         assert isinstance(id, str)
 
+    event_bus.unsubscribe(subscription)
+    events = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+    assert [event.type for event in events] == ["hide"] * 6
+    assert {json.loads(event.data)["identification_id"] for event in events} == set(
+        response.json()["ids"]
+    )
+
 
 @pytest.mark.anyo
 @pytest.mark.run(order=61)
@@ -469,6 +595,29 @@ async def test_get_hide(client: AsyncClient, authorization_header: dict):
         assert isinstance(identification["snapshot"]["timestamp"], str)
 
 
+@pytest.mark.anyio
+@pytest.mark.run(order=59)
+async def test_get_ai_identification_cursor(client: AsyncClient, authorization_header: dict):
+    response = await client.get("/identifications/ai", headers=authorization_header)
+    assert response.status_code == 200
+    expected = [item["id"] for item in response.json()["items"]]
+
+    ids = []
+    cursor = ""
+    while cursor is not None:
+        response = await client.get(
+            "/identifications/ai",
+            headers=authorization_header,
+            params={"size": 3, "cursor": cursor, "include_total": True},
+        )
+        assert response.status_code == 200
+        assert response.json()["total"] == 4
+        ids += [item["id"] for item in response.json()["items"]]
+        cursor = response.json()["next_cursor"]
+
+    assert ids == expected
+
+
 @pytest.mark.anyio
 @pytest.mark.run(order=62)
 async def test_get_all_ai_identification_3(
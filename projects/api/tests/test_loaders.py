@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from app.loaders import DataLoader
+from app.models import Label, Object, Prompt, PromptObject
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_data_loader():
+    batches = []
+
+    async def batch_fn(keys: list[int]) -> dict[int, list[int]]:
+        batches.append(keys)
+        return {key: [key] * key for key in keys if key > 0}
+
+    loader = DataLoader(batch_fn, list)
+    assert await asyncio.gather(loader.load(2), loader.load(0), loader.load(2)) == [
+        [2, 2],
+        [],
+        [2, 2],
+    ]
+    assert await loader.load_many([1, 2]) == [[1], [2, 2]]
+    assert batches == [[2, 0], [1]]
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_data_loader_error():
+    calls = 0
+
+    async def batch_fn(keys: list[int]) -> dict[int, int]:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ValueError("failed")
+        return {key: key for key in keys}
+
+    loader = DataLoader(batch_fn, int)
+    with pytest.raises(ValueError):
+        await loader.load_many([1, 2])
+    assert await loader.load_many([1, 2]) == [1, 2]
+
+
+async def count_queries(client: AsyncClient, headers: dict, route: str, size: int) -> float:
+    labels = {"method": "GET", "route": route}
+    before = REGISTRY.get_sample_value("api_request_db_queries_sum", labels) or 0
+    response = await client.get(route, params={"size": size}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == size
+    return REGISTRY.get_sample_value("api_request_db_queries_sum", labels) - before
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=95)
+async def test_constant_queries(client: AsyncClient, authorization_header: dict):
+    objects = []
+    prompts = []
+    for index in range(3):
+        object_ = await Object.create(name=f"Loader object {index}", slug=f"loader-object-{index}")
+        for order, value in enumerate(["yes", "no"]):
+            await Label.create(
+                object=object_,
+                order=order,
+                value=value,
+                criteria="",
+                identification_guide="",
+            )
+        prompt = await Prompt.create(
+            name=f"Loader prompt {index}",
+            model="model",
+            prompt_text="",
+            max_output_token=1,
+            temperature=0,
+            top_k=1,
+            top_p=0,
+        )
+        await PromptObject.create(prompt=prompt, object=object_, order=0)
+        objects.append(object_)
+        prompts.append(prompt)
+
+    try:
+        for route in ["/objects", "/prompts"]:
+            queries = await count_queries(client, authorization_header, route, size=1)
+            assert await count_queries(client, authorization_header, route, size=3) == queries
+
+        response = await client.get("/objects", params={"size": 100}, headers=authorization_header)
+        items = {item["slug"]: item for item in response.json()["items"]}
+        assert [label["value"] for label in items["loader-object-0"]["labels"]] == ["yes", "no"]
+
+        response = await client.get("/prompts", params={"size": 100}, headers=authorization_header)
+        items = {item["name"]: item for item in response.json()["items"]}
+        assert items["Loader prompt 1"]["objects"] == ["loader-object-1"]
+    finally:
+        for prompt in prompts:
+            await prompt.delete()
+        for object_ in objects:
+            await object_.delete()
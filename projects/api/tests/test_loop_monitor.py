@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+from app import config
+from app.live_state import live_state
+from app.loop_monitor import BACKGROUND_ROUTE, LoopMonitor, loop_monitor
+from app.metrics import request_route
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_loop_monitor(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, "LOOP_MONITOR_ENABLE", True)
+    monitor = LoopMonitor(slow_callback=0.02, interval=0.01)
+    await monitor.start()
+    try:
+
+        async def handler():
+            request_route.set("GET /blocking")
+            await asyncio.sleep(0)
+            time.sleep(0.1)
+
+        await asyncio.create_task(handler())
+        await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.05)
+        time.sleep(0.03)
+        await asyncio.sleep(0.02)
+    finally:
+        await monitor.stop()
+
+    report = monitor.report()
+    assert report["lag"]["samples"] > 0
+    assert report["lag"]["max"] >= 0.05
+
+    # Ranked by the time they blocked the loop
+    first, second = report["slow_callbacks"]
+    assert first["route"] == "GET /blocking"
+    assert first["count"] == 1
+    assert first["total_duration"] >= 0.1
+    # Sampled while blocked, so the stack ends at the blocking call
+    assert first["stack"][-1].endswith("in handler")
+    assert second["route"] == BACKGROUND_ROUTE
+    assert second["stack"][-1].endswith("in test_loop_monitor")
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+async def test_event_loop_report(
+    client: AsyncClient, authorization_header: dict, monkeypatch: pytest.MonkeyPatch
+):
+    response = await client.get("/debug/event-loop", headers=authorization_header)
+    assert response.status_code == 404
+
+    monkeypatch.setattr(config, "LOOP_MONITOR_ENABLE", True)
+    monkeypatch.setattr(config, "LIVE_STATE_ENABLE", True)
+    monkeypatch.setattr(loop_monitor, "slow_callback", 0.02)
+    get_cameras = live_state.get_cameras
+
+    def blocking_get_cameras(*args, **kwargs):
+        time.sleep(0.05)
+        return get_cameras(*args, **kwargs)
+
+    monkeypatch.setattr(live_state, "get_cameras", blocking_get_cameras)
+    await loop_monitor.start()
+    try:
+        response = await client.get("/cameras", headers=authorization_header)
+        assert response.status_code == 200
+
+        response = await client.get("/debug/event-loop", headers=authorization_header)
+        assert response.status_code == 200
+        slow_callbacks = {item["route"]: item for item in response.json()["slow_callbacks"]}
+        assert slow_callbacks["GET /cameras"]["count"] == 1
+        assert "app/routers/cameras.py" in slow_callbacks["GET /cameras"]["location"]
+
+        response = await client.delete("/debug/event-loop", headers=authorization_header)
+        assert response.status_code == 200
+        assert "GET /cameras" in [item["route"] for item in response.json()["slow_callbacks"]]
+        assert loop_monitor.slow_callbacks == {}
+    finally:
+        await loop_monitor.stop()
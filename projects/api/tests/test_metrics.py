@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import pytest
+from httpx import AsyncClient
+from prometheus_client.parser import text_string_to_metric_families
+
+
+def get_samples(text: str, name: str, **labels) -> list[float]:
+    return [
+        sample.value
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+        if sample.name == name and labels.items() <= sample.labels.items()
+    ]
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=94)
+async def test_metrics(client: AsyncClient, authorization_header: dict):
+    # Above the live state window, so the cameras are read from the database and its cache
+    params = {"minute_interval": 24 * 60}
+    response = await client.get("/cameras", headers=authorization_header, params=params)
+    assert response.status_code == 200
+    response = await client.get("/cameras", headers=authorization_header, params=params)
+    assert response.status_code == 200
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    route = {"method": "GET", "route": "/cameras"}
+    assert get_samples(response.text, "api_requests_total", status="200", **route)[0] >= 2
+    assert get_samples(response.text, "api_request_duration_seconds_count", **route)[0] >= 2
+    assert get_samples(response.text, "api_response_size_bytes_sum", **route)[0] > 0
+    assert get_samples(response.text, "api_request_db_queries_sum", **route)[0] > 0
+    assert get_samples(response.text, "api_requests_in_progress", **route) == [0]
+    assert get_samples(response.text, "api_cache_requests_total", cache="cameras", result="hit")
+    # Grouped by the route template instead of the path
+    assert get_samples(response.text, "api_requests_total", route="/cameras/0001") == []
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import pytest
+from app import config
+from app.profiler import RequestProfiler, is_profile_requested, request_profiler
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+@pytest.mark.parametrize(
+    "headers,query_string,expected",
+    [
+        ([], b"", False),
+        ([(b"x-profile", b"true")], b"", True),
+        ([(b"x-profile", b"1")], b"", True),
+        ([(b"x-profile", b"false")], b"", False),
+        ([], b"size=10&profile=true", True),
+        ([], b"profile=no", False),
+        ([], b"profiles=true", False),
+    ],
+)
+async def test_is_profile_requested(headers: list, query_string: bytes, expected: bool):
+    scope = {"type": "http", "headers": headers, "query_string": query_string}
+    assert is_profile_requested(scope) is expected
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=1)
+async def test_profiler_rate_limit(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, "PROFILER_RATE_LIMIT", 2)
+    profiler = RequestProfiler()
+    assert profiler.acquire()
+    assert profiler.acquire()
+    assert not profiler.acquire()
+
+    profiler.clear()
+    assert profiler.acquire()
+
+
+@pytest.mark.anyio
+@pytest.mark.run(order=79)
+async def test_profile_request(
+    client: AsyncClient, authorization_header: dict, monkeypatch: pytest.MonkeyPatch
+):
+    request_profiler.clear()
+
+    response = await client.get("/cameras", headers={**authorization_header, "X-Profile": "true"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    response = await client.get("/debug/profiles", headers=authorization_header)
+    assert response.status_code == 200
+    profiles = response.json()
+    assert [profile["id"] for profile in profiles] == [profile_id]
+    assert profiles[0]["route"] == "/cameras"
+    assert profiles[0]["status"] == 200
+
+    response = await client.get(
+        f"/debug/profiles/{profile_id}?format=text", headers=authorization_header
+    )
+    assert response.status_code == 200
+    assert "get_cameras" in response.text
+
+    response = await client.get(
+        f"/debug/profiles/{profile_id}?format=speedscope", headers=authorization_header
+    )
+    assert response.status_code == 200
+    assert "speedscope" in response.json()["$schema"]
+
+    response = await client.get(f"/debug/profiles/{profile_id}", headers=authorization_header)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+
+    response = await client.get("/debug/profiles/unknown", headers=authorization_header)
+    assert response.status_code == 404
+
+    # Only admins are profiled
+    response = await client.get("/cameras?profile=true")
+    assert response.headers["X-Profile-Skipped"] == "forbidden"
+
+    monkeypatch.setattr(config, "PROFILER_RATE_LIMIT", 1)
+    response = await client.get("/cameras?profile=true", headers=authorization_header)
+    assert response.status_code == 200
+    assert response.headers["X-Profile-Skipped"] == "rate-limited"
+    assert "X-Profile-Id" not in response.headers
+
+    request_profiler.clear()
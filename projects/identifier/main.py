@@ -38,6 +38,14 @@ class APIVisionAI(VisionaiAPI):
             f"/cameras/{camera_id}/snapshots/{snapshot_id}/identifications?object_id={object_id}&label_value={label}&label_explanation={label_explanation}"  # noqa
         )
 
+    def post_identifications(
+        self, camera_id: str, snapshot_id: str, objects: list[dict]
+    ) -> requests.Response:
+        return self._post(
+            f"/cameras/{camera_id}/snapshots/{snapshot_id}/identifications/bulk",
+            json_data={"objects": objects},
+        )
+
 
 def get_secret(secret_id: str) -> str:
     name = f"projects/{PROJECT_ID}/secrets/{secret_id}/versions/{VERSION_ID}"
@@ -103,6 +111,7 @@ def predict(cloud_event: dict) -> None:
             vision_ai_api.refresh_token()
             camera_objects_from_api = dict(zip(data["object_slugs"], data["object_ids"]))
             ai_response_parsed_bq = []
+            items_to_post = []
             for item in ai_response_parsed["objects"]:
                 item["api_status_code"] = None
                 item["api_error_step"] = None
@@ -110,33 +119,50 @@ def predict(cloud_event: dict) -> None:
                 item["api_error_message"] = None
 
                 object_id = camera_objects_from_api.get(item["object"], None)
-                label_explanation = item["label_explanation"]
                 label = item["label"]
                 label = label if label is not None else "null"
                 label = str(label).lower()
                 item["label"] = label
                 if object_id is not None:
-                    try:
-                        post_response = vision_ai_api.post_identification(
-                            camera_id=camera_id,
-                            snapshot_id=data["snapshot_id"],
-                            object_id=object_id,
-                            label_explanation=label_explanation,
-                            label=label,
-                        )
-                        if (
-                            post_response.status_code != 200
-                        ):  # TODO pensar o que fazer com o label que nao existem, criar ou so ignora? # noqa
+                    items_to_post.append(item)
+                else:
+                    item["api_error_step"] = "api_object_id_not_exists"
+                ai_response_parsed_bq.append(item)
+
+            # Every identification of the snapshot is sent in a single request
+            if len(items_to_post) > 0:
+                try:
+                    post_response = vision_ai_api.post_identifications(
+                        camera_id=camera_id,
+                        snapshot_id=data["snapshot_id"],
+                        objects=[
+                            {
+                                "object": item["object"],
+                                "label": item["label"],
+                                "label_explanation": item["label_explanation"],
+                            }
+                            for item in items_to_post
+                        ],
+                    )
+                    if post_response.status_code != 200:
+                        for item in items_to_post:
+                            item["api_status_code"] = post_response.status_code
                             item["api_error_step"] = "api_object_not_exists"
                             item["api_error_message"] = json.dumps(post_response.json())
-                        item["api_status_code"] = post_response.status_code
-                    except Exception as exception:
+                    else:
+                        results = post_response.json()["items"]
+                        for item, result in zip(items_to_post, results):
+                            if (
+                                result["status_code"] != 200
+                            ):  # TODO pensar o que fazer com o label que nao existem, criar ou so ignora? # noqa
+                                item["api_error_step"] = "api_object_not_exists"
+                                item["api_error_message"] = json.dumps(result)
+                            item["api_status_code"] = result["status_code"]
+                except Exception as exception:
+                    for item in items_to_post:
                         item["api_error_step"] = "api_post_object"
                         item["api_error_name"] = type(exception).__name__
                         item["api_error_message"] = traceback.format_exc(chain=False)
-                else:
-                    item["api_error_step"] = "api_object_id_not_exists"
-                ai_response_parsed_bq.append(item)
 
             save_data_in_bq(
                 project_id=PROJECT_ID,